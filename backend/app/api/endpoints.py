@@ -1,26 +1,53 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Depends, Query
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+import contextlib
+import io
 import os
 import uuid
-import shutil
-from typing import List
+from typing import List, Literal, Optional
 
+from ..core.admission import AdmissionRejected, AdmissionTimeout, admission_from_env, estimate_render_cost
+from ..core.thumbnails import THUMBNAIL_SIZES, is_thumbnail_name, thumbnail_name
+from ..storage import backend_from_env, in_threadpool, storage_response
 from ..models.schemas import (
     QRGenerationRequest, 
     QRGenerationResponse, 
     ImageUploadResponse,
-    ImageListResponse
+    ImageListResponse,
+    ImageInfo,
+    EncodingPlanRequest,
+    EncodingPlanResponse,
+    QRBatchRequest,
+    QRBatchResponse
 )
-from ..core.qr_generator import generate_qr_code_api
 
 router = APIRouter()
 
 UPLOAD_DIR = "uploads"
 OUTPUT_DIR = "outputs"
 
-# Ensure directories exist
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Storage backends (sharded local directories with retention by default, see QR_STORAGE_BACKEND)
+upload_storage = backend_from_env(UPLOAD_DIR, "UPLOAD", default_ttl_hours=24 * 7, default_quota_mb=2048)
+output_storage = backend_from_env(OUTPUT_DIR, "OUTPUT", default_ttl_hours=24, default_quota_mb=1024)
+
+# Outputs get a fresh name per render, so clients may cache them indefinitely
+OUTPUT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PREVIEW_CACHE_CONTROL = "public, max-age=86400"
+
+# Per-request render budgets and the process-wide cap on in-flight render memory
+admission = admission_from_env()
+ADMISSION_RETRY_AFTER_SECONDS = 5
+
+OUTPUT_MEDIA_TYPES = {
+    '.png': 'image/png',
+    '.apng': 'image/apng',
+    '.gif': 'image/gif',
+    '.pdf': 'application/pdf',
+    '.webp': 'image/webp',
+    '.svg': 'image/svg+xml',
+}
 
 @router.post("/upload", response_model=ImageUploadResponse)
 async def upload_image(file: UploadFile = File(...)):
@@ -38,11 +65,9 @@ async def upload_image(file: UploadFile = File(...)):
         
         # Generate unique filename
         unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
         
         # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await run_in_threadpool(upload_storage.put_stream, unique_filename, file.file)
         
         return ImageUploadResponse(
             success=True,
@@ -53,66 +78,96 @@ async def upload_image(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+async def parse_generation_request(request: Request) -> QRGenerationRequest:
+    """Bind /api/generate parameters from a JSON body or, for the frontend, form fields"""
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("application/json"):
+            payload = await request.json()
+            if not isinstance(payload, dict):
+                raise HTTPException(status_code=422, detail="JSON body must be an object")
+        else:
+            form = await request.form()
+            payload = {key: value for key, value in form.items() if isinstance(value, str)}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Malformed request body")
+    try:
+        return QRGenerationRequest.model_validate(payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=jsonable_encoder(e.errors(include_url=False, include_context=False)))
+
+async def stat_upload(filename, not_found):
+    """ObjectInfo of an upload, marked as used; 404 if there is no such upload (thumbnails do not count)"""
+    info = None if is_thumbnail_name(filename) else await run_in_threadpool(upload_storage.stat, filename)
+    if info is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    await run_in_threadpool(upload_storage.touch, filename)
+    return info
+
+@contextlib.asynccontextmanager
+async def admitted(cost):
+    """Run the block under admission control, mapping refusals to HTTP errors"""
+    try:
+        async with admission.admit(cost):
+            yield
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=413, detail={"message": str(e), "estimate": cost.as_dict()})
+    except AdmissionTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(ADMISSION_RETRY_AFTER_SECONDS)})
+
 @router.post("/generate", response_model=QRGenerationResponse)
-async def generate_qr_code(
-    filename: str = Form(...),
-    data: str = Form("https://www.example.com"),
-    background_image_mode: str = Form("Stretched"),
-    finder_shape: str = Form("rounded_square"),
-    finder_color_mode: str = Form("dynamic"),
-    finder_dynamic_submode: str = Form("single-color"),
-    data_module_shape: str = Form("diamond"),
-    data_module_color_mode: str = Form("adaptive"),
-    box_size: int = Form(25),
-    border: int = Form(4),
-    padding: int = Form(4),
-    diamond_border_width: int = Form(0),
-    error_correction: str = Form("H"),
-    background_alpha: int = Form(255),
-    background_padding: int = Form(60),
-    enable_finder_overlay: bool = Form(True),
-    finder_overlay_padding: int = Form(15),
-    reduce_innermost_brightness: bool = Form(True)
-):
+async def generate_qr_code(params: QRGenerationRequest = Depends(parse_generation_request)):
     """Generate QR code with specified parameters"""
     try:
         # Check if uploaded file exists
-        input_path = os.path.join(UPLOAD_DIR, filename)
-        if not os.path.exists(input_path):
-            raise HTTPException(status_code=404, detail="Background image not found")
+        background_info = await stat_upload(params.filename, "Background image not found")
+        logo_info = await stat_upload(params.logo_filename, "Logo image not found") if params.logo_filename else None
         
         # Generate output filename
-        base_name = os.path.splitext(filename)[0]
+        base_name = os.path.splitext(params.filename)[0]
         output_filename = f"{base_name}_qr_{uuid.uuid4()}.png"
-        output_path = os.path.join(OUTPUT_DIR, output_filename)
         
-        # Prepare parameters - only include what the core function expects
-        params = {
-            'background_image_mode': background_image_mode,
-            'finder_shape': finder_shape,
-            'finder_color_mode': finder_color_mode,
-            'finder_dynamic_submode': finder_dynamic_submode,
-            'reduce_innermost_brightness': reduce_innermost_brightness,
-            'data_module_shape': data_module_shape,
-            'data_module_color_mode': data_module_color_mode,
-            'box_size': box_size,
-            'border': border,
-            'padding': padding,
-            'diamond_border_width': diamond_border_width,
-            'error_correction': error_correction,
-            'background_alpha': background_alpha,
-            'background_padding': background_padding,
-            'enable_finder_overlay': enable_finder_overlay,
-            'finder_overlay_padding': finder_overlay_padding
-        }
-        
-        # Generate QR code
-        success = generate_qr_code_api(
-            data=data,
-            bg_image_path=input_path,
-            output_path=output_path,
-            **params
-        )
+        # Generate QR code (the generator pulls in qrcode, Pillow and numpy, so import it on first use)
+        from ..core.qr_generator import ERROR_CORRECTION_MAP, generate_qr_code_api
+        version = None
+        if params.logo_filename:
+            # A logo may move the code up a version; refuse logos the error correction cannot cover
+            from ..core.logo import LogoTooLarge, logo_version
+            try:
+                version = await run_in_threadpool(
+                    logo_version, params.data, ERROR_CORRECTION_MAP[params.error_correction], params.logo_scale, params.logo_margin
+                )
+            except LogoTooLarge as e:
+                raise HTTPException(status_code=422, detail=str(e))
+        # The render record saved beside the output lets /api/export redraw it later
+        from ..core.exports import sidecar_name
+        async with contextlib.AsyncExitStack() as stack:
+            input_path = await stack.enter_async_context(in_threadpool(upload_storage.materialize(params.filename)))
+            logo_path = None
+            if params.logo_filename:
+                logo_path = await stack.enter_async_context(in_threadpool(upload_storage.materialize(params.logo_filename)))
+            output_path = await stack.enter_async_context(in_threadpool(output_storage.writable_path(output_filename)))
+            sidecar_path = await stack.enter_async_context(
+                in_threadpool(output_storage.writable_path(sidecar_name(output_filename)))
+            )
+            # Planning the encoding and reading the image header both block, so estimate off the loop
+            cost = await run_in_threadpool(
+                estimate_render_cost, params.data, input_path, version=version, **params.render_params()
+            )
+            async with admitted(cost):
+                success = await run_in_threadpool(
+                    generate_qr_code_api,
+                    data=params.data,
+                    bg_image_path=input_path,
+                    output_path=output_path,
+                    logo_path=logo_path,
+                    sidecar_path=sidecar_path,
+                    sidecar_sources={"background": params.filename, "logo": params.logo_filename},
+                    # Cache keys follow the stored objects, not the (possibly temporary) local copies
+                    bg_fingerprint=upload_storage.fingerprint(background_info),
+                    logo_fingerprint=logo_info and upload_storage.fingerprint(logo_info),
+                    **params.render_params()
+                )
         
         if success:
             return QRGenerationResponse(
@@ -124,40 +179,196 @@ async def generate_qr_code(
         else:
             raise HTTPException(status_code=500, detail="QR code generation failed")
     
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
 
-@router.get("/download/{filename}")
-async def download_qr_code(filename: str):
+@router.post("/generate-batch", response_model=QRBatchResponse)
+async def generate_qr_batch(params: QRBatchRequest):
+    """Render several payloads over one background as an animation or a paginated label sheet"""
+    background_info = await stat_upload(params.filename, "Background image not found")
+
+    from ..core.sequences import FORMAT_EXTENSIONS, generate_sequence_api
+    base_name = os.path.splitext(params.filename)[0]
+    token = uuid.uuid4()
+    extension = FORMAT_EXTENSIONS[params.output_format]
+    filenames = []
+
+    def open_output(index):
+        suffix = f"_p{index + 1}" if params.output_format == "png" else ""
+        filenames.append(f"{base_name}_{params.output_format}_{token}{suffix}{extension}")
+        return output_storage.writable_path(filenames[-1])
+
+    def render(input_path):
+        return generate_sequence_api(
+            params.data_items(),
+            input_path,
+            params.output_format,
+            open_output,
+            bg_fingerprint=upload_storage.fingerprint(background_info),
+            **params.style_params(),
+            **params.sequence_params()
+        )
+
+    try:
+        async with in_threadpool(upload_storage.materialize(params.filename)) as input_path:
+            cost = await run_in_threadpool(estimate_sequence_cost, params, input_path)
+            async with admitted(cost):
+                version, _ = await run_in_threadpool(render, input_path)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch generation failed: {str(e)}")
+    return QRBatchResponse(
+        success=True,
+        filenames=filenames,
+        message=f"Rendered {len(params.items)} QR codes",
+        count=len(params.items),
+        version=version
+    )
+
+def estimate_sequence_cost(params, input_path):
+    from ..core.qr_generator import ERROR_CORRECTION_MAP
+    from ..core.sequences import SheetLayout, shared_version
+    version = shared_version(params.data_items(), ERROR_CORRECTION_MAP[params.error_correction])
+    sheet_pixels = 0
+    if params.output_format in ("pdf", "png"):
+        cell_px = (version * 4 + 17 + 2 * params.border) * params.box_size
+        width, height = SheetLayout(params.columns, params.rows, cell_px, params.cell_gap, params.page_margin).page_size
+        sheet_pixels = width * height
+    return estimate_render_cost(
+        None, input_path, version=version, frames=len(params.items), sheet_pixels=sheet_pixels, **params.style_params()
+    )
+
+@router.post("/encode-plan", response_model=EncodingPlanResponse)
+async def encode_plan(params: EncodingPlanRequest):
+    """Report the segments, QR version and module count the data will be encoded with, without rendering"""
+    from ..core.payloads import plan_encoding
+    from ..core.qr_generator import ERROR_CORRECTION_MAP
+    try:
+        plan = plan_encoding(params.data, ERROR_CORRECTION_MAP[params.error_correction])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return EncodingPlanResponse(
+        data=params.data,
+        version=plan.version,
+        modules_count=plan.modules_count,
+        bit_length=plan.bit_length,
+        capacity_bits=plan.capacity_bits,
+        segments=plan.describe()
+    )
+
+@router.api_route("/download/{filename}", methods=["GET", "HEAD"])
+async def download_qr_code(filename: str, request: Request):
     """Download generated QR code"""
-    file_path = os.path.join(OUTPUT_DIR, filename)
-    if not os.path.exists(file_path):
+    from ..core.exports import is_sidecar_name
+    # Render sidecars name the source uploads and hold the full matrix; only /api/export reads them
+    if is_sidecar_name(filename):
         raise HTTPException(status_code=404, detail="File not found")
-    
-    return FileResponse(
-        file_path,
-        media_type="image/png",
-        filename=filename
+    media_type = OUTPUT_MEDIA_TYPES.get(os.path.splitext(filename)[1].lower(), "image/png")
+    response = await storage_response(
+        request, output_storage, filename, media_type, OUTPUT_CACHE_CONTROL, download_filename=filename
+    )
+    await run_in_threadpool(output_storage.touch, filename)
+    return response
+
+@router.api_route("/export/{filename}", methods=["GET", "HEAD"])
+async def export_qr_code(
+    filename: str,
+    request: Request,
+    output_format: Literal["svg", "webp", "png"] = Query("svg", alias="format"),
+    box_size: Optional[int] = Query(None, ge=1, le=100),
+):
+    """Redraw a generated code from its render sidecar as SVG, WebP or PNG, optionally at another box_size"""
+    from ..core.exports import EXPORT_MEDIA_TYPES, is_sidecar_name, sidecar_name
+    if is_sidecar_name(filename) or await run_in_threadpool(output_storage.stat, sidecar_name(filename)) is None:
+        raise HTTPException(status_code=404, detail="No render record for this output")
+    try:
+        sidecar = await run_in_threadpool(_load_sidecar, filename)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=422, detail=f"Unreadable render record: {str(e)}")
+    style = sidecar.style
+    box_size = box_size or style.box_size
+    export_filename = f"{os.path.splitext(filename)[0]}_{box_size}px.{output_format}"
+
+    # Exports are deterministic, so one already written is served as is
+    if await run_in_threadpool(output_storage.stat, export_filename) is None:
+        background_info = await run_in_threadpool(upload_storage.stat, sidecar.background)
+        logo_info = await run_in_threadpool(upload_storage.stat, sidecar.logo) if sidecar.logo else None
+        if background_info is None or (sidecar.logo and logo_info is None):
+            raise HTTPException(status_code=410, detail="The background or logo this code was drawn over is no longer available")
+        try:
+            async with contextlib.AsyncExitStack() as stack:
+                input_path = await stack.enter_async_context(in_threadpool(upload_storage.materialize(sidecar.background)))
+                logo_path = None
+                if sidecar.logo:
+                    logo_path = await stack.enter_async_context(in_threadpool(upload_storage.materialize(sidecar.logo)))
+                export_path = await stack.enter_async_context(in_threadpool(output_storage.writable_path(export_filename)))
+                # Colors come from the record, so the estimate is that of a static-color render
+                cost = await run_in_threadpool(
+                    estimate_render_cost,
+                    None, input_path, version=sidecar.record.version, box_size=box_size, border=style.border,
+                    error_correction=style.error_correction, data_module_shape=style.data_module_shape,
+                    data_module_color_mode="static", background_alpha=style.background_alpha,
+                )
+                async with admitted(cost):
+                    await run_in_threadpool(
+                        _render_export, sidecar, output_format, export_path, input_path, logo_path, box_size,
+                        upload_storage.fingerprint(background_info),
+                    )
+        except HTTPException:
+            raise
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+    response = await storage_response(
+        request, output_storage, export_filename, EXPORT_MEDIA_TYPES[output_format], OUTPUT_CACHE_CONTROL,
+        download_filename=export_filename,
     )
+    await run_in_threadpool(output_storage.touch, export_filename)
+    return response
+
+def _load_sidecar(filename):
+    from ..core.exports import load_sidecar, sidecar_name
+    with output_storage.materialize(sidecar_name(filename)) as path, open(path, "rb") as f:
+        return load_sidecar(f.read())
+
+def _render_export(sidecar, output_format, export_path, input_path, logo_path, box_size, bg_fingerprint):
+    from ..core.cache import get_cache
+    from ..core.exports import save_export
+    # export_path is a temporary file that writable_path publishes only once the export succeeded
+    with open(export_path, "wb") as fp:
+        save_export(
+            sidecar, output_format, fp, input_path, logo_path, box_size,
+            background_cache=get_cache("backgrounds"), bg_fingerprint=bg_fingerprint,
+        )
 
 @router.get("/images", response_model=ImageListResponse)
 async def list_images():
     """List all uploaded images"""
     try:
-        images = []
-        if os.path.exists(UPLOAD_DIR):
-            images = [f for f in os.listdir(UPLOAD_DIR) if os.path.isfile(os.path.join(UPLOAD_DIR, f))]
-        return ImageListResponse(images=images)
+        images = sorted(name for name in await run_in_threadpool(upload_storage.list_names) if not is_thumbnail_name(name))
+        items = [
+            ImageInfo(
+                filename=name,
+                preview_url=f"/api/preview/{name}",
+                thumbnail_urls={label: f"/api/thumbnail/{name}?size={label}" for label in THUMBNAIL_SIZES},
+            )
+            for name in images
+        ]
+        return ImageListResponse(images=images, items=items)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list images: {str(e)}")
 
-@router.get("/preview/{filename}")
-async def preview_image(filename: str):
+@router.api_route("/preview/{filename}", methods=["GET", "HEAD"])
+async def preview_image(filename: str, request: Request):
     """Preview uploaded image"""
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Image not found")
-    
     # Determine media type based on extension
     extension = os.path.splitext(filename)[1].lower()
     media_type_map = {
@@ -173,4 +384,26 @@ async def preview_image(filename: str):
     
     media_type = media_type_map.get(extension, 'image/png')
     
-    return FileResponse(file_path, media_type=media_type)
\ No newline at end of file
+    return await storage_response(request, upload_storage, filename, media_type, PREVIEW_CACHE_CONTROL, not_found="Image not found")
+
+@router.api_route("/thumbnail/{filename}", methods=["GET", "HEAD"])
+async def thumbnail_image(filename: str, request: Request, size: Literal["small", "medium", "large"] = Query("small")):
+    """WebP thumbnail of an uploaded image, rendered on first request and cached beside the upload"""
+    if is_thumbnail_name(filename):
+        raise HTTPException(status_code=404, detail="Image not found")
+    size_px = THUMBNAIL_SIZES[size]
+    thumb_name = thumbnail_name(filename, size_px)
+    if await run_in_threadpool(upload_storage.stat, thumb_name) is None:
+        if await run_in_threadpool(upload_storage.stat, filename) is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        try:
+            data = await run_in_threadpool(_render_thumbnail, filename, size_px)
+        except Exception as e:
+            raise HTTPException(status_code=415, detail=f"Cannot create thumbnail: {str(e)}")
+        await run_in_threadpool(upload_storage.put_stream, thumb_name, io.BytesIO(data))
+    return await storage_response(request, upload_storage, thumb_name, "image/webp", PREVIEW_CACHE_CONTROL, not_found="Image not found")
+
+def _render_thumbnail(filename, size_px):
+    from ..core.thumbnails import render_thumbnail
+    with upload_storage.materialize(filename) as input_path:
+        return render_thumbnail(input_path, size_px)
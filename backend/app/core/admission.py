@@ -0,0 +1,218 @@
+import asyncio
+import contextlib
+import os
+
+from .cache import get_cache
+
+# Render cost model, fitted to timings and peak RSS growth of create_qr_code over versions 10-39,
+# box sizes 10 and 20, every shape and both color modes. Time is dominated by per-pixel
+# compositing (diamond polygons cost the most) and per-module work; adaptive coloring samples the
+# background around every module, about 17 times the static per-module cost. The coefficients are
+# scaled to the slowest host measured (one core, 2.7 times slower than the fitting host), so
+# faster hosts are over- rather than under-estimated. Peak memory is the RGBA layers alive at once
+# (background canvas, final image, data module layer and the copy made while pasting it, plus one
+# more while a background alpha below 255 is applied), the decoded background and the PNG-encoded
+# canvas written to the background cache.
+PIXEL_NS = {"diamond": 450, "square": 360, "circle": 380}
+MODULE_US = {"adaptive": 320, "static": 20}
+BACKGROUND_PIXEL_NS = 30
+BASE_SECONDS = 0.4
+RGBA_LAYERS = 4
+# Background decoded as RGBA next to its source mode
+BACKGROUND_BYTES_PER_PIXEL = 8
+# SVG backgrounds are rasterized at their intrinsic size, which is unknown without rendering
+SVG_BACKGROUND_PIXELS = 1024 * 1024
+
+DEFAULT_MAX_REQUEST_MEMORY_MB = 1536
+DEFAULT_MAX_REQUEST_SECONDS = 60
+DEFAULT_MAX_INFLIGHT_MEMORY_MB = 2048
+DEFAULT_QUEUE_TIMEOUT_SECONDS = 30
+
+class AdmissionRejected(Exception):
+    """The request's estimated cost exceeds the per-request budget"""
+
+class AdmissionTimeout(Exception):
+    """The request waited longer than the queue timeout for in-flight memory to free up"""
+
+class RenderCost:
+    """Estimated peak memory and CPU time of a render"""
+    __slots__ = ("version", "modules_count", "size_px", "memory_bytes", "seconds", "frames")
+
+    def __init__(self, version, modules_count, size_px, memory_bytes, seconds, frames=1):
+        self.version = version
+        self.modules_count = modules_count
+        self.size_px = size_px
+        self.memory_bytes = memory_bytes
+        self.seconds = seconds
+        self.frames = frames
+
+    @property
+    def seconds_per_frame(self):
+        return self.seconds / self.frames
+
+    @property
+    def memory_mb(self):
+        return self.memory_bytes / 2**20
+
+    def as_dict(self):
+        return {
+            "version": self.version,
+            "modules_count": self.modules_count,
+            "size_px": self.size_px,
+            "memory_mb": round(self.memory_mb, 1),
+            "seconds": round(self.seconds, 2),
+            "frames": self.frames,
+        }
+
+def background_pixels(bg_image_path):
+    """Pixel count of the background, read from the image header without decoding it"""
+    if bg_image_path.lower().endswith(".svg"):
+        return SVG_BACKGROUND_PIXELS
+    from PIL import Image
+    try:
+        with Image.open(bg_image_path) as img:
+            return img.width * img.height
+    except Exception:
+        return SVG_BACKGROUND_PIXELS
+
+def estimate_render_cost(
+    data,
+    bg_image_path,
+    *,
+    box_size,
+    border,
+    error_correction,
+    data_module_shape,
+    data_module_color_mode,
+    background_alpha=255,
+    version=None,
+    frames=1,
+    sheet_pixels=0,
+    **_style,
+):
+    """RenderCost of create_qr_code for these parameters.
+
+    For a sequence, frames is the number of codes drawn over the shared background and
+    sheet_pixels the size of the RGB sheet page held while cells are pasted.
+    """
+    if isinstance(error_correction, str):
+        from .qr_generator import ERROR_CORRECTION_MAP
+        error_correction = ERROR_CORRECTION_MAP[error_correction]
+    if version is None:
+        from .payloads import plan_encoding
+        version = plan_encoding(data, error_correction).version
+    modules_count = version * 4 + 17
+    size_px = (modules_count + 2 * border) * box_size
+    pixels = size_px * size_px
+    bg_pixels = background_pixels(bg_image_path)
+
+    layers = RGBA_LAYERS + (1 if background_alpha < 255 else 0)
+    memory_bytes = pixels * 4 * layers + bg_pixels * BACKGROUND_BYTES_PER_PIXEL + sheet_pixels * 3
+    cache = get_cache("backgrounds")
+    if cache is not None:
+        # The encoded canvas is held until it is written; the cache refuses entries over its limit
+        memory_bytes += min(pixels * 4, cache.max_entry_bytes or pixels * 4)
+
+    pixel_ns = PIXEL_NS.get(data_module_shape, max(PIXEL_NS.values()))
+    module_us = MODULE_US.get(data_module_color_mode, MODULE_US["adaptive"])
+    frame_seconds = pixels * pixel_ns / 1e9 + modules_count * modules_count * module_us / 1e6
+    seconds = BASE_SECONDS + bg_pixels * BACKGROUND_PIXEL_NS / 1e9 + frame_seconds * frames
+    return RenderCost(version, modules_count, size_px, memory_bytes, seconds, frames)
+
+class AdmissionController:
+    """Per-request budgets plus a process-wide cap on the memory of renders in flight.
+
+    Requests over the per-request memory or time budget are rejected outright. The others wait
+    until their estimated memory fits under the in-flight cap. A request always runs when
+    nothing else is in flight, so one that is larger than the cap cannot wait forever.
+    """
+
+    def __init__(self, max_request_bytes, max_request_seconds, max_inflight_bytes, queue_timeout_seconds):
+        self.max_request_bytes = max_request_bytes
+        self.max_request_seconds = max_request_seconds
+        self.max_inflight_bytes = max_inflight_bytes
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.inflight_bytes = 0
+        self.inflight_requests = 0
+        self.queued_requests = 0
+        self.rejected_requests = 0
+        self._condition = asyncio.Condition()
+
+    def check(self, cost):
+        """Raise AdmissionRejected if cost is over a per-request budget (0 disables a budget).
+
+        The time budget applies per rendered code, so long batches are limited by memory and
+        the batch size cap rather than by their total time.
+        """
+        if self.max_request_bytes and cost.memory_bytes > self.max_request_bytes:
+            self.rejected_requests += 1
+            raise AdmissionRejected(
+                f"Estimated render memory {cost.memory_mb:.0f} MB exceeds the limit of {self.max_request_bytes / 2**20:.0f} MB; "
+                "reduce box_size or the amount of data"
+            )
+        if self.max_request_seconds and cost.seconds_per_frame > self.max_request_seconds:
+            self.rejected_requests += 1
+            raise AdmissionRejected(
+                f"Estimated render time {cost.seconds_per_frame:.1f} s exceeds the limit of {self.max_request_seconds:g} s; "
+                "reduce box_size, the amount of data, or use static coloring"
+            )
+
+    def _fits(self, memory_bytes):
+        return (
+            not self.max_inflight_bytes
+            or self.inflight_requests == 0
+            or self.inflight_bytes + memory_bytes <= self.max_inflight_bytes
+        )
+
+    @contextlib.asynccontextmanager
+    async def admit(self, cost):
+        """Hold cost.memory_bytes of the in-flight budget for the duration of the block"""
+        self.check(cost)
+        async with self._condition:
+            if not self._fits(cost.memory_bytes):
+                self.queued_requests += 1
+                try:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(lambda: self._fits(cost.memory_bytes)),
+                        self.queue_timeout_seconds or None,
+                    )
+                except asyncio.TimeoutError:
+                    self.rejected_requests += 1
+                    raise AdmissionTimeout("Server is busy rendering other requests; retry shortly")
+                finally:
+                    self.queued_requests -= 1
+            self.inflight_bytes += cost.memory_bytes
+            self.inflight_requests += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.inflight_bytes -= cost.memory_bytes
+                self.inflight_requests -= 1
+                self._condition.notify_all()
+
+    def snapshot(self):
+        return {
+            "inflight_requests": self.inflight_requests,
+            "inflight_memory_mb": round(self.inflight_bytes / 2**20, 1),
+            "max_inflight_memory_mb": round(self.max_inflight_bytes / 2**20, 1),
+            "queued_requests": self.queued_requests,
+            "rejected_requests": self.rejected_requests,
+        }
+
+def admission_from_env():
+    """AdmissionController configured by QR_MAX_REQUEST_MEMORY_MB, QR_MAX_REQUEST_SECONDS,
+    QR_MAX_INFLIGHT_MEMORY_MB and QR_ADMISSION_QUEUE_SECONDS (0 disables each)"""
+    def number(name, default):
+        value = os.environ.get(name, "")
+        try:
+            return float(value) if value else default
+        except ValueError:
+            print(f"Warning: ignoring invalid {name}={value!r}; using {default}")
+            return default
+    return AdmissionController(
+        max_request_bytes=int(number("QR_MAX_REQUEST_MEMORY_MB", DEFAULT_MAX_REQUEST_MEMORY_MB) * 2**20),
+        max_request_seconds=number("QR_MAX_REQUEST_SECONDS", DEFAULT_MAX_REQUEST_SECONDS),
+        max_inflight_bytes=int(number("QR_MAX_INFLIGHT_MEMORY_MB", DEFAULT_MAX_INFLIGHT_MEMORY_MB) * 2**20),
+        queue_timeout_seconds=number("QR_ADMISSION_QUEUE_SECONDS", DEFAULT_QUEUE_TIMEOUT_SECONDS),
+    )
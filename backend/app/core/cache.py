@@ -0,0 +1,126 @@
+import contextlib
+import hashlib
+import os
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: entries are still published atomically with os.replace, just without cross-process locks
+    fcntl = None
+
+CACHE_DIR_ENV = "QR_CACHE_DIR"
+DEFAULT_CACHE_DIR = "cache"
+CACHE_MAX_ENTRY_ENV = "QR_CACHE_MAX_ENTRY_MB"
+DEFAULT_CACHE_MAX_ENTRY_MB = 16
+
+class DiskCache:
+    """Byte-string cache on disk that any number of worker processes can share.
+
+    Entries live at <directory>/<key[:2]>/<key>. Writers publish entries atomically with
+    os.replace while holding an exclusive flock on the shard's lock file, so concurrent
+    workers never observe or produce a partially written entry. Entries larger than
+    max_entry_bytes are not stored, so one huge render cannot take over the cache quota.
+    """
+
+    def __init__(self, directory, max_entry_bytes=DEFAULT_CACHE_MAX_ENTRY_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_entry_bytes = max_entry_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def accepts(self, size):
+        return not self.max_entry_bytes or size <= self.max_entry_bytes
+
+    @staticmethod
+    def make_key(*parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(repr(part).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    @contextlib.contextmanager
+    def _lock(self, key):
+        if fcntl is None:
+            yield
+            return
+        lock_path = os.path.join(self.directory, key[:2], ".lock")
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, "a+b") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+                stat = os.fstat(f.fileno())
+        except FileNotFoundError:
+            return None
+        # Bump atime on every hit, keeping mtime, so the storage GC's LRU order holds on
+        # noatime/relatime mounts too
+        with contextlib.suppress(OSError):
+            os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+        return data
+
+    def _write(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+
+    def get(self, key):
+        return self._read(key)
+
+    def set(self, key, data):
+        """Store data under key; returns False, storing nothing, if it is over max_entry_bytes"""
+        if not self.accepts(len(data)):
+            return False
+        with self._lock(key):
+            self._write(key, data)
+        return True
+
+_caches = {}
+
+def _max_entry_bytes():
+    value = os.environ.get(CACHE_MAX_ENTRY_ENV, "")
+    try:
+        megabytes = float(value) if value else DEFAULT_CACHE_MAX_ENTRY_MB
+    except ValueError:
+        print(f"Warning: ignoring invalid {CACHE_MAX_ENTRY_ENV}={value!r}; using {DEFAULT_CACHE_MAX_ENTRY_MB}")
+        megabytes = DEFAULT_CACHE_MAX_ENTRY_MB
+    return int(megabytes * 1024 * 1024)
+
+def get_cache(namespace):
+    """Shared cache under $QR_CACHE_DIR/<namespace>, or None when QR_CACHE_DIR is set to an empty string.
+
+    QR_CACHE_MAX_ENTRY_MB caps the size of a single entry (0 removes the cap).
+    """
+    root = os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+    if not root:
+        return None
+    directory = os.path.join(root, namespace)
+    cache = _caches.get(directory)
+    if cache is None:
+        cache = _caches[directory] = DiskCache(directory, _max_entry_bytes())
+    return cache
+
+def file_fingerprint(path):
+    """Identity of a file's current contents for cache keys: absolute path, size and mtime"""
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
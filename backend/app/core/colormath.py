@@ -0,0 +1,66 @@
+import functools
+
+import numpy as np
+
+# Array versions of the scalar color helpers in qr_generator. Every function takes an
+# (..., 3) integer RGB array and reproduces the scalar results exactly, including Python's
+# round-half-even and int() truncation, so the adaptive rules can run once per image.
+
+def hsl_from_rgb_array(rgb):
+    """Vectorized calculate_hsl_from_rgb; returns (h, s, l) int arrays on the 0-240 scale"""
+    rgb = np.asarray(rgb, dtype=np.float64)[..., :3] / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    cmax, cmin = rgb.max(axis=-1), rgb.min(axis=-1)
+    delta = cmax - cmin
+    l = (cmax + cmin) / 2.0
+    chromatic = delta != 0
+    safe_delta = np.where(chromatic, delta, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.where(chromatic & (l != 1) & (l != 0), delta / (1 - np.abs(2 * l - 1)), 0.0)
+    h = np.where(
+        cmax == r,
+        np.mod((g - b) / safe_delta, 6),
+        np.where(cmax == g, ((b - r) / safe_delta) + 2, ((r - g) / safe_delta) + 4),
+    )
+    h = h * 60.0
+    h = np.where(h < 0, h + 360.0, h)
+    h = np.where(chromatic, h, 0.0)
+    h_scaled = np.clip(np.round(h * (240.0 / 360.0)), 0, 240).astype(np.int64)
+    s_scaled = np.clip(np.round(s * 240.0), 0, 240).astype(np.int64)
+    l_scaled = np.clip(np.round(l * 240.0), 0, 240).astype(np.int64)
+    h_scaled[s_scaled == 0] = 0
+    return h_scaled, s_scaled, l_scaled
+
+def reduce_brightness_array(rgb, factor):
+    """Vectorized reduce_rgb_brightness; an alpha channel, if present, is passed through"""
+    factor = max(0.0, min(1.0, factor))
+    rgb = np.array(rgb, dtype=np.int64)
+    rgb[..., :3] = np.maximum(0, (rgb[..., :3] * (1.0 - factor)).astype(np.int64))
+    return rgb
+
+def increase_brightness_array(rgb, factor):
+    """Vectorized increase_rgb_brightness; an alpha channel, if present, is passed through"""
+    factor = max(0.0, min(1.0, factor))
+    rgb = np.array(rgb, dtype=np.int64)
+    channels = rgb[..., :3]
+    rgb[..., :3] = np.clip((channels + (255 - channels) * factor).astype(np.int64), 0, 255)
+    return rgb
+
+@functools.lru_cache(maxsize=256)
+def contrasting_color_pair(colors, luminance_threshold, default_dark_rgb, default_light_rgb):
+    """First palette color darker / lighter than the threshold, as a cached (dark, light) pair.
+
+    colors must be a tuple of RGB tuples so the result can be cached per palette.
+    """
+    dark, light = tuple(default_dark_rgb), tuple(default_light_rgb)
+    if colors:
+        _, _, l = hsl_from_rgb_array(np.array(colors, dtype=np.int64).reshape(-1, 3))
+        for color, lum in zip(colors, l.tolist()):
+            if lum < luminance_threshold and color != (0, 0, 0):
+                dark = color
+                break
+        for color, lum in zip(colors, l.tolist()):
+            if lum > luminance_threshold and color != (255, 255, 255):
+                light = color
+                break
+    return dark, light
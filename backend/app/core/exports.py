@@ -0,0 +1,227 @@
+import base64
+import io
+import json
+import zlib
+
+import numpy as np
+
+from .qr_generator import function_pattern_passes
+from .renderer import QRRenderer, RenderRecord, RenderStyle
+
+# Render sidecars and re-export. Each /api/generate output gets a sidecar (<output>.meta.json)
+# holding its RenderRecord and RenderStyle:
+#   - the module matrix and the mask of drawn data modules, bit-packed
+#   - the adaptive module colors as zlib-compressed RGB bytes
+#   - the finder/alignment colors
+#   - the names of the background and logo uploads
+# Exports redraw the record at any box_size as PNG or WebP, or as SVG with vector modules and
+# patterns over the embedded background, without encoding the data or sampling the background
+# again. A PNG export at the original box_size is identical to the original output.
+
+SIDECAR_SUFFIX = ".meta.json"
+SIDECAR_FORMAT = 1
+EXPORT_FORMATS = ("png", "webp", "svg")
+EXPORT_MEDIA_TYPES = {"png": "image/png", "webp": "image/webp", "svg": "image/svg+xml"}
+
+class Sidecar:
+    """Saved RenderRecord and RenderStyle of an output, and the uploads it was drawn over"""
+    __slots__ = ("record", "style", "background", "logo")
+
+    def __init__(self, record, style, background, logo=None):
+        self.record = record
+        self.style = style
+        self.background = background
+        self.logo = logo
+
+def sidecar_name(output_filename):
+    return output_filename + SIDECAR_SUFFIX
+
+def is_sidecar_name(name):
+    return name.endswith(SIDECAR_SUFFIX)
+
+def _pack_mask(mask):
+    return base64.b64encode(np.packbits(mask, axis=None).tobytes()).decode("ascii")
+
+def _unpack_mask(text, size):
+    bits = np.unpackbits(np.frombuffer(base64.b64decode(text), dtype=np.uint8), count=size * size)
+    return bits.astype(bool).reshape(size, size)
+
+def dump_sidecar(sidecar):
+    record = sidecar.record
+    outer, inner, innermost = record.finder_colors
+    document = {
+        "format": SIDECAR_FORMAT,
+        "version": record.version,
+        "style": sidecar.style.as_dict(),
+        "modules": _pack_mask(record.modules),
+        "drawn": _pack_mask(record.drawn),
+        "module_rgb": None if record.module_rgb is None else base64.b64encode(zlib.compress(record.module_rgb.tobytes(), 9)).decode("ascii"),
+        "finder_colors": [list(outer), [list(color) for color in inner], [list(color) for color in innermost]],
+        "background": sidecar.background,
+        "logo": sidecar.logo,
+    }
+    return json.dumps(document, separators=(",", ":")).encode("utf-8")
+
+def load_sidecar(data):
+    document = json.loads(data)
+    if document.get("format") != SIDECAR_FORMAT:
+        raise ValueError("Unsupported render sidecar format.")
+    version = document["version"]
+    size = version * 4 + 17
+    module_rgb = None
+    if document["module_rgb"] is not None:
+        module_rgb = np.frombuffer(zlib.decompress(base64.b64decode(document["module_rgb"])), dtype=np.uint8).reshape(-1, 3)
+    outer, inner, innermost = document["finder_colors"]
+    record = RenderRecord(
+        version,
+        _unpack_mask(document["modules"], size),
+        _unpack_mask(document["drawn"], size),
+        module_rgb,
+        (tuple(outer), [tuple(color) for color in inner], [tuple(color) for color in innermost]),
+    )
+    return Sidecar(record, RenderStyle.from_dict(document["style"]), document["background"], document.get("logo"))
+
+def _export_renderer(sidecar, box_size, background_cache):
+    style = sidecar.style
+    if box_size is not None and box_size != style.box_size:
+        style = style.resized(box_size)
+    return QRRenderer(style, background_cache=background_cache)
+
+def export_image(sidecar, bg_image_path, logo_path=None, box_size=None, background_cache=None, bg_fingerprint=None):
+    """RGBA image of the sidecar's render at box_size (default: the original)"""
+    renderer = _export_renderer(sidecar, box_size, background_cache)
+    try:
+        background = renderer.prepare_background(bg_image_path, sidecar.record, bg_fingerprint)
+        logo = renderer.prepare_logo(logo_path, sidecar.record) if logo_path else None
+        return renderer.draw(sidecar.record, background, logo)
+    finally:
+        renderer.close()
+
+def save_export(sidecar, output_format, fp, bg_image_path, logo_path=None, box_size=None, background_cache=None, bg_fingerprint=None):
+    """Write the sidecar's render to fp as png, webp or svg"""
+    if output_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {output_format}")
+    if output_format == "svg":
+        fp.write(export_svg(sidecar, bg_image_path, logo_path, box_size, background_cache, bg_fingerprint))
+        return
+    image = export_image(sidecar, bg_image_path, logo_path, box_size, background_cache, bg_fingerprint)
+    try:
+        if output_format == "webp":
+            image.save(fp, "WEBP", lossless=True)
+        else:
+            image.save(fp, "PNG")
+    finally:
+        image.close()
+
+def _number(value):
+    return f"{value:.6g}"
+
+def _fill(color, attribute="fill"):
+    text = f'{attribute}="#{color[0]:02x}{color[1]:02x}{color[2]:02x}"'
+    if len(color) > 3 and color[3] < 255:
+        text += f' {attribute}-opacity="{_number(color[3] / 255)}"'
+    return text
+
+def _svg_image(image, x, y):
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return (
+        f'<image x="{x}" y="{y}" width="{image.width}" height="{image.height}" '
+        f'xlink:href="data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode("ascii")}"/>\n'
+    )
+
+def _diamond_path(center_x, center_y, half):
+    return (
+        f"M{_number(center_x)} {_number(center_y - half)}L{_number(center_x + half)} {_number(center_y)}"
+        f"L{_number(center_x)} {_number(center_y + half)}L{_number(center_x - half)} {_number(center_y)}Z"
+    )
+
+def _shape_path(shape, center_x, center_y, extent, corner_radius):
+    """Outline of one pattern ring: extent is a radius for circles and an edge length otherwise"""
+    if shape == "circle":
+        return (
+            f"M{_number(center_x - extent)} {_number(center_y)}"
+            f"a{_number(extent)} {_number(extent)} 0 1 0 {_number(2 * extent)} 0"
+            f"a{_number(extent)} {_number(extent)} 0 1 0 {_number(-2 * extent)} 0Z"
+        )
+    half = extent / 2.0
+    x0, y0, x1, y1 = center_x - half, center_y - half, center_x + half, center_y + half
+    radius = min(corner_radius, half) if shape == "rounded_square" else 0
+    if radius < 0.5:
+        return f"M{_number(x0)} {_number(y0)}H{_number(x1)}V{_number(y1)}H{_number(x0)}Z"
+    r = _number(radius)
+    return (
+        f"M{_number(x0 + radius)} {_number(y0)}H{_number(x1 - radius)}A{r} {r} 0 0 1 {_number(x1)} {_number(y0 + radius)}"
+        f"V{_number(y1 - radius)}A{r} {r} 0 0 1 {_number(x1 - radius)} {_number(y1)}"
+        f"H{_number(x0 + radius)}A{r} {r} 0 0 1 {_number(x0)} {_number(y1 - radius)}"
+        f"V{_number(y0 + radius)}A{r} {r} 0 0 1 {_number(x0 + radius)} {_number(y0)}Z"
+    )
+
+def _svg_data_modules(record, style):
+    """One element per drawn data module, with the geometry and colors of draw_data_modules"""
+    box, border, padding = style.box_size, style.border, style.padding
+    dark, light = style.dark_module_color, style.light_module_color
+    rows, cols, is_dark = record.positions()
+    module_rgb = None if record.module_rgb is None else record.module_rgb.tolist()
+    inner_size = box - 2 * padding
+    for index, (r, c, module_dark) in enumerate(zip(rows.tolist(), cols.tolist(), is_dark.tolist())):
+        if module_rgb is not None:
+            fill = tuple(module_rgb[index]) + ((dark[3] if module_dark else light[3]),)
+        else:
+            fill = dark if module_dark else light
+        x0, y0 = (c + border) * box, (r + border) * box
+        center_x, center_y = x0 + box / 2.0, y0 + box / 2.0
+        if style.data_module_shape == "diamond":
+            half_outer = box / 2.0 - padding
+            half_inner = half_outer - style.diamond_border_width
+            if style.diamond_border_width > 0 and half_outer > 0:
+                edge = light if module_dark else dark
+                ring = _diamond_path(center_x, center_y, half_outer)
+                if half_inner > 0:
+                    ring += _diamond_path(center_x, center_y, half_inner)
+                yield f'<path d="{ring}" fill-rule="evenodd" {_fill(edge)}/>\n'
+            if half_inner > 0:
+                yield f'<path d="{_diamond_path(center_x, center_y, half_inner)}" {_fill(fill)}/>\n'
+        elif inner_size > 0 and style.data_module_shape == "square":
+            yield f'<rect x="{x0 + padding}" y="{y0 + padding}" width="{inner_size}" height="{inner_size}" {_fill(fill)}/>\n'
+        elif inner_size > 0 and style.data_module_shape == "circle":
+            yield f'<circle cx="{_number(center_x)}" cy="{_number(center_y)}" r="{_number(inner_size / 2.0)}" {_fill(fill)}/>\n'
+
+def _svg_patterns(shape, ring_extents_px, corner_radius_px, colors_per_center, centers_px):
+    """Pattern rings as even-odd paths, so each ring covers only its own band like the raster stamps"""
+    for colors, (center_x, center_y) in zip(colors_per_center, centers_px):
+        rings = [(extent, color) for extent, color in zip(ring_extents_px, colors) if extent > 0]
+        for index, (extent, color) in enumerate(rings):
+            path = _shape_path(shape, center_x, center_y, extent, corner_radius_px)
+            if index + 1 < len(rings):
+                path += _shape_path(shape, center_x, center_y, rings[index + 1][0], corner_radius_px)
+            yield f'<path d="{path}" fill-rule="evenodd" {_fill(color)}/>\n'
+
+def export_svg(sidecar, bg_image_path, logo_path=None, box_size=None, background_cache=None, bg_fingerprint=None):
+    """SVG of the sidecar's render: the background canvas embedded as PNG, vector modules and patterns, and the logo"""
+    record = sidecar.record
+    renderer = _export_renderer(sidecar, box_size, background_cache)
+    style = renderer.style
+    try:
+        background = renderer.prepare_background(bg_image_path, record, bg_fingerprint)
+        logo = renderer.prepare_logo(logo_path, record) if logo_path else None
+        size = background.size_px
+        parts = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+            f'width="{size}" height="{size}" viewBox="0 0 {size} {size}">\n',
+            _svg_image(background.canvas, 0, 0),
+        ]
+        parts.extend(_svg_data_modules(record, style))
+        passes = function_pattern_passes(
+            record.modules_count, record.alignment_centers, style.box_size, style.border, style.finder_shape,
+            record.finder_colors, style.enable_finder_overlay, style.finder_overlay_padding, style.finder_overlay_color,
+        )
+        for pattern in passes:
+            parts.extend(_svg_patterns(*pattern))
+        if logo is not None:
+            parts.append(_svg_image(logo.image, *logo.origin))
+        parts.append("</svg>\n")
+        return "".join(parts).encode("utf-8")
+    finally:
+        renderer.close()
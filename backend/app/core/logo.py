@@ -0,0 +1,164 @@
+import functools
+
+import numpy as np
+import qrcode.base
+import qrcode.util
+
+from .payloads import plan_encoding
+
+# Logo overlay. The logo sits in a square at the center of the code, and every module in that
+# square (plus a margin of clear modules around it) is left undrawn. Scanners read the hidden
+# data modules as errors, so the square is checked against the Reed-Solomon capacity of each
+# block: walking the standard zigzag placement order gives the codeword, and so the block,
+# behind every module, and no block may lose more codewords than its share of LOGO_EC_BUDGET.
+# Everything here depends only on version, error correction level and logo size, never on the
+# data, so occlusions are computed once and shared.
+
+DEFAULT_LOGO_SCALE = 0.2
+MAX_LOGO_SCALE = 0.4
+DEFAULT_LOGO_MARGIN = 1
+# Share of each block's correctable codewords the logo may use; the rest is left for print and scan damage
+LOGO_EC_BUDGET = 0.8
+
+class LogoTooLarge(ValueError):
+    """The logo hides more codewords than the error correction level can recover"""
+
+@functools.lru_cache(maxsize=None)
+def function_module_mask(version):
+    """Modules reserved for finder, separator, timing, alignment, format and version information (read-only)"""
+    n = version * 4 + 17
+    mask = np.zeros((n, n), dtype=bool)
+    # Finder patterns with their separators and the format information next to them
+    # (the bottom-left block includes the dark module)
+    mask[:9, :9] = True
+    mask[:9, n - 8:] = True
+    mask[n - 8:, :9] = True
+    mask[6, :] = True
+    mask[:, 6] = True
+    positions = qrcode.util.pattern_position(version)
+    if positions:
+        finder_centers = {(positions[0], positions[0]), (positions[0], positions[-1]), (positions[-1], positions[0])}
+        for r in positions:
+            for c in positions:
+                if (r, c) not in finder_centers:
+                    mask[r - 2:r + 3, c - 2:c + 3] = True
+    if version >= 7:
+        mask[:6, n - 11:n - 8] = True
+        mask[n - 11:n - 8, :6] = True
+    mask.flags.writeable = False
+    return mask
+
+@functools.lru_cache(maxsize=None)
+def data_bit_positions(version):
+    """(rows, cols) arrays of every data bit in placement order: two-column strips from the right,
+    alternating up and down (read-only)"""
+    mask = function_module_mask(version)
+    n = mask.shape[0]
+    positions = []
+    upward = True
+    col = n - 1
+    while col > 0:
+        if col == 6:
+            col -= 1
+        for row in (range(n - 1, -1, -1) if upward else range(n)):
+            for c in (col, col - 1):
+                if not mask[row, c]:
+                    positions.append((row, c))
+        upward = not upward
+        col -= 2
+    rows, cols = np.array(positions, dtype=np.int16).T
+    rows.flags.writeable = cols.flags.writeable = False
+    return rows, cols
+
+@functools.lru_cache(maxsize=None)
+def codeword_blocks(version, error_correction):
+    """RS blocks of the version, and the block of each codeword in interleaved (placement) order"""
+    blocks = qrcode.base.rs_blocks(version, error_correction)
+    order = []
+    for index in range(max(block.data_count for block in blocks)):
+        order.extend(k for k, block in enumerate(blocks) if index < block.data_count)
+    for index in range(max(block.total_count - block.data_count for block in blocks)):
+        order.extend(k for k, block in enumerate(blocks) if index < block.total_count - block.data_count)
+    order = np.array(order, dtype=np.int16)
+    order.flags.writeable = False
+    return tuple(blocks), order
+
+class LogoOcclusion:
+    """Modules hidden by a centered logo and the codewords it costs each RS block"""
+    __slots__ = ("version", "error_correction", "scale", "margin", "first", "last", "covered", "block_hits", "block_budget")
+
+    def __init__(self, version, error_correction, scale, margin):
+        n = version * 4 + 17
+        side = max(1, round(n * scale))
+        if (n - side) % 2:
+            side += 1
+        start = (n - side) // 2
+        self.version = version
+        self.error_correction = error_correction
+        self.scale = scale
+        self.margin = margin
+        # Module range drawn over by the logo itself; the margin around it is only left clear
+        self.first, self.last = start, start + side
+        clear_first, clear_last = max(0, start - margin), min(n, start + side + margin)
+        self.covered = np.zeros((n, n), dtype=bool)
+        self.covered[clear_first:clear_last, clear_first:clear_last] = True
+
+        blocks, order = codeword_blocks(version, error_correction)
+        rows, cols = data_bit_positions(version)
+        hit_codewords = np.unique(np.flatnonzero(self.covered[rows, cols]) // 8)
+        # Bits past the last codeword are remainder bits
+        hit_codewords = hit_codewords[hit_codewords < len(order)]
+        self.block_hits = np.bincount(order[hit_codewords], minlength=len(blocks)).tolist()
+        self.block_budget = [int((block.total_count - block.data_count) // 2 * LOGO_EC_BUDGET) for block in blocks]
+
+    @property
+    def fits(self):
+        return all(hits <= budget for hits, budget in zip(self.block_hits, self.block_budget))
+
+    def worst_block(self):
+        """(codewords hit, budget) of the block closest to, or furthest over, its budget"""
+        return max(zip(self.block_hits, self.block_budget), key=lambda pair: pair[0] - pair[1])
+
+    def keep_mask(self, module_rows, module_cols):
+        """True for each listed module that is drawn, False where the logo hides it"""
+        return ~self.covered[module_rows, module_cols]
+
+    def pixel_box(self, border, box_size):
+        """Pixel rectangle (left, top, right, bottom) the logo image is fitted into"""
+        start, end = (self.first + border) * box_size, (self.last + border) * box_size
+        return start, start, end, end
+
+def validate_logo_options(scale, margin):
+    if not (0 < scale <= MAX_LOGO_SCALE):
+        raise ValueError(f"logo_scale must be in (0, {MAX_LOGO_SCALE}].")
+    if margin < 0:
+        raise ValueError("logo_margin cannot be negative.")
+
+@functools.lru_cache(maxsize=256)
+def logo_occlusion(version, error_correction, scale=DEFAULT_LOGO_SCALE, margin=DEFAULT_LOGO_MARGIN):
+    """LogoOcclusion for a centered logo `scale` of the code wide, with `margin` clear modules around it"""
+    validate_logo_options(scale, margin)
+    return LogoOcclusion(version, error_correction, scale, margin)
+
+def check_logo_fits(version, error_correction, scale=DEFAULT_LOGO_SCALE, margin=DEFAULT_LOGO_MARGIN):
+    """LogoOcclusion of the logo, or LogoTooLarge if it hides more than the error correction can recover"""
+    occlusion = logo_occlusion(version, error_correction, scale, margin)
+    if not occlusion.fits:
+        hits, budget = occlusion.worst_block()
+        raise LogoTooLarge(
+            f"A logo at scale {scale:g} hides {hits} codewords of a block that can spare {budget} "
+            f"at version {version}; use a smaller logo_scale or logo_margin, or a higher error_correction level"
+        )
+    return occlusion
+
+def fit_logo_version(version, error_correction, scale=DEFAULT_LOGO_SCALE, margin=DEFAULT_LOGO_MARGIN):
+    """Smallest version, not below `version`, at which the logo fits; small codes have too few
+    codewords per block to lose any, so a logo can move the data up a version or two"""
+    for candidate in range(version, 41):
+        if logo_occlusion(candidate, error_correction, scale, margin).fits:
+            return candidate
+    check_logo_fits(version, error_correction, scale, margin)
+
+def logo_version(data, error_correction, scale=DEFAULT_LOGO_SCALE, margin=DEFAULT_LOGO_MARGIN):
+    """Version data is rendered at with this logo (see fit_logo_version)"""
+    return fit_logo_version(plan_encoding(data, error_correction).version, error_correction, scale, margin)
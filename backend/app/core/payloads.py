@@ -0,0 +1,174 @@
+import qrcode.util
+
+# Structured payload builders and optimal segment encoding.
+#
+# qrcode's add_data picks segments with a regex heuristic. plan_encoding instead splits the
+# payload into numeric / alphanumeric / byte segments with the shortest total bit length for
+# each version range (character-count field widths change at versions 10 and 27). It returns
+# the smallest version that fits, so callers learn the module count before any rendering.
+
+MODE_NAMES = {
+    qrcode.util.MODE_NUMBER: "numeric",
+    qrcode.util.MODE_ALPHA_NUM: "alphanumeric",
+    qrcode.util.MODE_8BIT_BYTE: "byte",
+}
+_MODES = (qrcode.util.MODE_NUMBER, qrcode.util.MODE_ALPHA_NUM, qrcode.util.MODE_8BIT_BYTE)
+_NUMERIC = frozenset(b"0123456789")
+_ALPHANUMERIC = frozenset(qrcode.util.ALPHA_NUM)
+# Per-character cost in sixths of a bit: numeric 10 bits / 3 chars, alphanumeric 11 bits / 2 chars, byte 8 bits
+_CHAR_COST = {qrcode.util.MODE_NUMBER: 20, qrcode.util.MODE_ALPHA_NUM: 33, qrcode.util.MODE_8BIT_BYTE: 48}
+# Version ranges sharing the same character-count field widths
+_VERSION_RANGES = ((1, 9), (10, 26), (27, 40))
+WIFI_SPECIAL_CHARS = ';,:"'
+
+class EncodingPlan:
+    """Chosen segments, version and matrix size for a payload"""
+    __slots__ = ("segments", "version", "modules_count", "bit_length", "capacity_bits", "error_correction")
+
+    def __init__(self, segments, version, bit_length, error_correction):
+        self.segments = segments
+        self.version = version
+        self.modules_count = version * 4 + 17
+        self.bit_length = bit_length
+        self.capacity_bits = qrcode.util.BIT_LIMIT_TABLE[error_correction][version]
+        self.error_correction = error_correction
+
+    def describe(self):
+        return [
+            {"mode": MODE_NAMES[segment.mode], "length": len(segment.data)}
+            for segment in self.segments
+        ]
+
+def _allowed(mode, byte):
+    if mode == qrcode.util.MODE_NUMBER:
+        return byte in _NUMERIC
+    if mode == qrcode.util.MODE_ALPHA_NUM:
+        return byte in _ALPHANUMERIC
+    return True
+
+def _segment_bits(mode, length, version):
+    header = 4 + qrcode.util.length_in_bits(mode, version)
+    if mode == qrcode.util.MODE_NUMBER:
+        return header + (length // 3) * 10 + (0, 4, 7)[length % 3]
+    if mode == qrcode.util.MODE_ALPHA_NUM:
+        return header + (length // 2) * 11 + (length % 2) * 6
+    return header + length * 8
+
+def optimal_segments(data_bytes, version):
+    """Minimum-length segmentation of data_bytes for version's character-count widths.
+
+    Dynamic programme over characters: cost[m] is the cheapest encoding of the prefix whose
+    last segment is in mode m, in sixths of a bit. Switching modes pays the new segment's
+    header.
+    """
+    if not data_bytes:
+        return [qrcode.util.QRData(b"", mode=qrcode.util.MODE_8BIT_BYTE, check_data=False)]
+    headers = {mode: (4 + qrcode.util.length_in_bits(mode, version)) * 6 for mode in _MODES}
+    infinity = float("inf")
+    cost = None
+    # choices[i][m]: mode of character i-1 on the cheapest path that encodes character i in mode m
+    choices = []
+    for byte in data_bytes:
+        new_cost, choice = {}, {}
+        for mode in _MODES:
+            if not _allowed(mode, byte):
+                new_cost[mode] = infinity
+                choice[mode] = mode
+                continue
+            if cost is None:
+                best_prev, best_prev_cost = mode, headers[mode]
+            else:
+                best_prev, best_prev_cost = mode, cost[mode]
+                for prev in _MODES:
+                    if prev != mode and cost[prev] + headers[mode] < best_prev_cost:
+                        best_prev, best_prev_cost = prev, cost[prev] + headers[mode]
+            new_cost[mode] = best_prev_cost + _CHAR_COST[mode]
+            choice[mode] = best_prev
+        cost = new_cost
+        choices.append(choice)
+
+    mode = min(_MODES, key=lambda m: cost[m])
+    char_modes = [0] * len(data_bytes)
+    for index in range(len(data_bytes) - 1, -1, -1):
+        char_modes[index] = mode
+        mode = choices[index][mode]
+
+    segments, start = [], 0
+    for index in range(1, len(data_bytes) + 1):
+        if index == len(data_bytes) or char_modes[index] != char_modes[start]:
+            segments.append(qrcode.util.QRData(data_bytes[start:index], mode=char_modes[start], check_data=False))
+            start = index
+    return segments
+
+def plan_encoding(data, error_correction, min_version=None):
+    """EncodingPlan with the smallest version (not below min_version) that fits data at error_correction"""
+    data_bytes = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+    limits = qrcode.util.BIT_LIMIT_TABLE[error_correction]
+    min_version = min_version or 1
+    for first, last in _VERSION_RANGES:
+        if last < min_version:
+            continue
+        segments = optimal_segments(data_bytes, first)
+        bits = sum(_segment_bits(s.mode, len(s.data), first) for s in segments)
+        for version in range(max(first, min_version), last + 1):
+            if bits <= limits[version]:
+                return EncodingPlan(segments, version, bits, error_correction)
+    raise ValueError("Data too long to fit in a QR code at this error correction level.")
+
+def _escape(value, specials):
+    for char in "\\" + specials:
+        value = value.replace(char, "\\" + char)
+    return value
+
+def build_url(url):
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+    scheme, rest = url.split("://", 1)
+    return f"{scheme.lower()}://{rest}"
+
+def build_wifi(ssid, password=None, security="WPA", hidden=False):
+    """Wi-Fi network payload (the de-facto "WIFI:" format read by Android and iOS cameras)"""
+    security = "nopass" if not security or security.lower() == "nopass" else security.upper()
+    parts = [f"T:{security}", "S:" + _escape(ssid, WIFI_SPECIAL_CHARS)]
+    if password and security != "nopass":
+        parts.append("P:" + _escape(password, WIFI_SPECIAL_CHARS))
+    if hidden:
+        parts.append("H:true")
+    return "WIFI:" + ";".join(parts) + ";;"
+
+def build_geo(latitude, longitude, altitude=None):
+    """RFC 5870 geo: URI"""
+    if not (-90.0 <= latitude <= 90.0) or not (-180.0 <= longitude <= 180.0):
+        raise ValueError("Latitude must be within ±90 and longitude within ±180.")
+    coordinates = [f"{latitude:.6f}".rstrip("0").rstrip("."), f"{longitude:.6f}".rstrip("0").rstrip(".")]
+    if altitude is not None:
+        coordinates.append(f"{altitude:g}")
+    return "geo:" + ",".join(coordinates)
+
+def build_vcard(first_name="", last_name="", organization=None, title=None, phones=(), emails=(), url=None, address=None, note=None):
+    """vCard 3.0 contact payload"""
+    if not (first_name or last_name or organization):
+        raise ValueError("A vCard needs a name or an organization.")
+    escape = lambda value: _escape(value, ",;").replace("\n", "\\n")
+    full_name = " ".join(part for part in (first_name, last_name) if part) or organization
+    lines = [
+        "BEGIN:VCARD",
+        "VERSION:3.0",
+        f"N:{escape(last_name)};{escape(first_name)};;;",
+        f"FN:{escape(full_name)}",
+    ]
+    if organization:
+        lines.append(f"ORG:{escape(organization)}")
+    if title:
+        lines.append(f"TITLE:{escape(title)}")
+    lines.extend(f"TEL:{escape(phone)}" for phone in phones)
+    lines.extend(f"EMAIL:{escape(email)}" for email in emails)
+    if url:
+        lines.append(f"URL:{escape(build_url(url))}")
+    if address:
+        lines.append(f"ADR:;;{escape(address)};;;;")
+    if note:
+        lines.append(f"NOTE:{escape(note)}")
+    lines.append("END:VCARD")
+    return "\r\n".join(lines)
@@ -1,11 +1,21 @@
 import qrcode
 import qrcode.util
+import numpy as np
 from PIL import Image, ImageDraw, UnidentifiedImageError
+import importlib.util
 import os
+import collections
+import functools
 import io
+import json
 import math
 import threading
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import file_fingerprint, get_cache
+from .colormath import hsl_from_rgb_array, reduce_brightness_array, increase_brightness_array, contrasting_color_pair
+from .logo import DEFAULT_LOGO_MARGIN, DEFAULT_LOGO_SCALE
 
 # Configuration Constants
 DEBUG_CONTAINED_MODE = False
@@ -39,12 +49,28 @@ DEFAULT_LIGHT_MODULE_COLOR = (255, 255, 255, 240)
 DEFAULT_BACKGROUND_ALPHA = 255
 LUMINOSITY_THRESHOLD = 70
 BRIGHTNESS_FILTER = 225
-SVG_SUPPORT = True
+# Threads per render for band-parallel sampling and drawing (1 renders serially); read on first use
+RENDER_THREADS_ENV = "QR_RENDER_THREADS"
+DEFAULT_RENDER_THREADS = 1
+MIN_BAND_ROWS = 8
+# Memory held by cached finder/alignment stamps per process (a box_size 100 finder is about 2 MB)
+PATTERN_STAMP_CACHE_BYTES = 32 * 1024 * 1024
+# Background canvases are cached as PNG; canvases whose raw RGBA size is more than this many
+# times the cache's entry limit are not encoded at all
+CANVAS_CACHE_MAX_COMPRESSION = 8
+# cairosvg loads Cairo's native libraries on import, so only probe for it here and import it on first SVG use
+SVG_SUPPORT = importlib.util.find_spec("cairosvg") is not None
+_cairosvg = None
 
-try:
-    import cairosvg
-except ImportError:
-    SVG_SUPPORT = False
+def get_cairosvg():
+    global _cairosvg
+    if _cairosvg is None:
+        try:
+            import cairosvg
+        except (ImportError, OSError) as e:
+            raise ValueError(f"SVG support unavailable: {e}")
+        _cairosvg = cairosvg
+    return _cairosvg
 
 def calculate_hsl_from_rgb(r_in, g_in, b_in):
     if not all(isinstance(x, (int, float)) for x in [r_in, g_in, b_in]):
@@ -109,58 +135,97 @@ def increase_rgb_brightness(rgb_tuple, factor):
     else:
         return rgb_tuple
 
-def get_dominant_colors(img, resize_thumbnail=(150, 150), num_colors_to_quantize=16):
+class DominantPalette:
+    """Dominant colors ordered by frequency, with HSL saturation and luminance precomputed per color.
+
+    Iterates and indexes like the plain list of RGB tuples that get_dominant_colors returns.
+    """
+    __slots__ = ("colors", "saturation", "luminance")
+
+    def __init__(self, colors):
+        self.colors = [tuple(c) for c in colors] or [(0, 0, 0)]
+        _, saturation, luminance = hsl_from_rgb_array(np.array(self.colors, dtype=np.int64))
+        self.saturation = saturation.tolist()
+        self.luminance = luminance.tolist()
+
+    @classmethod
+    def from_colors(cls, colors):
+        if isinstance(colors, cls):
+            return colors
+        if not isinstance(colors, (list, tuple)):
+            return cls([(0, 0, 0)] * 3)
+        return cls([c for c in colors if isinstance(c, tuple) and len(c) == 3] or [(0, 0, 0)])
+
+    def __iter__(self):
+        return iter(self.colors)
+
+    def __len__(self):
+        return len(self.colors)
+
+    def __getitem__(self, index):
+        return self.colors[index]
+
+def _thumbnail_size(width, height, max_size):
+    # Same target size Image.thumbnail would pick, without mutating (or copying) the source
+    x, y = max_size
+    if x >= width and y >= height:
+        return width, height
+    aspect = width / height
+    if x / y >= aspect:
+        x = max(min(math.floor(y * aspect), math.ceil(y * aspect), key=lambda n: abs(aspect - n / y)), 1)
+    else:
+        y = max(min(math.floor(x / aspect), math.ceil(x / aspect), key=lambda n: 0 if n == 0 else abs(aspect - x / n)), 1)
+    return x, y
+
+def analyze_dominant_colors(img, resize_thumbnail=(150, 150), num_colors_to_quantize=16):
+    """Median-cut the dominant colors of a reduced view of img; RGB sources are never copied"""
     try:
-        img_rgb = img.convert("RGB")
+        # Drop alpha before resizing: Pillow resizes RGBA with premultiplied alpha, which would
+        # shift the colors of (semi-)transparent backgrounds
+        img_rgb = img if img.mode == "RGB" else img.convert("RGB")
+        thumb_size = _thumbnail_size(img_rgb.width, img_rgb.height, resize_thumbnail)
+        if thumb_size == img_rgb.size:
+            img_small = img_rgb
+        else:
+            img_small = img_rgb.resize(thumb_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+            if img_rgb is not img:
+                img_rgb.close()
     except Exception:
-        return [(0, 0, 0)] * 3
-    img_thumb = img_rgb.copy()
-    img_thumb.thumbnail(resize_thumbnail, Image.Resampling.LANCZOS)
-    quantized_img, colors_with_counts = None, None
+        return DominantPalette([(0, 0, 0)] * 3)
+
+    dom_cols = []
     try:
-        quantized_img = img_thumb.quantize(
+        quantized_img = img_small.quantize(
             colors=num_colors_to_quantize, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE
         )
-        colors_with_counts = quantized_img.getcolors(maxcolors=img_thumb.size[0] * img_thumb.size[1])
+        colors_with_counts = quantized_img.getcolors(maxcolors=img_small.size[0] * img_small.size[1])
+        palette = np.frombuffer(bytes(quantized_img.getpalette() or b""), dtype=np.uint8)
+        if colors_with_counts and palette.size:
+            counts, indices = np.array(colors_with_counts, dtype=np.int64).T
+            indices = indices[np.argsort(-counts, kind="stable")]
+            indices = indices[indices * 3 + 3 <= palette.size][:num_colors_to_quantize]
+            rgb = palette[:(palette.size // 3) * 3].reshape(-1, 3)[indices]
+            dom_cols = [tuple(int(v) for v in row) for row in rgb]
     except Exception:
         pass
-    
-    dom_cols = []
-    if colors_with_counts and quantized_img:
-        colors_with_counts.sort(key=lambda item: item[0], reverse=True)
-        palette = quantized_img.getpalette()
-        if palette:
-            indices_seen = set()
-            palette_list = list(palette) if isinstance(palette, (bytes, list)) else []
-            for count, index in colors_with_counts:
-                if index in indices_seen or not palette_list:
-                    continue
-                start_idx, end_idx = index * 3, index * 3 + 3
-                if end_idx <= len(palette_list):
-                    dominant_color_rgb = tuple(palette_list[start_idx:end_idx])
-                    if len(dominant_color_rgb) == 3 and all(isinstance(c, int) for c in dominant_color_rgb):
-                        dom_cols.append(dominant_color_rgb)
-                        indices_seen.add(index)
-                if len(dom_cols) >= num_colors_to_quantize:
-                    break
-    
+
     if not dom_cols:
         try:
-            pixel_val = img_rgb.getpixel((0, 0))
-            if isinstance(pixel_val, tuple) and len(pixel_val) >= 3 and all(isinstance(c, int) for c in pixel_val[:3]):
-                dom_cols = [pixel_val[:3]]
+            pixel_val = img_small.getpixel((0, 0))
+            if isinstance(pixel_val, tuple) and len(pixel_val) >= 3:
+                dom_cols = [tuple(int(c) for c in pixel_val[:3])]
             elif isinstance(pixel_val, int):
                 dom_cols = [(pixel_val, pixel_val, pixel_val)]
-            else:
-                dom_cols = [(0, 0, 0)]
         except Exception:
-            dom_cols = [(0, 0, 0)]
-    
+            pass
     if not dom_cols:
-        dom_cols.append((0, 0, 0))
+        dom_cols = [(0, 0, 0)]
     while len(dom_cols) < 3:
         dom_cols.append(dom_cols[-1])
-    return dom_cols[:num_colors_to_quantize]
+    return DominantPalette(dom_cols)
+
+def get_dominant_colors(img, resize_thumbnail=(150, 150), num_colors_to_quantize=16):
+    return list(analyze_dominant_colors(img, resize_thumbnail, num_colors_to_quantize))
 
 def get_prominent_color_in_region(image, center_x, center_y, radius):
     try:
@@ -219,35 +284,47 @@ def get_prominent_color_in_region(image, center_x, center_y, radius):
         return (128, 128, 128)
 
 def get_contrasting_color(dominant_colors_list, type, luminance_threshold, default_dark_rgba, default_light_rgba):
-    suitable_color = None
     default_dark_rgb = default_dark_rgba[:3] if len(default_dark_rgba) >= 3 else (0, 0, 0)
     default_light_rgb = default_light_rgba[:3] if len(default_light_rgba) >= 3 else (255, 255, 255)
-    
-    if type == "dark":
-        for color_tuple in dominant_colors_list:
-            if isinstance(color_tuple, tuple) and len(color_tuple) == 3:
-                r, g, b = color_tuple
-                try:
-                    h, s, l = calculate_hsl_from_rgb(r, g, b)
-                    if l < luminance_threshold and color_tuple != (0, 0, 0):
-                        suitable_color = color_tuple
-                        break
-                except Exception:
-                    continue
-        return suitable_color if suitable_color else default_dark_rgb
-    elif type == "light":
-        for color_tuple in dominant_colors_list:
-            if isinstance(color_tuple, tuple) and len(color_tuple) == 3:
-                r, g, b = color_tuple
-                try:
-                    h, s, l = calculate_hsl_from_rgb(r, g, b)
-                    if l > luminance_threshold and color_tuple != (255, 255, 255):
-                        suitable_color = color_tuple
-                        break
-                except Exception:
-                    continue
-        return suitable_color if suitable_color else default_light_rgb
-    return default_dark_rgb
+    palette = DominantPalette.from_colors(dominant_colors_list)
+    dark_rgb, light_rgb = contrasting_color_pair(tuple(palette.colors), luminance_threshold, tuple(default_dark_rgb), tuple(default_light_rgb))
+    return light_rgb if type == "light" else dark_rgb
+
+def compute_adaptive_module_colors(local_colors, is_dark, dominant_colors, dark_module_color, light_module_color):
+    """Apply the adaptive data-module color rules to all modules at once.
+
+    local_colors is an (N, 3) array of the prominent background color under each module and
+    is_dark the matching (N,) boolean array; returns an (N, 3) int array of module colors.
+    """
+    local = np.asarray(local_colors, dtype=np.int64).reshape(-1, 3)
+    is_dark = np.asarray(is_dark, dtype=bool)
+    palette = DominantPalette.from_colors(dominant_colors)
+    contrast_dark, contrast_light = contrasting_color_pair(
+        tuple(palette.colors), ADAPTIVE_LUMINANCE_THRESHOLD, tuple(dark_module_color[:3]), tuple(light_module_color[:3])
+    )
+    _, _, l = hsl_from_rgb_array(local)
+    near_white = (local >= ADAPTIVE_NEAR_WHITE_THRESHOLD).all(axis=1)
+    near_black = (local <= ADAPTIVE_NEAR_BLACK_THRESHOLD).all(axis=1)
+    is_light = ~is_dark
+
+    result = local.copy()
+    darken = is_dark & ~near_white & (l >= ADAPTIVE_LUMINANCE_THRESHOLD)
+    lighten = is_light & ~near_black & (l < ADAPTIVE_LUMINANCE_THRESHOLD)
+    result[darken] = reduce_brightness_array(local[darken], ADAPTIVE_DARKEN_FACTOR)
+    result[lighten] = increase_brightness_array(local[lighten], ADAPTIVE_LIGHTEN_FACTOR)
+    result[is_dark & near_white] = contrast_dark
+    result[is_light & near_black] = contrast_light
+    return result
+
+def get_reserved_module_mask(matrix_size, alignment_centers):
+    """Boolean matrix marking finder and alignment pattern modules, which the data loop skips"""
+    mask = np.zeros((matrix_size, matrix_size), dtype=bool)
+    mask[:7, :7] = True
+    mask[:7, matrix_size - 7:] = True
+    mask[matrix_size - 7:, :7] = True
+    for center_r, center_c in alignment_centers or []:
+        mask[max(0, center_r - 2):center_r + 3, max(0, center_c - 2):center_c + 3] = True
+    return mask
 
 def is_finder_pattern_module(r, c, matrix_size):
     if 0 <= r < 7 and 0 <= c < 7:
@@ -292,10 +369,10 @@ def determine_finder_colors(dominant_colors, finder_color_mode, finder_dynamic_s
     black_color_rgba = (0, 0, 0, 225)
     white_color_rgba = (255, 255, 255, 225)
     
-    if not isinstance(dominant_colors, list):
-        dominant_colors = [(0, 0, 0)] * 3
+    palette = DominantPalette.from_colors(dominant_colors)
+    dominant_colors = list(palette.colors)
     while len(dominant_colors) < 3:
-        dominant_colors.append(dominant_colors[-1] if dominant_colors else (0, 0, 0))
+        dominant_colors.append(dominant_colors[-1])
 
     if finder_color_mode == "static":
         inner_color_list = [white_color_rgba] * 3
@@ -303,16 +380,9 @@ def determine_finder_colors(dominant_colors, finder_color_mode, finder_dynamic_s
     elif finder_color_mode == "dynamic":
         if finder_dynamic_submode == "single-color":
             bright_suitable_colors = []
-            for color_tuple in dominant_colors:
-                if not (isinstance(color_tuple, tuple) and len(color_tuple) == 3):
-                    continue
-                r, g, b = color_tuple
+            for (r, g, b), s, l in zip(palette.colors, palette.saturation, palette.luminance):
                 if r >= BRIGHTNESS_FILTER and g >= BRIGHTNESS_FILTER and b >= BRIGHTNESS_FILTER:
                     continue
-                try:
-                    h, s, l = calculate_hsl_from_rgb(r, g, b)
-                except Exception:
-                    continue
                 if l > LUMINOSITY_THRESHOLD and (s > 20 or l > 150):
                     bright_suitable_colors.append(((r, g, b), l))
             bright_suitable_colors.sort(key=lambda item: item[1], reverse=True)
@@ -412,7 +482,134 @@ def _draw_single_shape_rounded_square(draw, center_x, center_y, size_px, corner_
         except Exception:
             pass
 
-def draw_finder_patterns(final_image, matrix_size, module_size, border_modules, finder_shape, outer_color, inner_color_list, innermost_color_list, enable_overlay, overlay_padding_px, overlay_color):
+PATTERN_SHAPES = ("circle", "square", "rounded_square")
+
+def _draw_pattern_rings(draw, shape, center_x, center_y, ring_extents_px, corner_radius_px, colors):
+    # ring_extents_px are radii for circles and edge lengths otherwise, outermost first
+    for extent_px, color in zip(ring_extents_px, colors):
+        if shape == "circle":
+            _draw_single_shape_circle(draw, center_x, center_y, extent_px, color)
+        elif shape == "square":
+            _draw_single_shape_square(draw, center_x, center_y, extent_px, color)
+        elif shape == "rounded_square":
+            _draw_single_shape_rounded_square(draw, center_x, center_y, extent_px, corner_radius_px, color)
+
+class StampCache:
+    """Thread-safe LRU of pattern stamps bounded by their total pixel bytes, not by entry count.
+
+    Ring colors are part of the key and change with every background in the adaptive and
+    dynamic modes, so a count-bounded cache of large stamps could grow to gigabytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        stamp = entry[0]
+        size = stamp.width * stamp.height * 4
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = entry
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, (evicted, _, _) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted.width * evicted.height * 4
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+_pattern_stamps = StampCache(PATTERN_STAMP_CACHE_BYTES)
+
+def get_pattern_stamp(shape, ring_extents_px, corner_radius_px, colors, frac_x, frac_y):
+    """Pre-rendered RGBA stamp of one finder/alignment pattern (or overlay), cached across renders.
+
+    frac_x/frac_y are the fractional part of the pattern center, so pasting the stamp at the
+    integer part reproduces exactly what drawing at the full center would. Returns
+    (stamp, offset_x, offset_y), the stamp's top-left relative to the integer center.
+    Stamps are shared, so callers must not modify them.
+    """
+    key = (shape, ring_extents_px, corner_radius_px, colors, frac_x, frac_y)
+    entry = _pattern_stamps.get(key)
+    if entry is None:
+        entry = _draw_pattern_stamp(shape, ring_extents_px, corner_radius_px, colors, frac_x, frac_y)
+        _pattern_stamps.put(key, entry)
+    return entry
+
+def _draw_pattern_stamp(shape, ring_extents_px, corner_radius_px, colors, frac_x, frac_y):
+    half = ring_extents_px[0] if shape == "circle" else ring_extents_px[0] / 2.0
+    offset_x = math.floor(frac_x - half) - 1
+    offset_y = math.floor(frac_y - half) - 1
+    width = math.ceil(frac_x + half) + 2 - offset_x
+    height = math.ceil(frac_y + half) + 2 - offset_y
+    stamp = Image.new("RGBA", (max(1, width), max(1, height)), (0, 0, 0, 0))
+    _draw_pattern_rings(ImageDraw.Draw(stamp), shape, frac_x - offset_x, frac_y - offset_y, ring_extents_px, corner_radius_px, colors)
+    return stamp, offset_x, offset_y
+
+def _place_stamp(shape, ring_extents_px, corner_radius_px, colors, center_x_px, center_y_px):
+    base_x, base_y = math.floor(center_x_px), math.floor(center_y_px)
+    stamp, offset_x, offset_y = get_pattern_stamp(
+        shape, ring_extents_px, corner_radius_px, colors, center_x_px - base_x, center_y_px - base_y
+    )
+    x0, y0 = base_x + offset_x, base_y + offset_y
+    return stamp, (x0, y0, x0 + stamp.width, y0 + stamp.height)
+
+def _composite_stamp(final_image, stamp, box):
+    x0, y0, x1, y1 = box
+    src_x0, src_y0 = max(0, -x0), max(0, -y0)
+    src_x1, src_y1 = stamp.width - max(0, x1 - final_image.width), stamp.height - max(0, y1 - final_image.height)
+    if src_x1 <= src_x0 or src_y1 <= src_y0:
+        return
+    final_image.alpha_composite(stamp, dest=(max(0, x0), max(0, y0)), source=(src_x0, src_y0, src_x1, src_y1))
+
+def composite_patterns(final_image, shape, ring_extents_px, corner_radius_px, colors_per_center, centers_px):
+    """Composite one pattern per center onto final_image, pasting cached stamps where possible.
+
+    If any two stamps would overlap (only possible with very large overlay padding), everything
+    is drawn on one full-size layer instead, so the output is identical either way.
+    """
+    ring_extents_px = tuple(ring_extents_px)
+    placed = [
+        _place_stamp(shape, ring_extents_px, corner_radius_px, tuple(colors), center_x_px, center_y_px)
+        for colors, (center_x_px, center_y_px) in zip(colors_per_center, centers_px)
+    ]
+    overlapping = any(
+        a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+        for i, (_, a) in enumerate(placed)
+        for _, b in placed[i + 1:]
+    )
+    if not overlapping:
+        for stamp, box in placed:
+            _composite_stamp(final_image, stamp, box)
+        return
+
+    layer = Image.new("RGBA", final_image.size, (0, 0, 0, 0))
+    layer_draw = ImageDraw.Draw(layer)
+    for colors, (center_x_px, center_y_px) in zip(colors_per_center, centers_px):
+        _draw_pattern_rings(layer_draw, shape, center_x_px, center_y_px, ring_extents_px, corner_radius_px, colors)
+    final_image.alpha_composite(layer)
+    del layer_draw, layer
+
+def finder_pattern_passes(matrix_size, module_size, border_modules, finder_shape, outer_color, inner_color_list, innermost_color_list, enable_overlay, overlay_padding_px, overlay_color):
+    """Finder overlay and finder pattern passes, in drawing order.
+
+    Each pass is (shape, ring_extents_px, corner_radius_px, colors_per_center, centers_px), the
+    arguments of composite_patterns after the image.
+    """
     finder_base_size_modules = 7
     center_offset_modules = 3.5
     centers_px = []
@@ -421,141 +618,55 @@ def draw_finder_patterns(final_image, matrix_size, module_size, border_modules,
     tr_cx = ((matrix_size - finder_base_size_modules) + center_offset_modules + border_modules) * module_size
     bl_cy = ((matrix_size - finder_base_size_modules) + center_offset_modules + border_modules) * module_size
     centers_px.extend([(tl_cx, tl_cy), (tr_cx, tl_cy), (tl_cx, bl_cy)])
+    shape_to_draw = finder_shape if finder_shape in PATTERN_SHAPES else "square"
+    base_size_px = finder_base_size_modules * module_size
+    passes = []
 
     if enable_overlay and overlay_padding_px >= 0:
-        overlay_layer = Image.new("RGBA", final_image.size, (0, 0, 0, 0))
-        overlay_draw = ImageDraw.Draw(overlay_layer)
-        base_size_px = finder_base_size_modules * module_size
-        shape_to_draw_overlay = finder_shape if finder_shape in ["circle", "square", "rounded_square"] else "square"
-        overlay_radius_px, overlay_size_px, overlay_corner_radius_px = 0, 0, 0
-        if shape_to_draw_overlay == "circle":
-            overlay_radius_px = (base_size_px / 2.0) + overlay_padding_px
-        elif shape_to_draw_overlay in ["square", "rounded_square"]:
-            overlay_size_px = base_size_px + (2 * overlay_padding_px)
-            if shape_to_draw_overlay == "rounded_square":
+        overlay_corner_radius_px = 0
+        if shape_to_draw == "circle":
+            overlay_extent_px = (base_size_px / 2.0) + overlay_padding_px
+        else:
+            overlay_extent_px = base_size_px + (2 * overlay_padding_px)
+            if shape_to_draw == "rounded_square":
                 base_corner_radius = module_size * ROUNDED_RADIUS_FACTOR
-                overlay_corner_radius_px = max(0, min(base_corner_radius, overlay_size_px / 2.0))
-        for center_x_px, center_y_px in centers_px:
-            try:
-                if shape_to_draw_overlay == "circle":
-                    _draw_single_shape_circle(overlay_draw, center_x_px, center_y_px, overlay_radius_px, overlay_color)
-                elif shape_to_draw_overlay == "square":
-                    _draw_single_shape_square(overlay_draw, center_x_px, center_y_px, overlay_size_px, overlay_color)
-                elif shape_to_draw_overlay == "rounded_square":
-                    _draw_single_shape_rounded_square(overlay_draw, center_x_px, center_y_px, overlay_size_px, overlay_corner_radius_px, overlay_color)
-            except Exception:
-                pass
-        if final_image.mode != "RGBA":
-            final_image = final_image.convert("RGBA")
-        final_image.alpha_composite(overlay_layer)
-        del overlay_draw, overlay_layer
+                overlay_corner_radius_px = max(0, min(base_corner_radius, overlay_extent_px / 2.0))
+        passes.append((shape_to_draw, (overlay_extent_px,), overlay_corner_radius_px, [(overlay_color,)] * 3, centers_px))
 
-    pattern_layer = Image.new("RGBA", final_image.size, (0, 0, 0, 0))
-    pattern_draw = ImageDraw.Draw(pattern_layer)
-    finder_sizes_sq = [7.0 * module_size, 5.0 * module_size, 3.0 * module_size]
-    finder_radii_circ = [3.5 * module_size, 2.5 * module_size, 1.5 * module_size]
+    if shape_to_draw == "circle":
+        ring_extents_px = (3.5 * module_size, 2.5 * module_size, 1.5 * module_size)
+    else:
+        ring_extents_px = (7.0 * module_size, 5.0 * module_size, 3.0 * module_size)
     pattern_corner_radius_px = module_size * ROUNDED_RADIUS_FACTOR
-    shape_to_draw = finder_shape if finder_shape in ["circle", "square", "rounded_square"] else "square"
+    colors_per_center = [(outer_color, inner_color_list[i], innermost_color_list[i]) for i in range(len(centers_px))]
+    passes.append((shape_to_draw, ring_extents_px, pattern_corner_radius_px, colors_per_center, centers_px))
+    return passes
 
-    for i, (center_x_px, center_y_px) in enumerate(centers_px):
-        pattern_colors = [outer_color, inner_color_list[i], innermost_color_list[i]]
-        if shape_to_draw == "circle":
-            for layer_idx, radius_px in enumerate(finder_radii_circ):
-                _draw_single_shape_circle(pattern_draw, center_x_px, center_y_px, radius_px, pattern_colors[layer_idx])
-        elif shape_to_draw == "square":
-            for layer_idx, size_px in enumerate(finder_sizes_sq):
-                _draw_single_shape_square(pattern_draw, center_x_px, center_y_px, size_px, pattern_colors[layer_idx])
-        elif shape_to_draw == "rounded_square":
-            for layer_idx, size_px in enumerate(finder_sizes_sq):
-                _draw_single_shape_rounded_square(pattern_draw, center_x_px, center_y_px, size_px, pattern_corner_radius_px, pattern_colors[layer_idx])
-
-    if final_image.mode != "RGBA":
-        final_image = final_image.convert("RGBA")
-    final_image.alpha_composite(pattern_layer)
-    del pattern_draw, pattern_layer
-
-def draw_alignment_patterns(final_image, alignment_centers, module_size, border_modules, pattern_shape, outer_color, inner_color, innermost_color):
+def alignment_pattern_passes(alignment_centers, module_size, border_modules, pattern_shape, outer_color, inner_color, innermost_color):
+    """Alignment pattern pass (see finder_pattern_passes), or none without alignment patterns"""
     if not alignment_centers:
-        return
-    align_pattern_layer = Image.new("RGBA", final_image.size, (0, 0, 0, 0))
-    align_pattern_draw = ImageDraw.Draw(align_pattern_layer)
-    align_sizes_sq = [5.0 * module_size, 3.0 * module_size, 1.0 * module_size]
-    align_radii_circ = [2.5 * module_size, 1.5 * module_size, 0.5 * module_size]
-    pattern_colors = [outer_color, inner_color, innermost_color]
+        return []
+    shape_to_draw = pattern_shape if pattern_shape in PATTERN_SHAPES else "square"
+    if shape_to_draw == "circle":
+        ring_extents_px = (2.5 * module_size, 1.5 * module_size, 0.5 * module_size)
+    else:
+        ring_extents_px = (5.0 * module_size, 3.0 * module_size, 1.0 * module_size)
     pattern_corner_radius_px = module_size * ROUNDED_RADIUS_FACTOR
-    shape_to_draw = pattern_shape if pattern_shape in ["circle", "square", "rounded_square"] else "square"
-
-    for center_r, center_c in alignment_centers:
-        center_x_px = (center_c + border_modules + 0.5) * module_size
-        center_y_px = (center_r + border_modules + 0.5) * module_size
-        if shape_to_draw == "circle":
-            for layer_idx, radius_px in enumerate(align_radii_circ):
-                _draw_single_shape_circle(align_pattern_draw, center_x_px, center_y_px, radius_px, pattern_colors[layer_idx])
-        elif shape_to_draw == "square":
-            for layer_idx, size_px in enumerate(align_sizes_sq):
-                _draw_single_shape_square(align_pattern_draw, center_x_px, center_y_px, size_px, pattern_colors[layer_idx])
-        elif shape_to_draw == "rounded_square":
-            for layer_idx, size_px in enumerate(align_sizes_sq):
-                _draw_single_shape_rounded_square(align_pattern_draw, center_x_px, center_y_px, size_px, pattern_corner_radius_px, pattern_colors[layer_idx])
-
-    if final_image.mode != "RGBA":
-        final_image = final_image.convert("RGBA")
-    final_image.alpha_composite(align_pattern_layer)
-    del align_pattern_draw, align_pattern_layer
-
-def create_qr_code(
-    data,
-    bg_image_path,
-    output_path,
-    background_image_mode=DEFAULT_BACKGROUND_IMAGE_MODE,
-    finder_shape=DEFAULT_FINDER_PATTERN_SHAPE,
-    finder_color_mode=DEFAULT_FINDER_COLOR_MODE,
-    finder_dynamic_submode=DEFAULT_FINDER_DYNAMIC_SUBMODE,
-    reduce_innermost_brightness=REDUCE_INNERMOST_BRIGHTNESS,
-    print_lock=None,
-    data_module_shape=DATA_MODULE_SHAPE,
-    data_module_color_mode=DATA_MODULE_COLOR_MODE,
-    box_size=DEFAULT_BOX_SIZE,
-    border=DEFAULT_BORDER,
-    padding=DEFAULT_PADDING,
-    diamond_border_width=DEFAULT_DIAMOND_BORDER_WIDTH,
-    error_correction=DEFAULT_ERROR_CORRECTION,
-    dark_module_color=DEFAULT_DARK_MODULE_COLOR,
-    light_module_color=DEFAULT_LIGHT_MODULE_COLOR,
-    background_alpha=DEFAULT_BACKGROUND_ALPHA,
-    background_padding=BACKGROUND_PADDING_PX,
-    enable_finder_overlay=ENABLE_FINDER_OVERLAY,
-    finder_overlay_padding=FINDER_OVERLAY_PADDING_PX,
-    finder_overlay_color=FINDER_OVERLAY_COLOR,
-):
-    if padding < 0:
-        raise ValueError("Padding cannot be negative.")
-    if data_module_shape == "diamond":
-        if diamond_border_width < 0:
-            raise ValueError("Diamond border width cannot be negative.")
-        if (padding + diamond_border_width) * 2 > box_size:
-            raise ValueError(f"Padding+Border too large for box_size.")
-    elif (padding * 2) > box_size:
-        raise ValueError(f"Padding too large for box_size.")
-    if not (0 <= background_alpha <= 255):
-        raise ValueError("background_alpha must be 0-255.")
-
-    qr = qrcode.QRCode(version=None, error_correction=error_correction, box_size=box_size, border=border)
-    qr.add_data(data)
-    qr.make(fit=True)
-    qr_matrix = qr.modules
-    matrix_size = qr.modules_count
-    final_border_size_modules = qr.border
-    qr_version = qr.version
-    alignment_centers = get_alignment_pattern_centers(qr_version)
-    main_size_px = (matrix_size + 2 * final_border_size_modules) * box_size
+    centers_px = [
+        ((center_c + border_modules + 0.5) * module_size, (center_r + border_modules + 0.5) * module_size)
+        for center_r, center_c in alignment_centers
+    ]
+    colors = (outer_color, inner_color, innermost_color)
+    return [(shape_to_draw, ring_extents_px, pattern_corner_radius_px, [colors] * len(centers_px), centers_px)]
 
+def load_background_image(bg_image_path):
+    """Open (or rasterize, for SVG) the background image and return it as RGBA"""
     bg_img = None
     bg_img_orig = None
     try:
         is_svg = bg_image_path.lower().endswith(".svg")
         if is_svg and SVG_SUPPORT:
-            png_data = cairosvg.svg2png(url=bg_image_path)
+            png_data = get_cairosvg().svg2png(url=bg_image_path)
             bg_img_orig = Image.open(io.BytesIO(png_data))
         elif is_svg and not SVG_SUPPORT:
             raise ValueError("SVG file provided but SVG support disabled.")
@@ -574,8 +685,10 @@ def create_qr_code(
                 pass
     if bg_img is None:
         raise ValueError("Background image could not be loaded or converted.")
+    return bg_img
 
-    dominant_colors = get_dominant_colors(bg_img.copy(), num_colors_to_quantize=10)
+def compose_background_canvas(bg_img, main_size_px, background_image_mode, background_padding, background_alpha):
+    """Lay the background out on an opaque white canvas of the final image size"""
     background_canvas = Image.new("RGBA", (main_size_px, main_size_px), (255, 255, 255, 255))
     padded_width = max(0, main_size_px - 2 * background_padding)
     padded_height = max(0, main_size_px - 2 * background_padding)
@@ -590,7 +703,7 @@ def create_qr_code(
             elif background_image_mode == "Contained":
                 target_contained_box_width = padded_width * math.sqrt(0.40)
                 target_contained_box_height = padded_height * math.sqrt(0.40)
-                bg_img_thumb = bg_img.copy()
+                bg_img_thumb = bg_img
                 img_ratio = bg_img_thumb.width / bg_img_thumb.height
                 if target_contained_box_width <= 0 or target_contained_box_height <= 0:
                     resize_width, resize_height = 1, 1
@@ -623,115 +736,382 @@ def create_qr_code(
         except Exception as alpha_err:
             raise ValueError(f"Error applying global background alpha: {alpha_err}")
 
+    return background_canvas
+
+def _encode_cached_canvas(canvas, cache):
+    """Canvas as a fast-compressed PNG for the background cache, or None if it is too large to keep"""
+    if not cache.accepts(canvas.width * canvas.height * 4 // CANVAS_CACHE_MAX_COMPRESSION):
+        # Not even a well-compressing canvas would fit; skip the encode entirely
+        return None
+    buffer = io.BytesIO()
+    canvas.save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue() if cache.accepts(buffer.tell()) else None
+
+def _decode_cached_canvas(data, main_size_px):
+    try:
+        with Image.open(io.BytesIO(data)) as cached:
+            if cached.size != (main_size_px, main_size_px) or cached.mode != "RGBA":
+                return None
+            cached.load()
+            return cached.copy()
+    except (OSError, UnidentifiedImageError):
+        return None
+
+def prepare_background(bg_image_path, main_size_px, background_image_mode, background_padding, background_alpha, cache=None, fingerprint=None):
+    """Return the composed background canvas and the background's DominantPalette.
+
+    With a DiskCache both results are shared across worker processes, keyed by the background
+    file's identity and layout parameters; a full hit skips decoding the image entirely.
+    fingerprint overrides the file's identity, for paths that are temporary copies of a
+    stored object (see StorageBackend.fingerprint).
+    """
+    canvas_key = palette_key = None
+    if cache is not None:
+        fingerprint = fingerprint or file_fingerprint(bg_image_path)
+        palette_key = cache.make_key("palette", fingerprint)
+        canvas_key = cache.make_key("canvas-png", fingerprint, background_image_mode, main_size_px, background_padding, background_alpha)
+        canvas_bytes, palette_bytes = cache.get(canvas_key), cache.get(palette_key)
+        if canvas_bytes is not None and palette_bytes is not None:
+            canvas = _decode_cached_canvas(canvas_bytes, main_size_px)
+            if canvas is not None:
+                return canvas, DominantPalette([tuple(c) for c in json.loads(palette_bytes)])
+
+    bg_img = load_background_image(bg_image_path)
+    try:
+        dominant_colors = analyze_dominant_colors(bg_img, num_colors_to_quantize=10)
+        background_canvas = compose_background_canvas(bg_img, main_size_px, background_image_mode, background_padding, background_alpha)
+    finally:
+        bg_img.close()
+
     final_image = Image.new("RGBA", (main_size_px, main_size_px), (0, 0, 0, 0))
     final_image.alpha_composite(background_canvas)
     del background_canvas
+    if cache is not None:
+        cache.set(palette_key, json.dumps(dominant_colors.colors).encode("utf-8"))
+        canvas_bytes = _encode_cached_canvas(final_image, cache)
+        if canvas_bytes is not None:
+            cache.set(canvas_key, canvas_bytes)
+    return final_image, dominant_colors
 
-    data_module_layer = Image.new("RGBA", final_image.size, (0, 0, 0, 0))
-    draw_data = ImageDraw.Draw(data_module_layer)
-
-    for r in range(matrix_size):
-        for c in range(matrix_size):
-            if is_finder_pattern_module(r, c, matrix_size):
-                continue
-            if is_alignment_pattern_module(r, c, alignment_centers):
-                continue
-            is_dark = qr_matrix[r][c]
-            fill_color, border_color = None, None
-
-            if data_module_color_mode == "adaptive":
-                center_x = (c + final_border_size_modules + 0.5) * box_size
-                center_y = (r + final_border_size_modules + 0.5) * box_size
-                local_prominent_rgb = get_prominent_color_in_region(final_image, center_x, center_y, ADAPTIVE_COLOR_RADIUS)
-                if not (isinstance(local_prominent_rgb, tuple) and len(local_prominent_rgb) == 3):
-                    local_prominent_rgb = (128, 128, 128)
-                try:
-                    h, s, l = calculate_hsl_from_rgb(*local_prominent_rgb)
-                except Exception:
-                    l = 120
-                r_loc, g_loc, b_loc = local_prominent_rgb
-                final_module_rgb = None
-                if is_dark:
-                    if (r_loc >= ADAPTIVE_NEAR_WHITE_THRESHOLD and g_loc >= ADAPTIVE_NEAR_WHITE_THRESHOLD and b_loc >= ADAPTIVE_NEAR_WHITE_THRESHOLD):
-                        final_module_rgb = get_contrasting_color(dominant_colors, "dark", ADAPTIVE_LUMINANCE_THRESHOLD, dark_module_color, light_module_color)
-                    elif l >= ADAPTIVE_LUMINANCE_THRESHOLD:
-                        final_module_rgb = reduce_rgb_brightness(local_prominent_rgb, ADAPTIVE_DARKEN_FACTOR)
-                    else:
-                        final_module_rgb = local_prominent_rgb
-                else:
-                    if (r_loc <= ADAPTIVE_NEAR_BLACK_THRESHOLD and g_loc <= ADAPTIVE_NEAR_BLACK_THRESHOLD and b_loc <= ADAPTIVE_NEAR_BLACK_THRESHOLD):
-                        final_module_rgb = get_contrasting_color(dominant_colors, "light", ADAPTIVE_LUMINANCE_THRESHOLD, dark_module_color, light_module_color)
-                    elif l < ADAPTIVE_LUMINANCE_THRESHOLD:
-                        final_module_rgb = increase_rgb_brightness(local_prominent_rgb, ADAPTIVE_LIGHTEN_FACTOR)
-                    else:
-                        final_module_rgb = local_prominent_rgb
-                if not (isinstance(final_module_rgb, tuple) and len(final_module_rgb) == 3):
-                    final_module_rgb = dark_module_color[:3] if is_dark else light_module_color[:3]
-                alpha_comp = dark_module_color[3] if is_dark else light_module_color[3]
-                fill_color = final_module_rgb + (alpha_comp,)
-                border_color = light_module_color if is_dark else dark_module_color
-            else:
-                fill_color = dark_module_color if is_dark else light_module_color
-                border_color = light_module_color if is_dark else dark_module_color
+def validate_render_options(padding, data_module_shape, diamond_border_width, box_size, background_alpha):
+    if padding < 0:
+        raise ValueError("Padding cannot be negative.")
+    if data_module_shape == "diamond":
+        if diamond_border_width < 0:
+            raise ValueError("Diamond border width cannot be negative.")
+        if (padding + diamond_border_width) * 2 > box_size:
+            raise ValueError(f"Padding+Border too large for box_size.")
+    elif (padding * 2) > box_size:
+        raise ValueError(f"Padding too large for box_size.")
+    if not (0 <= background_alpha <= 255):
+        raise ValueError("background_alpha must be 0-255.")
 
-            x_box_start = (c + final_border_size_modules) * box_size
-            y_box_start = (r + final_border_size_modules) * box_size
-            x_box_end = x_box_start + box_size
-            y_box_end = y_box_start + box_size
-            center_x_draw = x_box_start + box_size / 2.0
-            center_y_draw = y_box_start + box_size / 2.0
-            inner_padding = padding
+def module_bands(module_rows, threads):
+    """Split row-major module positions into runs of whole module rows, as (start, end) index pairs.
 
-            try:
-                if data_module_shape == "diamond":
-                    half_outer_edge = (box_size / 2.0) - padding
-                    half_inner_edge = half_outer_edge - diamond_border_width
-                    if half_outer_edge < 0:
-                        continue
-                    if diamond_border_width > 0 and border_color is not None:
-                        vertices_border = [
-                            (center_x_draw, y_box_start + padding),
-                            (x_box_end - padding, center_y_draw),
-                            (center_x_draw, y_box_end - padding),
-                            (x_box_start + padding, center_y_draw),
-                        ]
-                        if all(coord >= 0 for v in vertices_border for coord in v) and (x_box_end - padding > x_box_start + padding):
-                            draw_data.polygon(vertices_border, fill=border_color)
-                    if half_inner_edge >= 0:
-                        inner_pad_diamond = padding + diamond_border_width
-                        vertices_fill = [
-                            (center_x_draw, y_box_start + inner_pad_diamond),
-                            (x_box_end - inner_pad_diamond, center_y_draw),
-                            (center_x_draw, y_box_end - inner_pad_diamond),
-                            (x_box_start + inner_pad_diamond, center_y_draw),
-                        ]
-                        if all(coord >= 0 for v in vertices_fill for coord in v) and (x_box_end - inner_pad_diamond > x_box_start + inner_pad_diamond):
-                            draw_data.polygon(vertices_fill, fill=fill_color)
-                elif data_module_shape == "square":
-                    sq_x0, sq_y0 = x_box_start + inner_padding, y_box_start + inner_padding
-                    sq_x1, sq_y1 = x_box_end - inner_padding, y_box_end - inner_padding
-                    if sq_x1 > sq_x0 and sq_y1 > sq_y0:
-                        draw_data.rectangle([(sq_x0, sq_y0), (sq_x1, sq_y1)], fill=fill_color)
-                elif data_module_shape == "circle":
-                    circ_x0, circ_y0 = x_box_start + inner_padding, y_box_start + inner_padding
-                    circ_x1, circ_y1 = x_box_end - inner_padding, y_box_end - inner_padding
-                    if circ_x1 > circ_x0 and circ_y1 > circ_y0:
-                        draw_data.ellipse([(circ_x0, circ_y0), (circ_x1, circ_y1)], fill=fill_color)
-            except Exception as draw_err:
-                if print_lock:
-                    with print_lock:
-                        print(f"Warning: Error drawing data module at ({r},{c}) for {os.path.basename(output_path)}: {draw_err}", file=sys.stderr)
+    At most `threads` bands of at least MIN_BAND_ROWS rows each; a single band means render serially.
+    """
+    rows = np.asarray(module_rows)
+    if threads <= 1 or len(rows) == 0:
+        return [(0, len(rows))]
+    first, last = int(rows[0]), int(rows[-1]) + 1
+    count = max(1, min(threads, (last - first) // MIN_BAND_ROWS))
+    cuts = np.searchsorted(rows, np.linspace(first, last, count + 1).round().astype(int))
+    return [(int(start), int(end)) for start, end in zip(cuts[:-1], cuts[1:]) if end > start]
 
-    final_image.alpha_composite(data_module_layer)
-    del draw_data, data_module_layer
+_render_pools = {}
+_render_pools_lock = threading.Lock()
 
-    outer_pcolor, inner_pcolor_list, innermost_pcolor_list = determine_finder_colors(dominant_colors, finder_color_mode, finder_dynamic_submode, reduce_innermost_brightness)
+@functools.lru_cache(maxsize=None)
+def render_threads():
+    """Default threads per render from QR_RENDER_THREADS; invalid values fall back to 1 with a warning.
 
-    draw_finder_patterns(final_image, matrix_size, box_size, final_border_size_modules, finder_shape, outer_pcolor, inner_pcolor_list, innermost_pcolor_list, enable_finder_overlay, finder_overlay_padding, finder_overlay_color)
+    Read lazily and never raised on, since gunicorn imports this module in the master before forking.
+    """
+    value = os.environ.get(RENDER_THREADS_ENV, "").strip()
+    if not value:
+        return DEFAULT_RENDER_THREADS
+    try:
+        return max(1, int(value))
+    except ValueError:
+        print(f"Warning: ignoring invalid {RENDER_THREADS_ENV}={value!r}; rendering with {DEFAULT_RENDER_THREADS} thread")
+        return DEFAULT_RENDER_THREADS
+
+def get_render_pool(threads=None):
+    """Process-wide thread pool shared by every band-parallel render with this thread count
+    (default: render_threads())"""
+    threads = render_threads() if threads is None else threads
+    with _render_pools_lock:
+        pool = _render_pools.get(threads)
+        if pool is None:
+            pool = _render_pools[threads] = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="qr-band")
+        return pool
+
+def sample_module_backgrounds(image, module_rows, module_cols, border_modules, box_size, threads=1):
+    """Prominent background color under each listed module, as an (N, 3) int array.
+
+    With threads > 1 the row bands are sampled concurrently; the crops and quantizes only read
+    the image, and the bands are concatenated in order.
+    """
+    bands = module_bands(module_rows, threads)
+    if len(bands) > 1:
+        sample_band = lambda band: sample_module_backgrounds(
+            image, module_rows[band[0]:band[1]], module_cols[band[0]:band[1]], border_modules, box_size
+        )
+        return np.concatenate(list(get_render_pool(threads).map(sample_band, bands)))
+    local_colors = []
+    for r, c in zip(module_rows, module_cols):
+        center_x = (c + border_modules + 0.5) * box_size
+        center_y = (r + border_modules + 0.5) * box_size
+        local_prominent_rgb = get_prominent_color_in_region(image, center_x, center_y, ADAPTIVE_COLOR_RADIUS)
+        if not (isinstance(local_prominent_rgb, tuple) and len(local_prominent_rgb) == 3):
+            local_prominent_rgb = (128, 128, 128)
+        local_colors.append(local_prominent_rgb)
+    return np.array(local_colors, dtype=np.int64).reshape(-1, 3)
+
+def _draw_module_band(
+    layer,
+    y_offset,
+    start,
+    end,
+    module_rows,
+    module_cols,
+    module_is_dark,
+    module_rgb,
+    border_modules,
+    box_size,
+    data_module_shape,
+    padding,
+    diamond_border_width,
+    dark_module_color,
+    light_module_color,
+    print_lock,
+    label,
+):
+    """Draw modules[start:end] on layer, whose top edge sits y_offset pixels down the image"""
+    draw_data = ImageDraw.Draw(layer)
+    shift = (lambda points: points) if y_offset == 0 else (lambda points: [(x, y - y_offset) for x, y in points])
+
+    for index in range(start, end):
+        r, c = module_rows[index], module_cols[index]
+        is_dark = module_is_dark[index]
+        if module_rgb is not None:
+            alpha_comp = dark_module_color[3] if is_dark else light_module_color[3]
+            fill_color = tuple(module_rgb[index]) + (alpha_comp,)
+            border_color = light_module_color if is_dark else dark_module_color
+        else:
+            fill_color = dark_module_color if is_dark else light_module_color
+            border_color = light_module_color if is_dark else dark_module_color
+
+        x_box_start = (c + border_modules) * box_size
+        y_box_start = (r + border_modules) * box_size
+        x_box_end = x_box_start + box_size
+        y_box_end = y_box_start + box_size
+        center_x_draw = x_box_start + box_size / 2.0
+        center_y_draw = y_box_start + box_size / 2.0
+        inner_padding = padding
+
+        try:
+            if data_module_shape == "diamond":
+                half_outer_edge = (box_size / 2.0) - padding
+                half_inner_edge = half_outer_edge - diamond_border_width
+                if half_outer_edge < 0:
+                    continue
+                if diamond_border_width > 0 and border_color is not None:
+                    vertices_border = [
+                        (center_x_draw, y_box_start + padding),
+                        (x_box_end - padding, center_y_draw),
+                        (center_x_draw, y_box_end - padding),
+                        (x_box_start + padding, center_y_draw),
+                    ]
+                    if all(coord >= 0 for v in vertices_border for coord in v) and (x_box_end - padding > x_box_start + padding):
+                        draw_data.polygon(shift(vertices_border), fill=border_color)
+                if half_inner_edge >= 0:
+                    inner_pad_diamond = padding + diamond_border_width
+                    vertices_fill = [
+                        (center_x_draw, y_box_start + inner_pad_diamond),
+                        (x_box_end - inner_pad_diamond, center_y_draw),
+                        (center_x_draw, y_box_end - inner_pad_diamond),
+                        (x_box_start + inner_pad_diamond, center_y_draw),
+                    ]
+                    if all(coord >= 0 for v in vertices_fill for coord in v) and (x_box_end - inner_pad_diamond > x_box_start + inner_pad_diamond):
+                        draw_data.polygon(shift(vertices_fill), fill=fill_color)
+            elif data_module_shape == "square":
+                sq_x0, sq_y0 = x_box_start + inner_padding, y_box_start + inner_padding
+                sq_x1, sq_y1 = x_box_end - inner_padding, y_box_end - inner_padding
+                if sq_x1 > sq_x0 and sq_y1 > sq_y0:
+                    draw_data.rectangle(shift([(sq_x0, sq_y0), (sq_x1, sq_y1)]), fill=fill_color)
+            elif data_module_shape == "circle":
+                circ_x0, circ_y0 = x_box_start + inner_padding, y_box_start + inner_padding
+                circ_x1, circ_y1 = x_box_end - inner_padding, y_box_end - inner_padding
+                if circ_x1 > circ_x0 and circ_y1 > circ_y0:
+                    draw_data.ellipse(shift([(circ_x0, circ_y0), (circ_x1, circ_y1)]), fill=fill_color)
+        except Exception as draw_err:
+            if print_lock:
+                with print_lock:
+                    print(f"Warning: Error drawing data module at ({r},{c}) for {label}: {draw_err}", file=sys.stderr)
 
+    del draw_data
+
+def draw_data_modules(
+    final_image,
+    module_rows,
+    module_cols,
+    module_is_dark,
+    module_rgb,
+    border_modules,
+    box_size,
+    data_module_shape,
+    padding,
+    diamond_border_width,
+    dark_module_color,
+    light_module_color,
+    print_lock=None,
+    label="",
+    threads=1,
+):
+    """Draw the listed data modules on a layer and composite it onto final_image.
+
+    module_rgb holds adaptive fill colors per module, or is None for static colors.
+
+    With threads > 1 each row band is drawn concurrently on its own sub-layer. Modules only
+    spill onto the first pixel row below their box, and every drawn pixel is opaque in the mask,
+    so pasting the bands in order over their drawn pixels gives the same layer as drawing
+    serially. Colors with zero alpha would be lost from the mask, so those render serially.
+    """
+    draw_band = functools.partial(
+        _draw_module_band,
+        module_rows=module_rows,
+        module_cols=module_cols,
+        module_is_dark=module_is_dark,
+        module_rgb=module_rgb,
+        border_modules=border_modules,
+        box_size=box_size,
+        data_module_shape=data_module_shape,
+        padding=padding,
+        diamond_border_width=diamond_border_width,
+        dark_module_color=dark_module_color,
+        light_module_color=light_module_color,
+        print_lock=print_lock,
+        label=label,
+    )
+    data_module_layer = Image.new("RGBA", final_image.size, (0, 0, 0, 0))
+    opaque_colors = all(len(color) < 4 or color[3] > 0 for color in (dark_module_color, light_module_color))
+    bands = module_bands(module_rows, threads) if opaque_colors else [(0, len(module_rows))]
+
+    if len(bands) == 1:
+        draw_band(data_module_layer, 0, 0, len(module_rows))
+    else:
+        def render_band(band):
+            start, end = band
+            top = (module_rows[start] + border_modules) * box_size
+            # One extra pixel row for shapes that reach the bottom edge of their box
+            bottom = min(final_image.height, (module_rows[end - 1] + border_modules + 1) * box_size + 1)
+            band_layer = Image.new("RGBA", (final_image.width, bottom - top), (0, 0, 0, 0))
+            draw_band(band_layer, top, start, end)
+            return top, band_layer
+
+        for top, band_layer in get_render_pool(threads).map(render_band, bands):
+            drawn = band_layer.getchannel("A").point(lambda alpha: 255 if alpha else 0)
+            data_module_layer.paste(band_layer, (0, top), drawn)
+            band_layer.close()
+
+    final_image.alpha_composite(data_module_layer)
+    del data_module_layer
+
+def function_pattern_passes(matrix_size, alignment_centers, box_size, border_modules, finder_shape, finder_colors, enable_finder_overlay, finder_overlay_padding, finder_overlay_color):
+    """Finder and alignment pattern passes (see finder_pattern_passes) with colors from determine_finder_colors"""
+    outer_pcolor, inner_pcolor_list, innermost_pcolor_list = finder_colors
     inner_align_color = inner_pcolor_list[0] if inner_pcolor_list else (255, 255, 255, 225)
     innermost_align_color = innermost_pcolor_list[0] if innermost_pcolor_list else (0, 0, 0, 225)
-    draw_alignment_patterns(final_image, alignment_centers, box_size, final_border_size_modules, finder_shape, outer_pcolor, inner_align_color, innermost_align_color)
+    return (
+        finder_pattern_passes(matrix_size, box_size, border_modules, finder_shape, outer_pcolor, inner_pcolor_list, innermost_pcolor_list, enable_finder_overlay, finder_overlay_padding, finder_overlay_color)
+        + alignment_pattern_passes(alignment_centers, box_size, border_modules, finder_shape, outer_pcolor, inner_align_color, innermost_align_color)
+    )
+
+def draw_function_patterns(final_image, matrix_size, alignment_centers, box_size, border_modules, finder_shape, finder_colors, enable_finder_overlay, finder_overlay_padding, finder_overlay_color):
+    """Draw finder patterns and alignment patterns with colors from determine_finder_colors"""
+    for pattern in function_pattern_passes(matrix_size, alignment_centers, box_size, border_modules, finder_shape, finder_colors, enable_finder_overlay, finder_overlay_padding, finder_overlay_color):
+        composite_patterns(final_image, *pattern)
+
+def create_qr_code(
+    data,
+    bg_image_path,
+    output_path,
+    background_image_mode=DEFAULT_BACKGROUND_IMAGE_MODE,
+    finder_shape=DEFAULT_FINDER_PATTERN_SHAPE,
+    finder_color_mode=DEFAULT_FINDER_COLOR_MODE,
+    finder_dynamic_submode=DEFAULT_FINDER_DYNAMIC_SUBMODE,
+    reduce_innermost_brightness=REDUCE_INNERMOST_BRIGHTNESS,
+    print_lock=None,
+    data_module_shape=DATA_MODULE_SHAPE,
+    data_module_color_mode=DATA_MODULE_COLOR_MODE,
+    box_size=DEFAULT_BOX_SIZE,
+    border=DEFAULT_BORDER,
+    padding=DEFAULT_PADDING,
+    diamond_border_width=DEFAULT_DIAMOND_BORDER_WIDTH,
+    error_correction=DEFAULT_ERROR_CORRECTION,
+    dark_module_color=DEFAULT_DARK_MODULE_COLOR,
+    light_module_color=DEFAULT_LIGHT_MODULE_COLOR,
+    background_alpha=DEFAULT_BACKGROUND_ALPHA,
+    background_padding=BACKGROUND_PADDING_PX,
+    enable_finder_overlay=ENABLE_FINDER_OVERLAY,
+    finder_overlay_padding=FINDER_OVERLAY_PADDING_PX,
+    finder_overlay_color=FINDER_OVERLAY_COLOR,
+    background_cache=None,
+    logo_path=None,
+    logo_scale=DEFAULT_LOGO_SCALE,
+    logo_margin=DEFAULT_LOGO_MARGIN,
+    sidecar_path=None,
+    sidecar_sources=None,
+    bg_fingerprint=None,
+):
+    # Thin wrapper over QRRenderer: style, background and matrix are prepared and used once.
+    # sidecar_path also saves the render's record for app.core.exports, naming the background and
+    # logo by sidecar_sources {"background": ..., "logo": ...} (default: their file names).
+    # bg_fingerprint keys the background cache when bg_image_path is a temporary copy.
+    from .renderer import QRRenderer, RenderStyle
+    style = RenderStyle(
+        background_image_mode=background_image_mode,
+        finder_shape=finder_shape,
+        finder_color_mode=finder_color_mode,
+        finder_dynamic_submode=finder_dynamic_submode,
+        reduce_innermost_brightness=reduce_innermost_brightness,
+        data_module_shape=data_module_shape,
+        data_module_color_mode=data_module_color_mode,
+        box_size=box_size,
+        border=border,
+        padding=padding,
+        diamond_border_width=diamond_border_width,
+        error_correction=error_correction,
+        dark_module_color=dark_module_color,
+        light_module_color=light_module_color,
+        background_alpha=background_alpha,
+        background_padding=background_padding,
+        enable_finder_overlay=enable_finder_overlay,
+        finder_overlay_padding=finder_overlay_padding,
+        finder_overlay_color=finder_overlay_color,
+        logo_scale=logo_scale,
+        logo_margin=logo_margin,
+    )
+    renderer = QRRenderer(style, background_cache=background_cache)
+    try:
+        record, background, logo = renderer.resolve_data(data, bg_image_path, logo_path=logo_path, bg_fingerprint=bg_fingerprint)
+        final_image = renderer.draw(record, background, logo, print_lock=print_lock, label=os.path.basename(output_path))
+    finally:
+        renderer.close()
+
+    if sidecar_path:
+        from .exports import Sidecar, dump_sidecar
+        sources = sidecar_sources or {}
+        sidecar = Sidecar(
+            record,
+            style,
+            sources.get("background", os.path.basename(bg_image_path)),
+            sources.get("logo", logo_path and os.path.basename(logo_path)),
+        )
+        with open(sidecar_path, "wb") as f:
+            f.write(dump_sidecar(sidecar))
 
     try:
         output_dir = os.path.dirname(output_path)
@@ -748,11 +1128,6 @@ def create_qr_code(
                 final_image.close()
             except Exception:
                 pass
-        if bg_img:
-            try:
-                bg_img.close()
-            except Exception:
-                pass
 
 # Error correction mapping for the API
 ERROR_CORRECTION_MAP = {
@@ -774,6 +1149,36 @@ def generate_qr_code_api(data: str, bg_image_path: str, output_path: str, **kwar
         # These are handled internally or not needed
         kwargs.pop('innermost_brightness_reduction', None)
         
+        # Identical requests (same data, background file and style) are served from the
+        # output cache shared by all workers instead of being rendered again. Callers whose
+        # paths are temporary copies of stored objects pass bg_fingerprint/logo_fingerprint
+        # (see StorageBackend.fingerprint) so the key survives the copy.
+        logo_fingerprint = kwargs.pop('logo_fingerprint', None)
+        output_cache = get_cache("outputs")
+        output_key = sidecar_key = None
+        sidecar_path = kwargs.get('sidecar_path')
+        if output_cache is not None:
+            # The logo is keyed by its identity, not by the (possibly temporary) path
+            logo_path = kwargs.get('logo_path')
+            key_params = sorted(
+                (name, value) for name, value in kwargs.items()
+                if name not in ('logo_path', 'sidecar_path', 'sidecar_sources', 'bg_fingerprint')
+            )
+            if logo_path:
+                key_params.append(('logo', logo_fingerprint or file_fingerprint(logo_path)))
+            bg_fingerprint = kwargs.get('bg_fingerprint') or file_fingerprint(bg_image_path)
+            output_key = output_cache.make_key("output", data, bg_fingerprint, key_params)
+            sidecar_key = output_cache.make_key("sidecar", output_key, sorted((kwargs.get('sidecar_sources') or {}).items()))
+            cached_png = output_cache.get(output_key)
+            cached_sidecar = output_cache.get(sidecar_key) if sidecar_path else None
+            if cached_png is not None and (not sidecar_path or cached_sidecar is not None):
+                with open(output_path, "wb") as f:
+                    f.write(cached_png)
+                if sidecar_path:
+                    with open(sidecar_path, "wb") as f:
+                        f.write(cached_sidecar)
+                return True
+        
         # Create a dummy print lock for single threaded operation
         print_lock = threading.Lock()
         
@@ -783,9 +1188,17 @@ def generate_qr_code_api(data: str, bg_image_path: str, output_path: str, **kwar
             bg_image_path=bg_image_path,
             output_path=output_path,
             print_lock=print_lock,
+            background_cache=get_cache("backgrounds"),
             **kwargs
         )
         
+        if output_cache is not None and os.path.exists(output_path):
+            with open(output_path, "rb") as f:
+                output_cache.set(output_key, f.read())
+            if sidecar_path and os.path.exists(sidecar_path):
+                with open(sidecar_path, "rb") as f:
+                    output_cache.set(sidecar_key, f.read())
+        
         return os.path.exists(output_path) and os.path.getsize(output_path) > 0
     except Exception as e:
         print(f"Error generating QR code: {e}")
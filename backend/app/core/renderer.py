@@ -0,0 +1,389 @@
+import numpy as np
+import qrcode
+from PIL import Image, ImageOps
+
+from .logo import DEFAULT_LOGO_MARGIN, DEFAULT_LOGO_SCALE, check_logo_fits, fit_logo_version, validate_logo_options
+from .payloads import plan_encoding
+from .qr_generator import (
+    BACKGROUND_PADDING_PX,
+    DATA_MODULE_COLOR_MODE,
+    DATA_MODULE_SHAPE,
+    DEFAULT_BACKGROUND_ALPHA,
+    DEFAULT_BACKGROUND_IMAGE_MODE,
+    DEFAULT_BORDER,
+    DEFAULT_BOX_SIZE,
+    DEFAULT_DARK_MODULE_COLOR,
+    DEFAULT_DIAMOND_BORDER_WIDTH,
+    DEFAULT_ERROR_CORRECTION,
+    DEFAULT_FINDER_COLOR_MODE,
+    DEFAULT_FINDER_DYNAMIC_SUBMODE,
+    DEFAULT_FINDER_PATTERN_SHAPE,
+    DEFAULT_LIGHT_MODULE_COLOR,
+    DEFAULT_PADDING,
+    ENABLE_FINDER_OVERLAY,
+    FINDER_OVERLAY_COLOR,
+    FINDER_OVERLAY_PADDING_PX,
+    REDUCE_INNERMOST_BRIGHTNESS,
+    compute_adaptive_module_colors,
+    determine_finder_colors,
+    draw_data_modules,
+    draw_function_patterns,
+    get_alignment_pattern_centers,
+    get_reserved_module_mask,
+    load_background_image,
+    prepare_background,
+    render_threads,
+    sample_module_backgrounds,
+    validate_render_options,
+)
+
+# Staged rendering. create_qr_code redoes everything per call; QRRenderer splits the work into
+# stages that can be held and reused:
+#   RenderStyle         validated style options
+#   EncodedMatrix       data -> segments -> module matrix, plus the data-module positions
+#   PreparedBackground  background canvas and palette for one output size, plus the adaptive
+#                       background samples per module grid
+#   PreparedStyle       finder/alignment colors derived from the palette
+#   PreparedLogo        logo image fitted to the code's center and the modules it hides
+#   RenderRecord        the modules to draw, their colors and the pattern colors (resolve), which
+#                       draw turns into an image
+# Pattern stamps are shared through get_pattern_stamp's cache. Rendering the same stages
+# produces exactly the image create_qr_code would.
+
+class RenderStyle:
+    """Validated rendering options; everything in create_qr_code except data, paths and caches"""
+    __slots__ = (
+        "background_image_mode", "finder_shape", "finder_color_mode", "finder_dynamic_submode",
+        "reduce_innermost_brightness", "data_module_shape", "data_module_color_mode", "box_size", "border",
+        "padding", "diamond_border_width", "error_correction", "dark_module_color", "light_module_color",
+        "background_alpha", "background_padding", "enable_finder_overlay", "finder_overlay_padding",
+        "finder_overlay_color", "logo_scale", "logo_margin",
+    )
+
+    def __init__(
+        self,
+        background_image_mode=DEFAULT_BACKGROUND_IMAGE_MODE,
+        finder_shape=DEFAULT_FINDER_PATTERN_SHAPE,
+        finder_color_mode=DEFAULT_FINDER_COLOR_MODE,
+        finder_dynamic_submode=DEFAULT_FINDER_DYNAMIC_SUBMODE,
+        reduce_innermost_brightness=REDUCE_INNERMOST_BRIGHTNESS,
+        data_module_shape=DATA_MODULE_SHAPE,
+        data_module_color_mode=DATA_MODULE_COLOR_MODE,
+        box_size=DEFAULT_BOX_SIZE,
+        border=DEFAULT_BORDER,
+        padding=DEFAULT_PADDING,
+        diamond_border_width=DEFAULT_DIAMOND_BORDER_WIDTH,
+        error_correction=DEFAULT_ERROR_CORRECTION,
+        dark_module_color=DEFAULT_DARK_MODULE_COLOR,
+        light_module_color=DEFAULT_LIGHT_MODULE_COLOR,
+        background_alpha=DEFAULT_BACKGROUND_ALPHA,
+        background_padding=BACKGROUND_PADDING_PX,
+        enable_finder_overlay=ENABLE_FINDER_OVERLAY,
+        finder_overlay_padding=FINDER_OVERLAY_PADDING_PX,
+        finder_overlay_color=FINDER_OVERLAY_COLOR,
+        logo_scale=DEFAULT_LOGO_SCALE,
+        logo_margin=DEFAULT_LOGO_MARGIN,
+    ):
+        validate_render_options(padding, data_module_shape, diamond_border_width, box_size, background_alpha)
+        validate_logo_options(logo_scale, logo_margin)
+        self.background_image_mode = background_image_mode
+        self.finder_shape = finder_shape
+        self.finder_color_mode = finder_color_mode
+        self.finder_dynamic_submode = finder_dynamic_submode
+        self.reduce_innermost_brightness = reduce_innermost_brightness
+        self.data_module_shape = data_module_shape
+        self.data_module_color_mode = data_module_color_mode
+        self.box_size = box_size
+        self.border = border
+        self.padding = padding
+        self.diamond_border_width = diamond_border_width
+        self.error_correction = error_correction
+        self.dark_module_color = dark_module_color
+        self.light_module_color = light_module_color
+        self.background_alpha = background_alpha
+        self.background_padding = background_padding
+        self.enable_finder_overlay = enable_finder_overlay
+        self.finder_overlay_padding = finder_overlay_padding
+        self.finder_overlay_color = finder_overlay_color
+        self.logo_scale = logo_scale
+        self.logo_margin = logo_margin
+
+    def size_px(self, modules_count):
+        """Output width and height for a matrix of modules_count modules"""
+        return (modules_count + 2 * self.border) * self.box_size
+
+    def as_dict(self):
+        """JSON-compatible options; RenderStyle.from_dict restores them"""
+        options = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            options[name] = list(value) if isinstance(value, tuple) else value
+        return options
+
+    @classmethod
+    def from_dict(cls, options):
+        return cls(**{name: tuple(value) if isinstance(value, list) else value for name, value in options.items() if name in cls.__slots__})
+
+    def resized(self, box_size):
+        """Copy of the style at another box_size, with the pixel paddings scaled to match"""
+        options = self.as_dict()
+        scale = box_size / self.box_size
+        options["box_size"] = box_size
+        # Module paddings round down so they still fit inside the smaller box
+        for name in ("padding", "diamond_border_width"):
+            options[name] = int(options[name] * scale)
+        for name in ("background_padding", "finder_overlay_padding"):
+            options[name] = round(options[name] * scale)
+        return RenderStyle.from_dict(options)
+
+class EncodedMatrix:
+    """Module matrix of one payload and the positions of its data modules (row-major, patterns excluded)"""
+    __slots__ = ("data", "version", "modules_count", "modules", "alignment_centers", "module_rows", "module_cols", "module_is_dark")
+
+    def __init__(self, data, version, modules):
+        self.data = data
+        self.version = version
+        self.modules = modules
+        self.modules_count = modules.shape[0]
+        self.alignment_centers = get_alignment_pattern_centers(version)
+        reserved = get_reserved_module_mask(self.modules_count, self.alignment_centers)
+        self.module_rows, self.module_cols = np.nonzero(~reserved)
+        self.module_is_dark = modules[self.module_rows, self.module_cols]
+
+    @classmethod
+    def encode(cls, data, error_correction, min_version=None):
+        """Encode data as its optimal segment plan at the smallest fitting version (at least min_version)"""
+        plan = plan_encoding(data, error_correction, min_version=min_version)
+        qr = qrcode.QRCode(version=plan.version, error_correction=error_correction, border=0)
+        for segment in plan.segments:
+            qr.add_data(segment)
+        qr.make(fit=False)
+        return cls(data, plan.version, np.array(qr.modules, dtype=bool))
+
+class PreparedBackground:
+    """Background canvas and palette for one output size.
+
+    Adaptive coloring samples the background under every data module. The samples depend only
+    on the module grid, so they are kept per (version, border, box_size) and reused by every
+    code of that version.
+    """
+    __slots__ = ("source_path", "size_px", "canvas", "palette", "_module_samples")
+
+    def __init__(self, source_path, size_px, canvas, palette):
+        self.source_path = source_path
+        self.size_px = size_px
+        self.canvas = canvas
+        self.palette = palette
+        self._module_samples = {}
+
+    def module_samples(self, matrix, style, threads=1, logo=None):
+        """Samples for the data modules of matrix that are drawn (all of them, or those logo leaves visible)"""
+        key = (matrix.version, style.border, style.box_size, logo and (logo.occlusion.scale, logo.occlusion.margin))
+        samples = self._module_samples.get(key)
+        if samples is None:
+            rows, cols = matrix.module_rows, matrix.module_cols
+            if logo is not None:
+                keep = logo.occlusion.keep_mask(rows, cols)
+                rows, cols = rows[keep], cols[keep]
+            samples = sample_module_backgrounds(self.canvas, rows, cols, style.border, style.box_size, threads=threads)
+            self._module_samples[key] = samples
+        return samples
+
+    def close(self):
+        self.canvas.close()
+        self._module_samples.clear()
+
+class PreparedStyle:
+    """Style resolved against a background palette: finder and alignment pattern colors"""
+    __slots__ = ("style", "finder_colors")
+
+    def __init__(self, style, palette):
+        self.style = style
+        self.finder_colors = determine_finder_colors(
+            palette, style.finder_color_mode, style.finder_dynamic_submode, style.reduce_innermost_brightness
+        )
+
+class PreparedLogo:
+    """Logo image fitted into the center of codes of one version, and the modules it hides"""
+    __slots__ = ("source_path", "occlusion", "image", "origin")
+
+    def __init__(self, source_path, occlusion, image, origin):
+        self.source_path = source_path
+        self.occlusion = occlusion
+        self.image = image
+        self.origin = origin
+
+    def close(self):
+        self.image.close()
+
+class RenderRecord:
+    """A render resolved to what gets drawn: the module matrix, the data modules drawn (all but
+    those under a logo) with their adaptive colors, and the finder/alignment colors.
+
+    Drawing a record needs no encoding or color analysis, so it is what app.core.exports saves
+    beside an output to redraw it later at another size or format.
+    """
+    __slots__ = ("version", "modules", "drawn", "module_rgb", "finder_colors")
+
+    def __init__(self, version, modules, drawn, module_rgb, finder_colors):
+        self.version = version
+        self.modules = modules
+        self.drawn = drawn
+        # (N, 3) uint8 fill colors of the drawn modules in row-major order, or None for static colors
+        self.module_rgb = module_rgb
+        self.finder_colors = finder_colors
+
+    @property
+    def modules_count(self):
+        return self.modules.shape[0]
+
+    @property
+    def alignment_centers(self):
+        return get_alignment_pattern_centers(self.version)
+
+    def positions(self):
+        """Rows, columns and darkness of the drawn data modules, row-major"""
+        rows, cols = np.nonzero(self.drawn)
+        return rows, cols, self.modules[rows, cols]
+
+class QRRenderer:
+    """Renders codes in one style, holding prepared backgrounds and styles for reuse.
+
+        renderer = QRRenderer(data_module_shape="circle", box_size=10)
+        matrix = renderer.encode("https://example.com")
+        background = renderer.prepare_background("bg.jpg", matrix)
+        image = renderer.render(matrix, background)
+
+    Backgrounds are kept until close(), keyed by path and output size. threads > 1 samples and
+    draws the data modules in row bands on a shared thread pool (default QR_RENDER_THREADS); the
+    output is identical to a serial render.
+    """
+    __slots__ = ("style", "background_cache", "threads", "_backgrounds", "_styles", "_logos")
+
+    def __init__(self, style=None, background_cache=None, threads=None, **options):
+        self.style = style if style is not None else RenderStyle(**options)
+        self.background_cache = background_cache
+        self.threads = render_threads() if threads is None else max(1, threads)
+        self._backgrounds = {}
+        self._styles = {}
+        self._logos = {}
+
+    def encode(self, data, min_version=None):
+        return EncodedMatrix.encode(data, self.style.error_correction, min_version=min_version)
+
+    def prepare_background(self, bg_image_path, matrix_or_size, fingerprint=None):
+        """PreparedBackground sized for an EncodedMatrix (or an explicit pixel size); fingerprint
+        keys the background cache when bg_image_path is a temporary copy of a stored object"""
+        size_px = matrix_or_size if isinstance(matrix_or_size, int) else self.style.size_px(matrix_or_size.modules_count)
+        key = (bg_image_path, size_px)
+        background = self._backgrounds.get(key)
+        if background is None:
+            style = self.style
+            canvas, palette = prepare_background(
+                bg_image_path, size_px, style.background_image_mode, style.background_padding, style.background_alpha,
+                cache=self.background_cache, fingerprint=fingerprint,
+            )
+            background = self._backgrounds[key] = PreparedBackground(bg_image_path, size_px, canvas, palette)
+        return background
+
+    def prepare_style(self, background):
+        key = tuple(background.palette.colors)
+        prepared = self._styles.get(key)
+        if prepared is None:
+            prepared = self._styles[key] = PreparedStyle(self.style, background.palette)
+        return prepared
+
+    def prepare_logo(self, logo_path, matrix):
+        """PreparedLogo for the version of matrix (or a RenderRecord); LogoTooLarge if it hides more
+        than the error correction can spare"""
+        key = (logo_path, matrix.version)
+        logo = self._logos.get(key)
+        if logo is None:
+            style = self.style
+            occlusion = check_logo_fits(matrix.version, style.error_correction, style.logo_scale, style.logo_margin)
+            left, top, right, bottom = occlusion.pixel_box(style.border, style.box_size)
+            source = load_background_image(logo_path)
+            try:
+                image = ImageOps.contain(source, (right - left, bottom - top), Image.Resampling.LANCZOS)
+            finally:
+                source.close()
+            origin = (left + (right - left - image.width) // 2, top + (bottom - top - image.height) // 2)
+            logo = self._logos[key] = PreparedLogo(logo_path, occlusion, image, origin)
+        return logo
+
+    def resolve(self, matrix, background, prepared_style=None, logo=None):
+        """RenderRecord of matrix over background: the modules to draw, their colors and the pattern colors"""
+        style = self.style
+        prepared_style = prepared_style or self.prepare_style(background)
+        # Modules under the logo are skipped entirely: no sampling, coloring or drawing
+        rows, cols, is_dark = matrix.module_rows, matrix.module_cols, matrix.module_is_dark
+        if logo is not None:
+            keep = logo.occlusion.keep_mask(rows, cols)
+            rows, cols, is_dark = rows[keep], cols[keep], is_dark[keep]
+        drawn = np.zeros_like(matrix.modules)
+        drawn[rows, cols] = True
+
+        module_rgb = None
+        if style.data_module_color_mode == "adaptive":
+            module_rgb = compute_adaptive_module_colors(
+                background.module_samples(matrix, style, self.threads, logo), is_dark, background.palette,
+                style.dark_module_color, style.light_module_color,
+            ).astype(np.uint8)
+        return RenderRecord(matrix.version, matrix.modules, drawn, module_rgb, prepared_style.finder_colors)
+
+    def draw(self, record, background, logo=None, print_lock=None, label=""):
+        """New RGBA image of a RenderRecord drawn over background, with logo (a PreparedLogo) over its center"""
+        style = self.style
+        if background.size_px != style.size_px(record.modules_count):
+            raise ValueError("Background was prepared for a different QR version or box size.")
+        final_image = background.canvas.copy()
+        rows, cols, is_dark = record.positions()
+        draw_data_modules(
+            final_image, rows.tolist(), cols.tolist(), is_dark.tolist(),
+            None if record.module_rgb is None else record.module_rgb.tolist(),
+            style.border, style.box_size, style.data_module_shape, style.padding, style.diamond_border_width,
+            style.dark_module_color, style.light_module_color, print_lock=print_lock, label=label, threads=self.threads,
+        )
+        draw_function_patterns(
+            final_image, record.modules_count, record.alignment_centers, style.box_size, style.border, style.finder_shape,
+            record.finder_colors, style.enable_finder_overlay, style.finder_overlay_padding, style.finder_overlay_color,
+        )
+        if logo is not None:
+            final_image.alpha_composite(logo.image, dest=logo.origin)
+        return final_image
+
+    def render(self, matrix, background, prepared_style=None, print_lock=None, label="", logo=None):
+        """New RGBA image of matrix drawn over background, with logo (a PreparedLogo) over its center"""
+        record = self.resolve(matrix, background, prepared_style, logo)
+        return self.draw(record, background, logo, print_lock=print_lock, label=label)
+
+    def resolve_data(self, data, bg_image_path, min_version=None, logo_path=None, bg_fingerprint=None):
+        """Encode data and prepare its background and logo; returns (RenderRecord, background, logo).
+
+        With a logo the data moves up to the smallest version the logo fits.
+        """
+        matrix = self.encode(data, min_version=min_version)
+        logo = None
+        if logo_path is not None:
+            version = fit_logo_version(matrix.version, self.style.error_correction, self.style.logo_scale, self.style.logo_margin)
+            if version != matrix.version:
+                matrix = self.encode(data, min_version=version)
+            logo = self.prepare_logo(logo_path, matrix)
+        background = self.prepare_background(bg_image_path, matrix, bg_fingerprint)
+        return self.resolve(matrix, background, logo=logo), background, logo
+
+    def render_data(self, data, bg_image_path, min_version=None, print_lock=None, label="", logo_path=None, bg_fingerprint=None):
+        """Encode, prepare and render in one call, reusing any background or logo already prepared"""
+        record, background, logo = self.resolve_data(
+            data, bg_image_path, min_version=min_version, logo_path=logo_path, bg_fingerprint=bg_fingerprint
+        )
+        return self.draw(record, background, logo, print_lock=print_lock, label=label)
+
+    def close(self):
+        for background in self._backgrounds.values():
+            background.close()
+        self._backgrounds.clear()
+        self._styles.clear()
+        for logo in self._logos.values():
+            logo.close()
+        self._logos.clear()
@@ -0,0 +1,304 @@
+import io
+import math
+import struct
+import zlib
+
+from PIL import GifImagePlugin, Image
+
+from .payloads import plan_encoding
+from .renderer import QRRenderer, RenderStyle
+
+# Multi-payload output: N codes rendered over one shared background into an animation or a
+# paginated sheet. Every code is encoded at the same (largest needed) version, so all frames
+# and cells share one size. One QRRenderer prepares the background canvas, palette, finder colors
+# and adaptive background samples once, and finder and alignment stamps come from the shared
+# stamp cache. Writers emit each frame or page as soon as
+# it is drawn, so memory holds one frame or one sheet page at a time.
+
+SEQUENCE_FORMATS = ("gif", "apng", "pdf", "png")
+ANIMATED_FORMATS = ("gif", "apng")
+FORMAT_EXTENSIONS = {"gif": ".gif", "apng": ".apng", "pdf": ".pdf", "png": ".png"}
+SHEET_BACKGROUND = (255, 255, 255)
+GIF_COLORS = 256
+PDF_ZLIB_LEVEL = 6
+
+def _flatten(image):
+    """RGB copy of image composited over white"""
+    if image.mode == "RGB":
+        return image
+    flat = Image.new("RGB", image.size, SHEET_BACKGROUND)
+    flat.paste(image, mask=image.getchannel("A") if "A" in image.getbands() else None)
+    return flat
+
+def _png_chunks(data):
+    offset = 8
+    while offset < len(data):
+        length, tag = struct.unpack(">I4s", data[offset:offset + 8])
+        yield tag, data[offset + 8:offset + 8 + length]
+        offset += 12 + length
+
+def _compressed_rows(image):
+    """zlib stream of image's PNG-filtered scanlines (the concatenated IDAT payload Pillow writes)"""
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", compress_level=PDF_ZLIB_LEVEL)
+    return b"".join(body for tag, body in _png_chunks(buffer.getvalue()) if tag == b"IDAT")
+
+def _write_png_chunk(fp, tag, body):
+    fp.write(struct.pack(">I", len(body)) + tag + body + struct.pack(">I", zlib.crc32(tag + body) & 0xFFFFFFFF))
+
+class GifWriter:
+    """Animated GIF written frame by frame, each frame with its own adaptive palette"""
+
+    def __init__(self, fp, duration_ms, loop=0):
+        self.fp = fp
+        self.duration_ms = duration_ms
+        self.loop = loop
+        self._started = False
+
+    def add(self, image):
+        frame = _flatten(image).quantize(colors=GIF_COLORS, method=Image.Quantize.MEDIANCUT)
+        if not self._started:
+            header, _ = GifImagePlugin.getheader(frame, info={"loop": self.loop, "duration": self.duration_ms})
+            self.fp.write(b"".join(header))
+            self._started = True
+        for block in GifImagePlugin.getdata(frame, duration=self.duration_ms, include_color_table=True):
+            self.fp.write(block)
+
+    def close(self):
+        self.fp.write(b";")
+
+class ApngWriter:
+    """Animated PNG written frame by frame; the frame count goes in the header, so it is fixed up front"""
+
+    def __init__(self, fp, size, frame_count, duration_ms, loop=0):
+        self.fp = fp
+        self.size = size
+        self.duration_ms = duration_ms
+        self._sequence = 0
+        self._frames = 0
+        fp.write(b"\x89PNG\r\n\x1a\n")
+        _write_png_chunk(fp, b"IHDR", struct.pack(">IIBBBBB", size[0], size[1], 8, 6, 0, 0, 0))
+        _write_png_chunk(fp, b"acTL", struct.pack(">II", frame_count, loop))
+
+    def add(self, image):
+        image = image if image.mode == "RGBA" else image.convert("RGBA")
+        self._write_sequenced(b"fcTL", struct.pack(">IIIIHHBB", self.size[0], self.size[1], 0, 0, self.duration_ms, 1000, 0, 0))
+        rows = _compressed_rows(image)
+        if self._frames == 0:
+            _write_png_chunk(self.fp, b"IDAT", rows)
+        else:
+            self._write_sequenced(b"fdAT", rows)
+        self._frames += 1
+
+    def _write_sequenced(self, tag, body):
+        _write_png_chunk(self.fp, tag, struct.pack(">I", self._sequence) + body)
+        self._sequence += 1
+
+    def close(self):
+        _write_png_chunk(self.fp, b"IEND", b"")
+
+class PdfWriter:
+    """PDF with one full-page raster image per page, written page by page.
+
+    The page tree object (2) is reserved at the start and written last, once every page's
+    object number is known. Images are stored losslessly as Flate with the PNG predictor, so
+    their data is the filtered rows Pillow's PNG encoder produces.
+    """
+
+    def __init__(self, fp, dpi):
+        self.fp = fp
+        self.dpi = dpi
+        self._offsets = {}
+        self._pages = []
+        self._next_object = 3
+        fp.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    def _position(self):
+        return self.fp.tell()
+
+    def _write_object(self, number, body, stream=None):
+        self._offsets[number] = self._position()
+        self.fp.write(b"%d 0 obj\n" % number + body)
+        if stream is not None:
+            self.fp.write(b"\nstream\n" + stream + b"\nendstream")
+        self.fp.write(b"\nendobj\n")
+
+    def _allocate(self, count):
+        first = self._next_object
+        self._next_object += count
+        return range(first, first + count)
+
+    def add(self, image):
+        image = _flatten(image)
+        width_pt = image.width * 72.0 / self.dpi
+        height_pt = image.height * 72.0 / self.dpi
+        image_obj, content_obj, page_obj = self._allocate(3)
+        rows = _compressed_rows(image)
+        self._write_object(
+            image_obj,
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB /BitsPerComponent 8"
+            b" /Filter /FlateDecode /DecodeParms << /Predictor 15 /Colors 3 /Columns %d >> /Length %d >>"
+            % (image.width, image.height, image.width, len(rows)),
+            rows,
+        )
+        content = b"q %.4f 0 0 %.4f 0 0 cm /Im0 Do Q" % (width_pt, height_pt)
+        self._write_object(content_obj, b"<< /Length %d >>" % len(content), content)
+        self._write_object(
+            page_obj,
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.4f %.4f] /Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>"
+            % (width_pt, height_pt, image_obj, content_obj),
+        )
+        self._pages.append(page_obj)
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % page for page in self._pages)
+        self._write_object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._pages)))
+        xref_offset = self._position()
+        self.fp.write(b"xref\n0 %d\n0000000000 65535 f \n" % self._next_object)
+        for number in range(1, self._next_object):
+            self.fp.write(b"%010d 00000 n \n" % self._offsets[number])
+        self.fp.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self._next_object, xref_offset))
+
+class SheetLayout:
+    """Grid geometry of a label sheet page"""
+    __slots__ = ("columns", "rows", "cell_px", "gap_px", "margin_px")
+
+    def __init__(self, columns, rows, cell_px, gap_px, margin_px):
+        self.columns = columns
+        self.rows = rows
+        self.cell_px = cell_px
+        self.gap_px = gap_px
+        self.margin_px = margin_px
+
+    @property
+    def cells_per_page(self):
+        return self.columns * self.rows
+
+    @property
+    def page_size(self):
+        width = 2 * self.margin_px + self.columns * self.cell_px + (self.columns - 1) * self.gap_px
+        height = 2 * self.margin_px + self.rows * self.cell_px + (self.rows - 1) * self.gap_px
+        return width, height
+
+    def cell_origin(self, index):
+        row, column = divmod(index % self.cells_per_page, self.columns)
+        step = self.cell_px + self.gap_px
+        return self.margin_px + column * step, self.margin_px + row * step
+
+    def page_count(self, cell_count):
+        return max(1, math.ceil(cell_count / self.cells_per_page))
+
+def shared_version(data_items, error_correction):
+    """Smallest version that every item fits, so all codes render at one size"""
+    return max(plan_encoding(data, error_correction).version for data in data_items)
+
+def render_sequence(
+    data_items,
+    bg_image_path,
+    output_format,
+    open_output,
+    *,
+    box_size,
+    border,
+    error_correction,
+    background_image_mode,
+    background_padding,
+    background_alpha,
+    frame_duration_ms=1000,
+    loop=0,
+    columns=4,
+    rows=6,
+    cell_gap=20,
+    page_margin=40,
+    dpi=300,
+    background_cache=None,
+    bg_fingerprint=None,
+    **style,
+):
+    """Render data_items over one background into output_format.
+
+    open_output(index) is a context manager yielding a writable local path. gif, apng and pdf
+    produce one document (index 0); png produces one file per sheet page. Returns the
+    (version, number of files written).
+    """
+    if output_format not in SEQUENCE_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    if not data_items:
+        raise ValueError("At least one payload is required.")
+    renderer = QRRenderer(
+        RenderStyle(
+            box_size=box_size,
+            border=border,
+            error_correction=error_correction,
+            background_image_mode=background_image_mode,
+            background_padding=background_padding,
+            background_alpha=background_alpha,
+            **style,
+        ),
+        background_cache=background_cache,
+    )
+
+    version = shared_version(data_items, error_correction)
+    first_matrix = renderer.encode(data_items[0], min_version=version)
+    background = renderer.prepare_background(bg_image_path, first_matrix, bg_fingerprint)
+    prepared_style = renderer.prepare_style(background)
+    size_px = background.size_px
+
+    def frames():
+        for index, data in enumerate(data_items):
+            matrix = first_matrix if index == 0 else renderer.encode(data, min_version=version)
+            yield renderer.render(matrix, background, prepared_style, label=f"item {index}")
+
+    try:
+        if output_format in ANIMATED_FORMATS or output_format == "pdf":
+            with open_output(0) as path, open(path, "wb") as fp:
+                if output_format == "gif":
+                    writer = GifWriter(fp, frame_duration_ms, loop)
+                elif output_format == "apng":
+                    writer = ApngWriter(fp, (size_px, size_px), len(data_items), frame_duration_ms, loop)
+                else:
+                    writer = PdfWriter(fp, dpi)
+                if output_format == "pdf":
+                    layout = SheetLayout(columns, rows, size_px, cell_gap, page_margin)
+                    for page in _sheet_pages(frames(), layout):
+                        writer.add(page)
+                else:
+                    for frame in frames():
+                        writer.add(frame)
+                        frame.close()
+                writer.close()
+            return version, 1
+
+        layout = SheetLayout(columns, rows, size_px, cell_gap, page_margin)
+        written = 0
+        for page in _sheet_pages(frames(), layout):
+            with open_output(written) as path:
+                page.save(path, "PNG", dpi=(dpi, dpi))
+            written += 1
+        return version, written
+    finally:
+        renderer.close()
+
+def _sheet_pages(frames, layout):
+    """Yield sheet pages one at a time, each filled with the next cells_per_page frames"""
+    page = None
+    for index, frame in enumerate(frames):
+        if index % layout.cells_per_page == 0:
+            if page is not None:
+                yield page
+            page = Image.new("RGB", layout.page_size, SHEET_BACKGROUND)
+        cell = _flatten(frame)
+        page.paste(cell, layout.cell_origin(index))
+        frame.close()
+    if page is not None:
+        yield page
+
+def generate_sequence_api(data_items, bg_image_path, output_format, open_output, **kwargs):
+    """API wrapper for render_sequence taking the request's style and sequence parameters"""
+    from .cache import get_cache
+    from .qr_generator import ERROR_CORRECTION_MAP
+    kwargs["error_correction"] = ERROR_CORRECTION_MAP[kwargs.get("error_correction", "H")]
+    return render_sequence(
+        data_items, bg_image_path, output_format, open_output, background_cache=get_cache("backgrounds"), **kwargs
+    )
@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Filled in by warm_up_renderer and read by /health
+STARTUP_STATE = {"ready": False, "import_seconds": None, "warmup_seconds": None, "error": None}
+
+def warm_up_renderer():
+    """Import the generator and run one tiny render so the first real request pays no cold-start cost"""
+    try:
+        start = time.perf_counter()
+        from . import qr_generator
+        from PIL import Image
+        imported = time.perf_counter()
+
+        with tempfile.TemporaryDirectory(prefix="qr-warmup-") as tmp_dir:
+            bg_path = os.path.join(tmp_dir, "warmup.png")
+            Image.new("RGB", (32, 32), (200, 120, 40)).save(bg_path)
+            qr_generator.create_qr_code(
+                "warmup",
+                bg_path,
+                os.path.join(tmp_dir, "warmup_qr.png"),
+                box_size=2,
+                padding=0,
+                border=1,
+                background_padding=0,
+            )
+        STARTUP_STATE["import_seconds"] = round(imported - start, 4)
+        STARTUP_STATE["warmup_seconds"] = round(time.perf_counter() - imported, 4)
+        STARTUP_STATE["ready"] = True
+    except Exception as e:
+        STARTUP_STATE["error"] = str(e)
+    return STARTUP_STATE
+
+def import_time_report(module="app.main", top=25):
+    """Import module in a fresh interpreter with -X importtime and summarize where the time goes.
+
+    Returns (total_seconds, packages, modules). packages holds (name, self_seconds) per
+    top-level package. modules holds (name, self_seconds, cumulative_seconds) for the slowest
+    individual imports.
+    """
+    backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=backend_dir,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    modules, packages, total_us = [], {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        self_us, cumulative_us, name = int(self_us), int(cumulative_us), name.strip()
+        modules.append((name, self_us / 1e6, cumulative_us / 1e6))
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+        total_us += self_us
+
+    modules.sort(key=lambda item: item[2], reverse=True)
+    package_list = sorted(((name, us / 1e6) for name, us in packages.items()), key=lambda item: item[1], reverse=True)
+    return total_us / 1e6, package_list[:top], modules[:top]
+
+def main():
+    module = sys.argv[1] if len(sys.argv) > 1 else "app.main"
+    total, packages, modules = import_time_report(module)
+    print(f"Import of {module}: {total * 1000:.1f} ms")
+    print("\nBy top-level package (self time):")
+    for name, seconds in packages:
+        print(f"  {seconds * 1000:9.1f} ms  {name}")
+    print("\nSlowest imports (cumulative):")
+    for name, self_seconds, cumulative in modules:
+        print(f"  {cumulative * 1000:9.1f} ms  (self {self_seconds * 1000:7.1f} ms)  {name}")
+    state = warm_up_renderer()
+    print(f"\nWarm-up: generator import {state['import_seconds']} s, first render {state['warmup_seconds']} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import io
+
+# Pillow is imported inside the render helpers: the API imports this module at startup for the
+# size table and name helpers, before any image work
+
+# Fixed sizes only, so every thumbnail is rendered once and cached
+THUMBNAIL_SIZES = {"small": 128, "medium": 256, "large": 512}
+THUMBNAIL_MARKER = ".thumb-"
+THUMBNAIL_QUALITY = 80
+
+def thumbnail_name(filename, size_px):
+    """Storage name of the cached thumbnail; shares the upload's stem so it lands in the same shard"""
+    return f"{filename}{THUMBNAIL_MARKER}{size_px}.webp"
+
+def is_thumbnail_name(name):
+    return THUMBNAIL_MARKER in name
+
+def _open_reduced(path, size_px):
+    from PIL import Image, ImageOps
+    if path.lower().endswith(".svg"):
+        from .qr_generator import get_cairosvg
+        # Rasterize straight at thumbnail width instead of at the SVG's full size
+        png_data = get_cairosvg().svg2png(url=path, output_width=size_px)
+        return Image.open(io.BytesIO(png_data))
+    img = Image.open(path)
+    # JPEG: let libjpeg decode at 1/2, 1/4 or 1/8 scale; no-op for other formats
+    img.draft("RGB", (size_px, size_px))
+    # Phone photos are stored sideways with an EXIF Orientation tag; turn them upright
+    upright = ImageOps.exif_transpose(img)
+    if upright is not img:
+        img.close()
+    return upright
+
+def render_thumbnail(path, size_px):
+    """WebP bytes of the image at path, fitted inside size_px x size_px"""
+    from PIL import Image
+    with _open_reduced(path, size_px) as img:
+        img.thumbnail((size_px, size_px), Image.Resampling.LANCZOS)
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+        img = img.convert("RGBA" if has_alpha else "RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, "WEBP", quality=THUMBNAIL_QUALITY, method=4)
+        return buffer.getvalue()
@@ -1,21 +1,61 @@
 from fastapi import FastAPI, Request
-from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+import asyncio
+import contextlib
+import functools
 import os
 
-from .api.endpoints import router as api_router
+from .api.endpoints import router as api_router, admission, upload_storage, output_storage
+from .core.cache import CACHE_DIR_ENV, DEFAULT_CACHE_DIR
+from .core.startup import STARTUP_STATE, warm_up_renderer
+from .storage import LocalStorage, collect_garbage_forever, gc_interval_seconds, storage_from_env
 
-app = FastAPI(title="QR Code Generator", description="Dynamic QR Code Generator with Background Images")
+def cache_storages():
+    cache_root = os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+    if not cache_root:
+        return []
+    return [
+        storage_from_env(os.path.join(cache_root, namespace), "CACHE", default_ttl_hours=24, default_quota_mb=512)
+        for namespace in ("backgrounds", "outputs")
+    ]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One tiny render before the worker starts serving, so /health only passes once rendering works
+    await run_in_threadpool(warm_up_renderer)
+    gc_task = None
+    local_storages = [backend.manager for backend in (upload_storage, output_storage) if isinstance(backend, LocalStorage)]
+    if gc_interval_seconds() > 0:
+        gc_task = asyncio.create_task(
+            collect_garbage_forever(local_storages + cache_storages(), gc_interval_seconds())
+        )
+    try:
+        yield
+    finally:
+        if gc_task is not None:
+            gc_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await gc_task
+
+app = FastAPI(title="QR Code Generator", description="Dynamic QR Code Generator with Background Images", lifespan=lifespan)
 
 # Mount static files - Fixed paths
 static_path = "/app/frontend/static"
 if os.path.exists(static_path):
     app.mount("/static", StaticFiles(directory=static_path), name="static")
 
-# Templates - Fixed paths
+# Templates - Fixed paths, loaded on first page view so API-only workers never import Jinja2
 template_path = "/app/frontend/templates"
-templates = Jinja2Templates(directory=template_path) if os.path.exists(template_path) else None
+
+@functools.lru_cache(maxsize=None)
+def get_templates():
+    if not os.path.exists(template_path):
+        return None
+    from fastapi.templating import Jinja2Templates
+    return Jinja2Templates(directory=template_path)
 
 # Include API routes
 app.include_router(api_router, prefix="/api")
@@ -23,6 +63,7 @@ app.include_router(api_router, prefix="/api")
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     """Serve the main application page"""
+    templates = get_templates()
     if templates:
         return templates.TemplateResponse("index.html", {"request": request})
     else:
@@ -36,7 +77,9 @@ async def read_root(request: Request):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "message": "QR Code Generator API is running"}
+    if not STARTUP_STATE["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", "message": "Renderer warm-up has not completed", "startup": STARTUP_STATE})
+    return {"status": "healthy", "message": "QR Code Generator API is running", "startup": STARTUP_STATE, "admission": admission.snapshot()}
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,26 +1,199 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from typing import Optional, List, Literal, Dict, Union, Annotated
+import os
 
-class QRGenerationRequest(BaseModel):
-    filename: str
-    data: str = "https://www.example.com"
-    background_image_mode: str = "Stretched"
-    finder_shape: str = "rounded_square"
-    finder_color_mode: str = "dynamic"
-    finder_dynamic_submode: str = "single-color"
-    data_module_shape: str = "diamond"
-    data_module_color_mode: str = "adaptive"
-    box_size: int = 25
-    border: int = 4
-    padding: int = 4
-    diamond_border_width: int = 0
-    error_correction: str = "H"
-    background_alpha: int = 255
-    background_padding: int = 60
+BackgroundImageMode = Literal["Stretched", "Contained"]
+PatternShape = Literal["circle", "square", "rounded_square"]
+FinderColorMode = Literal["static", "dynamic"]
+FinderDynamicSubmode = Literal["single-color", "multi-color"]
+DataModuleShape = Literal["diamond", "square", "circle"]
+DataModuleColorMode = Literal["adaptive", "static"]
+ErrorCorrectionLevel = Literal["L", "M", "Q", "H"]
+WifiSecurity = Literal["WPA", "WEP", "nopass"]
+MAX_DATA_LENGTH = 7089
+
+class StrictModel(BaseModel):
+    """Request model that rejects unknown (e.g. misspelled) fields instead of ignoring them"""
+    model_config = ConfigDict(extra="forbid")
+
+class URLPayload(StrictModel):
+    type: Literal["url"]
+    url: str = Field(..., min_length=1, max_length=4096)
+
+    def build(self):
+        from ..core.payloads import build_url
+        return build_url(self.url)
+
+class WifiPayload(StrictModel):
+    type: Literal["wifi"]
+    ssid: str = Field(..., min_length=1, max_length=32)
+    password: Optional[str] = Field(None, max_length=63)
+    security: WifiSecurity = "WPA"
+    hidden: bool = False
+
+    def build(self):
+        from ..core.payloads import build_wifi
+        return build_wifi(self.ssid, self.password, self.security, self.hidden)
+
+class GeoPayload(StrictModel):
+    type: Literal["geo"]
+    latitude: float = Field(..., ge=-90.0, le=90.0)
+    longitude: float = Field(..., ge=-180.0, le=180.0)
+    altitude: Optional[float] = None
+
+    def build(self):
+        from ..core.payloads import build_geo
+        return build_geo(self.latitude, self.longitude, self.altitude)
+
+class VCardPayload(StrictModel):
+    type: Literal["vcard"]
+    first_name: str = Field("", max_length=100)
+    last_name: str = Field("", max_length=100)
+    organization: Optional[str] = Field(None, max_length=200)
+    title: Optional[str] = Field(None, max_length=100)
+    phones: List[str] = Field(default_factory=list, max_length=5)
+    emails: List[str] = Field(default_factory=list, max_length=5)
+    url: Optional[str] = Field(None, max_length=1024)
+    address: Optional[str] = Field(None, max_length=300)
+    note: Optional[str] = Field(None, max_length=1000)
+
+    def build(self):
+        from ..core.payloads import build_vcard
+        return build_vcard(
+            self.first_name, self.last_name, self.organization, self.title,
+            self.phones, self.emails, self.url, self.address, self.note,
+        )
+
+StructuredPayload = Annotated[Union[URLPayload, WifiPayload, GeoPayload, VCardPayload], Field(discriminator="type")]
+
+def _data_from_payload(model):
+    """Replace model.data with the encoded structured payload, if one was given"""
+    if model.payload is not None:
+        model.data = model.payload.build()
+        if len(model.data) > MAX_DATA_LENGTH:
+            raise ValueError(f"Encoded payload is longer than {MAX_DATA_LENGTH} characters")
+    return model
+
+class QRStyleOptions(StrictModel):
+    """Rendering style shared by single and batch generation"""
+    background_image_mode: BackgroundImageMode = "Stretched"
+    finder_shape: PatternShape = "rounded_square"
+    finder_color_mode: FinderColorMode = "dynamic"
+    finder_dynamic_submode: FinderDynamicSubmode = "single-color"
+    data_module_shape: DataModuleShape = "diamond"
+    data_module_color_mode: DataModuleColorMode = "adaptive"
+    box_size: int = Field(25, ge=1, le=100)
+    border: int = Field(4, ge=0, le=20)
+    padding: int = Field(4, ge=0, le=50)
+    diamond_border_width: int = Field(0, ge=0, le=50)
+    error_correction: ErrorCorrectionLevel = "H"
+    background_alpha: int = Field(255, ge=0, le=255)
+    background_padding: int = Field(60, ge=0, le=2000)
     enable_finder_overlay: bool = True
-    finder_overlay_padding: int = 15
+    finder_overlay_padding: int = Field(15, ge=0, le=500)
     reduce_innermost_brightness: bool = True
-    innermost_brightness_reduction: float = 0.25
+
+    @model_validator(mode="after")
+    def padding_fits_box(self):
+        # Mirrors the checks in create_qr_code so bad combinations fail before any image work
+        if self.data_module_shape == "diamond":
+            if (self.padding + self.diamond_border_width) * 2 > self.box_size:
+                raise ValueError("padding + diamond_border_width too large for box_size")
+        elif self.padding * 2 > self.box_size:
+            raise ValueError("padding too large for box_size")
+        return self
+
+    def style_params(self):
+        return self.model_dump(include=set(QRStyleOptions.model_fields))
+
+def _validate_filename(value):
+    if os.path.basename(value) != value or value in (".", ".."):
+        raise ValueError("filename must not contain path separators")
+    return value
+
+class QRGenerationRequest(QRStyleOptions):
+    """Validated parameters for /api/generate, shared by JSON and form bodies"""
+    filename: str = Field(..., min_length=1, max_length=255)
+    data: str = Field("https://www.example.com", min_length=1, max_length=MAX_DATA_LENGTH)
+    # Typed vCard / Wi-Fi / geo / URL fields, encoded into data (JSON bodies only)
+    payload: Optional[StructuredPayload] = None
+    # Uploaded image drawn over the center of the code; the modules under it are not drawn
+    logo_filename: Optional[str] = Field(None, min_length=1, max_length=255)
+    logo_scale: float = Field(0.2, gt=0.0, le=0.4)
+    logo_margin: int = Field(1, ge=0, le=4)
+
+    @field_validator("filename", "logo_filename")
+    @classmethod
+    def filename_is_plain(cls, value):
+        return value if value is None else _validate_filename(value)
+
+    @model_validator(mode="after")
+    def resolve_payload(self):
+        return _data_from_payload(self)
+
+    def render_params(self):
+        """Keyword arguments for generate_qr_code_api (everything except filename, data and the logo file)"""
+        params = self.style_params()
+        if self.logo_filename:
+            params.update(logo_scale=self.logo_scale, logo_margin=self.logo_margin)
+        return params
+
+class EncodingPlanRequest(StrictModel):
+    data: str = Field("https://www.example.com", min_length=1, max_length=MAX_DATA_LENGTH)
+    payload: Optional[StructuredPayload] = None
+    error_correction: ErrorCorrectionLevel = "H"
+
+    @model_validator(mode="after")
+    def resolve_payload(self):
+        return _data_from_payload(self)
+
+class SegmentInfo(BaseModel):
+    mode: Literal["numeric", "alphanumeric", "byte"]
+    length: int
+
+class EncodingPlanResponse(BaseModel):
+    data: str
+    version: int
+    modules_count: int
+    bit_length: int
+    capacity_bits: int
+    segments: List[SegmentInfo]
+
+SequenceFormat = Literal["gif", "apng", "pdf", "png"]
+MAX_BATCH_ITEMS = 1000
+BatchItem = Union[Annotated[str, Field(min_length=1, max_length=MAX_DATA_LENGTH)], StructuredPayload]
+
+class QRBatchRequest(QRStyleOptions):
+    """N payloads over one background, as an animation (gif, apng) or a label sheet (pdf, png pages)"""
+    filename: str = Field(..., min_length=1, max_length=255)
+    items: List[BatchItem] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+    output_format: SequenceFormat = "pdf"
+    frame_duration_ms: int = Field(1000, ge=20, le=60000)
+    loop: int = Field(0, ge=0, le=65535)
+    columns: int = Field(4, ge=1, le=20)
+    rows: int = Field(6, ge=1, le=40)
+    cell_gap: int = Field(20, ge=0, le=500)
+    page_margin: int = Field(40, ge=0, le=1000)
+    dpi: int = Field(300, ge=72, le=1200)
+
+    @field_validator("filename")
+    @classmethod
+    def filename_is_plain(cls, value):
+        return _validate_filename(value)
+
+    def data_items(self):
+        """Encoded text of every item"""
+        return [item if isinstance(item, str) else item.build() for item in self.items]
+
+    def sequence_params(self):
+        return self.model_dump(include={"frame_duration_ms", "loop", "columns", "rows", "cell_gap", "page_margin", "dpi"})
+
+class QRBatchResponse(BaseModel):
+    success: bool
+    filenames: List[str]
+    message: str
+    count: int
+    version: int
 
 class QRGenerationResponse(BaseModel):
     success: bool
@@ -33,5 +206,11 @@ class ImageUploadResponse(BaseModel):
     filename: str
     message: str
 
+class ImageInfo(BaseModel):
+    filename: str
+    preview_url: str
+    thumbnail_urls: Dict[str, str]
+
 class ImageListResponse(BaseModel):
-    images: List[str]
\ No newline at end of file
+    images: List[str]
+    items: List[ImageInfo] = []
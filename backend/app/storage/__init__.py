@@ -0,0 +1,59 @@
+import os
+
+from .backends import LocalStorage, MemoryStorage, ObjectInfo, S3Storage, StorageBackend
+from .manager import StorageManager, collect_garbage_forever
+from .responses import storage_response
+from .threadpool import in_threadpool
+
+def _env_number(name, default):
+    value = os.environ.get(name, "")
+    try:
+        return float(value) if value else default
+    except ValueError:
+        print(f"Warning: ignoring invalid {name}={value!r}; using {default}")
+        return default
+
+def storage_from_env(root, prefix, default_ttl_hours, default_quota_mb):
+    """StorageManager for root configured by QR_<prefix>_TTL_HOURS and QR_<prefix>_QUOTA_MB (0 disables each)"""
+    return StorageManager(
+        root,
+        ttl_seconds=_env_number(f"QR_{prefix}_TTL_HOURS", default_ttl_hours) * 3600,
+        quota_bytes=int(_env_number(f"QR_{prefix}_QUOTA_MB", default_quota_mb) * 1024 * 1024),
+    )
+
+def backend_from_env(root, prefix, default_ttl_hours, default_quota_mb):
+    """Storage backend selected by QR_STORAGE_BACKEND: local (default), memory or s3.
+
+    For s3, QR_S3_BUCKET names the bucket and QR_S3_ENDPOINT_URL optionally points at an
+    S3-compatible server. Objects are stored under "<root>/" in the bucket.
+    """
+    kind = os.environ.get("QR_STORAGE_BACKEND", "local").lower()
+    if kind == "memory":
+        return MemoryStorage()
+    if kind == "s3":
+        return S3Storage(
+            os.environ["QR_S3_BUCKET"],
+            prefix=f"{os.path.basename(os.path.normpath(root))}/",
+            endpoint_url=os.environ.get("QR_S3_ENDPOINT_URL") or None,
+        )
+    if kind != "local":
+        raise ValueError(f"Unknown QR_STORAGE_BACKEND '{kind}'")
+    return LocalStorage(storage_from_env(root, prefix, default_ttl_hours, default_quota_mb))
+
+def gc_interval_seconds():
+    return _env_number("QR_STORAGE_GC_INTERVAL_SECONDS", 300)
+
+__all__ = [
+    "StorageBackend",
+    "LocalStorage",
+    "MemoryStorage",
+    "S3Storage",
+    "ObjectInfo",
+    "StorageManager",
+    "collect_garbage_forever",
+    "storage_response",
+    "in_threadpool",
+    "storage_from_env",
+    "backend_from_env",
+    "gc_interval_seconds",
+]
@@ -0,0 +1,266 @@
+import contextlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import NamedTuple, Optional
+
+
+class ObjectInfo(NamedTuple):
+    name: str
+    size: int
+    last_modified: float
+    # Set only when the object is a plain local file, which lets responses use zero-copy sendfile
+    path: Optional[str] = None
+    # Content hash reported by the store, when it has one (S3 ETag)
+    etag: Optional[str] = None
+
+class StorageBackend:
+    """Named-blob store behind the upload and output endpoints.
+
+    Rendering works on local files. materialize() provides a readable local path and
+    writable_path() a writable one, published when its block exits without an error. Each
+    backend does that the cheapest way it can: the local backend writes beside the final path and
+    renames into place, and the others spool through temporary files.
+    Every method blocks (the S3 ones on network round trips), so async code calls them
+    through run_in_threadpool or app.storage.in_threadpool.
+    """
+
+    # Where the objects live, for fingerprint(); set by each backend
+    location = ""
+
+    def stat(self, name):
+        raise NotImplementedError
+
+    def fingerprint(self, info):
+        """Identity of an object's current contents (from stat) for cache keys.
+
+        Unlike the paths materialize() yields, which may be fresh temporary files, it is the
+        same on every call and in every worker.
+        """
+        return (self.location, info.name, info.size, info.etag or info.last_modified)
+
+    def put_stream(self, name, fileobj):
+        raise NotImplementedError
+
+    def put_file(self, name, path):
+        with open(path, "rb") as f:
+            self.put_stream(name, f)
+
+    def iter_range(self, name, start, end, chunk_size=64 * 1024):
+        """Yield the bytes in [start, end] (inclusive) of the object"""
+        raise NotImplementedError
+
+    def delete(self, name):
+        raise NotImplementedError
+
+    def list_names(self):
+        raise NotImplementedError
+
+    def touch(self, name):
+        pass
+
+    @contextlib.contextmanager
+    def materialize(self, name):
+        suffix = os.path.splitext(name)[1]
+        fd, tmp_path = tempfile.mkstemp(prefix="qr-in-", suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                info = self.stat(name)
+                if info is None:
+                    raise FileNotFoundError(name)
+                if info.size > 0:
+                    for chunk in self.iter_range(name, 0, info.size - 1):
+                        f.write(chunk)
+            yield tmp_path
+        finally:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+
+    @contextlib.contextmanager
+    def writable_path(self, name):
+        suffix = os.path.splitext(name)[1]
+        fd, tmp_path = tempfile.mkstemp(prefix="qr-out-", suffix=suffix)
+        os.close(fd)
+        try:
+            yield tmp_path
+            if os.path.exists(tmp_path) and os.path.getsize(tmp_path) > 0:
+                self.put_file(name, tmp_path)
+        finally:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+
+class LocalStorage(StorageBackend):
+    """Sharded local directory; files are rendered beside their final path and served in place"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.location = os.path.abspath(manager.root)
+
+    def stat(self, name):
+        path = self.manager.resolve(name)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return ObjectInfo(name, stat.st_size, stat.st_mtime, path)
+
+    def put_stream(self, name, fileobj):
+        # Write beside the target and rename, so concurrent readers never see a partial file
+        path = self.manager.path_for_write(name)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as buffer:
+                shutil.copyfileobj(fileobj, buffer)
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+
+    def iter_range(self, name, start, end, chunk_size=64 * 1024):
+        path = self.manager.resolve(name)
+        if path is None:
+            raise FileNotFoundError(name)
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, name):
+        path = self.manager.resolve(name)
+        if path is not None:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+
+    def list_names(self):
+        return self.manager.list_names()
+
+    def touch(self, name):
+        path = self.manager.resolve(name)
+        if path is not None:
+            self.manager.touch(path)
+
+    @contextlib.contextmanager
+    def materialize(self, name):
+        path = self.manager.resolve(name)
+        if path is None:
+            raise FileNotFoundError(name)
+        yield path
+
+    @contextlib.contextmanager
+    def writable_path(self, name):
+        # Render beside the target and rename on success, like put_stream: names such as exports
+        # are reused, and a concurrent request must never serve a partially written file
+        path = self.manager.path_for_write(name)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=os.path.splitext(name)[1])
+        os.close(fd)
+        try:
+            yield tmp_path
+            if os.path.getsize(tmp_path) > 0:
+                os.replace(tmp_path, path)
+        finally:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+
+class MemoryStorage(StorageBackend):
+    """Process-local in-memory store, for tests and throwaway single-worker deployments"""
+
+    def __init__(self):
+        self._objects = {}
+        self._lock = threading.Lock()
+        self.location = f"memory:{id(self):x}"
+
+    def stat(self, name):
+        with self._lock:
+            entry = self._objects.get(name)
+        if entry is None:
+            return None
+        data, modified = entry
+        return ObjectInfo(name, len(data), modified)
+
+    def put_stream(self, name, fileobj):
+        data = fileobj.read()
+        with self._lock:
+            self._objects[name] = (bytes(data), time.time())
+
+    def iter_range(self, name, start, end, chunk_size=64 * 1024):
+        with self._lock:
+            entry = self._objects.get(name)
+        if entry is None:
+            raise FileNotFoundError(name)
+        view = memoryview(entry[0])[start:end + 1]
+        for offset in range(0, len(view), chunk_size):
+            yield bytes(view[offset:offset + chunk_size])
+
+    def delete(self, name):
+        with self._lock:
+            self._objects.pop(name, None)
+
+    def list_names(self):
+        with self._lock:
+            return list(self._objects)
+
+class S3Storage(StorageBackend):
+    """Objects in an S3-compatible bucket under a key prefix.
+
+    endpoint_url can point at any S3-compatible server (MinIO, or a local moto server in
+    tests). boto3 is imported only when this backend is constructed.
+    """
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, client=None):
+        if client is None:
+            try:
+                import boto3
+            except ImportError as e:
+                raise RuntimeError("The s3 storage backend requires boto3") from e
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.location = f"s3:{endpoint_url or ''}/{bucket}/{prefix}"
+
+    def _key(self, name):
+        return f"{self.prefix}{name}"
+
+    def stat(self, name):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except self.client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return ObjectInfo(name, head["ContentLength"], head["LastModified"].timestamp(), etag=head.get("ETag"))
+
+    def put_stream(self, name, fileobj):
+        self.client.upload_fileobj(fileobj, self.bucket, self._key(name))
+
+    def put_file(self, name, path):
+        self.client.upload_file(path, self.bucket, self._key(name))
+
+    def iter_range(self, name, start, end, chunk_size=64 * 1024):
+        response = self.client.get_object(Bucket=self.bucket, Key=self._key(name), Range=f"bytes={start}-{end}")
+        body = response["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def list_names(self):
+        names = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                names.append(item["Key"][len(self.prefix):])
+        return names
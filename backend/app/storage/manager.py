@@ -0,0 +1,164 @@
+import asyncio
+import contextlib
+import hashlib
+import os
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SHARD_CHARS = 2
+
+class StorageManager:
+    """Sharded directory with time-to-live and size-quota garbage collection.
+
+    Files are stored at <root>/<shard>/<name>, where <shard> is a hash prefix of the name.
+    That keeps every directory small no matter how many files accumulate. Files written
+    before sharding (directly under <root>) are still found and collected. Last use is
+    tracked through atime: touch() updates it and leaves mtime alone, so mtime-based cache
+    keys stay valid.
+    """
+
+    def __init__(self, root, ttl_seconds=0, quota_bytes=0, skip_prefixes=(".",)):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.quota_bytes = quota_bytes
+        self.skip_prefixes = tuple(skip_prefixes)
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def shard_for(name):
+        # Hash only the stem before the first dot so derived files (e.g. "<upload>.thumb-128.webp")
+        # land in the same shard directory as their source
+        return hashlib.sha1(name.split(".", 1)[0].encode("utf-8")).hexdigest()[:SHARD_CHARS]
+
+    def path_for(self, name):
+        return os.path.join(self.root, self.shard_for(name), name)
+
+    def path_for_write(self, name):
+        path = self.path_for(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def resolve(self, name):
+        """Path of an existing file called name, or None"""
+        if os.path.basename(name) != name or name.startswith(self.skip_prefixes):
+            return None
+        for path in (self.path_for(name), os.path.join(self.root, name)):
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def touch(self, path):
+        with contextlib.suppress(OSError):
+            stat = os.stat(path)
+            os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+
+    def _is_managed(self, name):
+        return not name.startswith(self.skip_prefixes)
+
+    def _shard_dirs(self):
+        with os.scandir(self.root) as entries:
+            return sorted(e.path for e in entries if e.is_dir(follow_symlinks=False) and len(e.name) == SHARD_CHARS)
+
+    def _scan_dir(self, directory):
+        files = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not self._is_managed(entry.name) or not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                files.append((entry.path, entry.name, stat.st_size, max(stat.st_atime, stat.st_mtime)))
+        return files
+
+    def list_names(self):
+        names = [name for _, name, _, _ in self._scan_dir(self.root)]
+        for shard in self._shard_dirs():
+            names.extend(name for _, name, _, _ in self._scan_dir(shard))
+        return names
+
+    def _delete(self, path):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+
+    def _delete_many(self, paths):
+        for path in paths:
+            self._delete(path)
+
+    def _expire_dir(self, directory, now):
+        """Delete files in directory whose last use is older than the TTL; returns (deleted, survivors)"""
+        deleted, survivors = 0, []
+        for path, _, size, last_used in self._scan_dir(directory):
+            if self.ttl_seconds and now - last_used > self.ttl_seconds:
+                self._delete(path)
+                deleted += 1
+            else:
+                survivors.append((last_used, size, path))
+        return deleted, survivors
+
+    async def collect(self, pause_seconds=0.0):
+        """One incremental GC pass; returns (files_deleted, bytes_remaining).
+
+        Each directory is scanned in the threadpool, and the event loop gets control back between
+        directories, so a pass over a large tree never stalls request handling.
+        """
+        now = time.time()
+        deleted, survivors = 0, []
+        for directory in [self.root] + await run_in_threadpool(self._shard_dirs):
+            expired, kept = await run_in_threadpool(self._expire_dir, directory, now)
+            deleted += expired
+            survivors.extend(kept)
+            await asyncio.sleep(pause_seconds)
+
+        total = sum(size for _, size, _ in survivors)
+        if self.quota_bytes and total > self.quota_bytes:
+            # Least recently used first
+            survivors.sort()
+            victims = []
+            for _, size, path in survivors:
+                if total <= self.quota_bytes:
+                    break
+                victims.append(path)
+                total -= size
+            for start in range(0, len(victims), 256):
+                await run_in_threadpool(self._delete_many, victims[start:start + 256])
+                await asyncio.sleep(pause_seconds)
+            deleted += len(victims)
+        return deleted, total
+
+@contextlib.contextmanager
+def _exclusive_gc_lock(lock_path):
+    """Yields True if this process won the GC lock; other workers skip the pass"""
+    if fcntl is None:
+        yield True
+        return
+    with open(lock_path, "a+b") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+async def collect_garbage_forever(managers, interval_seconds, pause_seconds=0.01):
+    """Run a GC pass over every manager each interval; meant to run as a background asyncio task"""
+    while True:
+        for manager in managers:
+            if not (manager.ttl_seconds or manager.quota_bytes):
+                continue
+            try:
+                with _exclusive_gc_lock(os.path.join(manager.root, ".gc.lock")) as acquired:
+                    if acquired:
+                        await manager.collect(pause_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Storage GC failed for {manager.root}: {e}")
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,125 @@
+import email.utils
+import os
+import re
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+ACCEL_REDIRECT_ENV = "QR_ACCEL_REDIRECT_PREFIX"
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def parse_range(header, size):
+    """(start, end) for a single-range Range header, None to send the whole body; raises 416 if unsatisfiable"""
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        # Multi-range and non-byte units are not supported; RFC 9110 allows ignoring the header
+        return None
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        length = int(last)
+        if length == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+class StorageObjectResponse(Response):
+    """Body served from a storage backend without building it in Python memory.
+
+    Local files go out through the ASGI zero-copy sendfile extension when the server offers
+    it. Behind nginx with QR_ACCEL_REDIRECT_PREFIX set, they go out through X-Accel-Redirect.
+    Everything else streams in chunks read in the threadpool.
+    """
+
+    def __init__(self, backend, info, start, end, status_code, headers, media_type):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.backend = backend
+        self.info = info
+        self.start = start
+        self.end = end
+
+    async def __call__(self, scope, receive, send):
+        count = self.end - self.start + 1 if self.end >= self.start else 0
+        send_body = scope.get("method", "GET") != "HEAD" and self.status_code != 304
+        if self.status_code != 304:
+            self.headers["content-length"] = str(count)
+        path = self.info.path
+
+        accel_prefix = os.environ.get(ACCEL_REDIRECT_ENV)
+        if send_body and path and accel_prefix:
+            # nginx maps the prefix onto the storage root and sendfile()s the file, honouring Range itself
+            self.headers["x-accel-redirect"] = accel_prefix.rstrip("/") + "/" + self.backend_relative_path()
+            for header in ("content-length", "content-range"):
+                if header in self.headers:
+                    del self.headers[header]
+            self.status_code = 200
+            send_body = False
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not send_body or count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if path and ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            with open(path, "rb") as f:
+                await send({"type": ZEROCOPY_EXTENSION, "file": f, "offset": self.start, "count": count, "more_body": False})
+            return
+
+        async for chunk in iterate_in_threadpool(self.backend.iter_range(self.info.name, self.start, self.end)):
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    def backend_relative_path(self):
+        root = getattr(getattr(self.backend, "manager", None), "root", "")
+        return os.path.relpath(self.info.path, root).replace(os.sep, "/")
+
+async def storage_response(request: Request, backend, name, media_type, cache_control, download_filename=None, not_found="File not found"):
+    """Conditional, range-aware response for a stored object"""
+    info = await run_in_threadpool(backend.stat, name)
+    if info is None:
+        raise HTTPException(status_code=404, detail=not_found)
+
+    etag = f'"{info.size:x}-{int(info.last_modified * 1000):x}"'
+    headers = {
+        "accept-ranges": "bytes",
+        "cache-control": cache_control,
+        "etag": etag,
+        "last-modified": email.utils.formatdate(info.last_modified, usegmt=True),
+    }
+    if download_filename:
+        headers["content-disposition"] = f'attachment; filename="{download_filename}"'
+
+    if _not_modified(request, etag, info.last_modified):
+        return StorageObjectResponse(backend, info, 0, -1, 304, headers, media_type)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        byte_range = parse_range(request.headers.get("range"), info.size)
+    if byte_range is None:
+        return StorageObjectResponse(backend, info, 0, info.size - 1, 200, headers, media_type)
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{info.size}"
+    return StorageObjectResponse(backend, info, start, end, 206, headers, media_type)
@@ -0,0 +1,20 @@
+import contextlib
+import sys
+
+from starlette.concurrency import run_in_threadpool
+
+@contextlib.asynccontextmanager
+async def in_threadpool(context_manager):
+    """Enter and exit a blocking context manager (materialize, writable_path) in the threadpool.
+
+    With the S3 backend entering downloads the object and exiting uploads it, so neither may
+    run on the event loop.
+    """
+    value = await run_in_threadpool(context_manager.__enter__)
+    try:
+        yield value
+    except BaseException:
+        if not await run_in_threadpool(context_manager.__exit__, *sys.exc_info()):
+            raise
+    else:
+        await run_in_threadpool(context_manager.__exit__, None, None, None)
@@ -0,0 +1,446 @@
+"""Load test for the HTTP API: starts a local server, replays a weighted request mix, reports per-endpoint latency.
+
+    python loadtest.py --duration 30 --concurrency 8 --workers 2
+    python loadtest.py --mix flow=4,images=2,preview=2,thumbnail=1 --save-baseline
+    python loadtest.py --check-baseline   # exit status 1 on regression, 2 without a baseline
+"""
+import argparse
+import http.client
+import io
+import json
+import math
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from PIL import Image, ImageDraw
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "loadtest_baseline.json")
+SCENARIO_STEPS = ("flow", "images", "preview", "thumbnail", "health")
+DEFAULT_MIX = "flow=4,images=2,preview=2,thumbnail=1,health=1"
+FIXTURE_SPECS = [((640, 480), "JPEG"), ((1024, 768), "JPEG"), ((300, 300), "PNG"), ((1600, 1200), "JPEG")]
+STARTUP_TIMEOUT_SECONDS = 120
+REQUEST_TIMEOUT_SECONDS = 120
+RSS_SAMPLE_SECONDS = 1.0
+# Relative slack before a metric counts as a regression; error rate gets an absolute allowance instead
+DEFAULT_TOLERANCE = 0.25
+ERROR_RATE_ALLOWANCE = 0.01
+
+def make_fixtures(directory, seed=0):
+    """Synthetic background images: gradients with shapes, saved as JPEG/PNG at a few sizes"""
+    rng = random.Random(seed)
+    paths = []
+    for index, ((width, height), image_format) in enumerate(FIXTURE_SPECS):
+        img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+        tint = Image.new("RGB", (width, height), tuple(rng.randrange(256) for _ in range(3)))
+        img = Image.blend(img, tint, 0.6)
+        draw = ImageDraw.Draw(img)
+        for _ in range(12):
+            x0, y0 = rng.randrange(width), rng.randrange(height)
+            box = [x0, y0, x0 + rng.randrange(20, width // 2), y0 + rng.randrange(20, height // 2)]
+            draw.ellipse(box, fill=tuple(rng.randrange(256) for _ in range(3)))
+        path = os.path.join(directory, f"fixture_{index}.{'jpg' if image_format == 'JPEG' else 'png'}")
+        img.save(path, image_format)
+        paths.append(path)
+    return paths
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class LocalServer:
+    """run.py in production mode from a scratch directory, so uploads, outputs and caches start empty"""
+
+    def __init__(self, workers, extra_env=None):
+        self.workers = workers
+        self.extra_env = extra_env or {}
+        self.port = free_port()
+        self.workdir = None
+        self.process = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.workdir = tempfile.mkdtemp(prefix="qr-loadtest-")
+        env = dict(os.environ)
+        env.update({
+            "QR_HOST": "127.0.0.1",
+            "QR_PORT": str(self.port),
+            "QR_DEBUG": "false",
+            "QR_WORKERS": str(self.workers),
+            "QR_CACHE_DIR": os.path.join(self.workdir, "cache"),
+            "PYTHONPATH": BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+        })
+        env.update(self.extra_env)
+        self.log = open(os.path.join(self.workdir, "server.log"), "wb")
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, "run.py")],
+            cwd=self.workdir, env=env, stdout=self.log, stderr=subprocess.STDOUT, start_new_session=True,
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited during startup, see {self.log.name}")
+            try:
+                status, _ = Client(self.url, timeout=2).request("GET", "/health")
+                if status == 200:
+                    return self
+            except (OSError, http.client.HTTPException):
+                pass
+            time.sleep(0.25)
+        raise RuntimeError("Server did not become healthy in time")
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+                self.process.wait()
+        if self.workdir:
+            self.log.close()
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+def process_tree_rss_bytes(pid):
+    """Resident memory of pid and all its descendants (Linux /proc); None where unavailable"""
+    total, pending, seen = 0, [pid], set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            if current == pid:
+                return None
+    return total
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=RSS_SAMPLE_SECONDS):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+        self._started_at = time.monotonic()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            rss = process_tree_rss_bytes(self.pid)
+            if rss is not None:
+                self.samples.append((round(time.monotonic() - self._started_at, 2), round(rss / 2**20, 1)))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+class Client:
+    """Keep-alive HTTP/1.1 connection; one per load-test worker thread"""
+
+    def __init__(self, base_url, timeout=REQUEST_TIMEOUT_SECONDS):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, body=None, headers=None):
+        for attempt in (0, 1):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request(method, path, body=body, headers=headers or {})
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (OSError, http.client.HTTPException) as e:
+                self.connection.close()
+                self.connection = None
+                # Server closed an idle keep-alive connection; retry once on a fresh one
+                retryable = isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                if attempt or not retryable:
+                    raise
+
+    def upload(self, path):
+        boundary = uuid.uuid4().hex
+        with open(path, "rb") as f:
+            payload = f.read()
+        body = io.BytesIO()
+        body.write(f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{os.path.basename(path)}\"\r\n".encode())
+        body.write(b"Content-Type: application/octet-stream\r\n\r\n" + payload + f"\r\n--{boundary}--\r\n".encode())
+        return self.request("POST", "/api/upload", body.getvalue(), {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def timed(self, endpoint, call, expected=(200,)):
+        start = time.perf_counter()
+        try:
+            status, body = call()
+        except (OSError, http.client.HTTPException):
+            status, body = None, b""
+        elapsed = time.perf_counter() - start
+        ok = status in expected
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+        return ok, body
+
+class Scenario:
+    """The weighted request mix; 'flow' is upload -> generate -> download, recorded as three requests"""
+
+    def __init__(self, fixtures, box_size, seed_names):
+        self.fixtures = fixtures
+        self.box_size = box_size
+        self.uploaded = list(seed_names)
+        self._lock = threading.Lock()
+
+    def pick_upload(self, rng):
+        with self._lock:
+            return rng.choice(self.uploaded)
+
+    def flow(self, client, recorder, rng):
+        ok, body = recorder.timed("POST /api/upload", lambda: client.upload(rng.choice(self.fixtures)))
+        if not ok:
+            return
+        filename = json.loads(body)["filename"]
+        with self._lock:
+            self.uploaded.append(filename)
+        request = json.dumps({"filename": filename, "data": f"https://example.com/{uuid.uuid4().hex}", "box_size": self.box_size, "padding": 1})
+        ok, body = recorder.timed(
+            "POST /api/generate",
+            lambda: client.request("POST", "/api/generate", request, {"Content-Type": "application/json"}),
+        )
+        if not ok:
+            return
+        output = json.loads(body)["filename"]
+        recorder.timed("GET /api/download", lambda: client.request("GET", f"/api/download/{output}"))
+
+    def images(self, client, recorder, rng):
+        recorder.timed("GET /api/images", lambda: client.request("GET", "/api/images"))
+
+    def preview(self, client, recorder, rng):
+        name = self.pick_upload(rng)
+        recorder.timed("GET /api/preview", lambda: client.request("GET", f"/api/preview/{name}"))
+
+    def thumbnail(self, client, recorder, rng):
+        name = self.pick_upload(rng)
+        size = rng.choice(("small", "medium"))
+        recorder.timed("GET /api/thumbnail", lambda: client.request("GET", f"/api/thumbnail/{name}?size={size}"))
+
+    def health(self, client, recorder, rng):
+        recorder.timed("GET /health", lambda: client.request("GET", "/health"))
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIO_STEPS:
+            raise ValueError(f"Unknown scenario step: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(recorder, elapsed, rss_samples):
+    endpoints = {}
+    total_requests = total_errors = 0
+    for endpoint, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        errors = recorder.errors.get(endpoint, 0)
+        total_requests += len(values)
+        total_errors += errors
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "errors": errors,
+            "error_rate": round(errors / len(values), 4),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+        }
+    rss_values = [rss for _, rss in rss_samples]
+    return {
+        "duration_seconds": round(elapsed, 2),
+        "requests": total_requests,
+        "throughput_rps": round(total_requests / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+        "endpoints": endpoints,
+        "rss_mb": {
+            "start": rss_values[0] if rss_values else None,
+            "peak": max(rss_values) if rss_values else None,
+            "end": rss_values[-1] if rss_values else None,
+            "samples": rss_samples,
+        },
+    }
+
+def run_load(base_url, scenario, mix, concurrency, duration, seed=0):
+    recorder = Recorder()
+    steps, weights = zip(*mix.items())
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(base_url)
+        while time.monotonic() < deadline:
+            step = rng.choices(steps, weights)[0]
+            getattr(scenario, step)(client, recorder, rng)
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.monotonic() - start
+
+def compare_to_baseline(result, baseline, tolerance):
+    """Human-readable regressions of result against baseline; empty when within tolerance"""
+    problems = []
+    if result["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        problems.append(f"throughput {result['throughput_rps']} req/s < baseline {baseline['throughput_rps']} req/s")
+    if result["error_rate"] > baseline["error_rate"] + ERROR_RATE_ALLOWANCE:
+        problems.append(f"error rate {result['error_rate']:.2%} > baseline {baseline['error_rate']:.2%}")
+    for endpoint, stats in result["endpoints"].items():
+        reference = baseline["endpoints"].get(endpoint)
+        if reference is None:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if stats[key] > reference[key] * (1 + tolerance):
+                problems.append(f"{endpoint} {key} {stats[key]} > baseline {reference[key]}")
+    peak, reference_peak = result["rss_mb"]["peak"], baseline.get("rss_mb", {}).get("peak")
+    if peak is not None and reference_peak is not None and peak > reference_peak * (1 + tolerance):
+        problems.append(f"peak RSS {peak} MB > baseline {reference_peak} MB")
+    return problems
+
+def print_report(result):
+    print(f"\n{result['requests']} requests in {result['duration_seconds']} s: "
+          f"{result['throughput_rps']} req/s, error rate {result['error_rate']:.2%}")
+    print(f"\n{'endpoint':<22}{'reqs':>7}{'err':>6}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint, stats in result["endpoints"].items():
+        print(f"{endpoint:<22}{stats['requests']:>7}{stats['errors']:>6}{stats['throughput_rps']:>8}"
+              f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}")
+    rss = result["rss_mb"]
+    if rss["peak"] is not None:
+        print(f"\nServer RSS: start {rss['start']} MB, peak {rss['peak']} MB, end {rss['end']} MB")
+        print("  " + "  ".join(f"{t:>5.0f}s:{mb:.0f}" for t, mb in rss["samples"][::max(1, len(rss["samples"]) // 12)]))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Test an already running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="PID to sample RSS from when --url is used")
+    parser.add_argument("--workers", type=int, default=2, help="Server worker processes")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client connections")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted steps: " + ", ".join(SCENARIO_STEPS))
+    parser.add_argument("--box-size", type=int, default=10, help="box_size of generated codes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json-out", help="Write the full result as JSON")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--check-baseline", action="store_true", help="Exit 1 if this run regresses against the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.check_baseline:
+        # Fail before spending the run: the baseline is recorded per machine and not committed
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(
+                f"No baseline at {args.baseline}; record one on this machine first with --save-baseline "
+                "(using the same --workers, --concurrency, --mix and --box-size)",
+                file=sys.stderr,
+            )
+            return 2
+        except ValueError as e:
+            print(f"Unreadable baseline {args.baseline}: {e}", file=sys.stderr)
+            return 2
+
+    mix = parse_mix(args.mix)
+    fixture_dir = tempfile.mkdtemp(prefix="qr-fixtures-")
+    server = None
+    try:
+        fixtures = make_fixtures(fixture_dir, args.seed)
+        if args.url:
+            base_url, pid = args.url.rstrip("/"), args.server_pid
+        else:
+            server = LocalServer(args.workers).start()
+            base_url, pid = server.url, server.process.pid
+        seed_client = Client(base_url)
+        seed_names = []
+        for path in fixtures:
+            status, body = seed_client.upload(path)
+            if status != 200:
+                raise RuntimeError(f"Seeding upload failed with HTTP {status}: {body[:200]!r}")
+            seed_names.append(json.loads(body)["filename"])
+
+        sampler = RssSampler(pid) if pid else None
+        if sampler:
+            sampler.start()
+        print(f"Load: {args.concurrency} connections for {args.duration:g} s against {base_url} (mix {args.mix})")
+        recorder, elapsed = run_load(base_url, Scenario(fixtures, args.box_size, seed_names), mix, args.concurrency, args.duration, args.seed)
+        if sampler:
+            sampler.stop()
+        result = summarize(recorder, elapsed, sampler.samples if sampler else [])
+        result["config"] = {"concurrency": args.concurrency, "workers": None if args.url else args.workers, "mix": args.mix, "box_size": args.box_size}
+    finally:
+        if server is not None:
+            server.stop()
+        shutil.rmtree(fixture_dir, ignore_errors=True)
+
+    print_report(result)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    if baseline is not None:
+        if baseline.get("config") != result["config"]:
+            print("\nWarning: baseline was recorded with a different configuration", baseline.get("config"))
+        problems = compare_to_baseline(result, baseline, args.tolerance)
+        if problems:
+            print("\nREGRESSION against baseline:")
+            for problem in problems:
+                print("  " + problem)
+            return 1
+        print(f"\nNo regression against baseline (tolerance {args.tolerance:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
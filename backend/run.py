@@ -2,25 +2,81 @@ import uvicorn
 import os
 import sys
 
+try:
+    from gunicorn.app.base import BaseApplication
+    GUNICORN_SUPPORT = True
+except ImportError:
+    GUNICORN_SUPPORT = False
+
+def env_flag(name, default):
+    return os.environ.get(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+def default_workers():
+    return max(2, min(8, os.cpu_count() or 1))
+
+if GUNICORN_SUPPORT:
+    class PreloadedApplication(BaseApplication):
+        """Gunicorn master that imports the app once and forks uvicorn workers from it"""
+
+        def __init__(self, app, options):
+            self.application = app
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+def run_production(host, port, workers):
+    if GUNICORN_SUPPORT:
+        # Importing before the fork shares qrcode, Pillow and the generator module's pages copy-on-write
+        import app.core.qr_generator  # noqa: F401
+        from app.main import app as asgi_app
+        PreloadedApplication(asgi_app, {
+            "bind": f"{host}:{port}",
+            "workers": workers,
+            "worker_class": "uvicorn.workers.UvicornWorker",
+            "preload_app": True,
+            "timeout": int(os.environ.get("QR_WORKER_TIMEOUT", "120")),
+            "graceful_timeout": 30,
+            "keepalive": 5,
+            "accesslog": "-",
+        }).run()
+    else:
+        # uvicorn spawns its workers, so each one imports the app itself
+        uvicorn.run("app.main:app", host=host, port=port, workers=workers, log_level="info")
+
 def main():
     # Ensure required directories exist
     os.makedirs("uploads", exist_ok=True)
     os.makedirs("outputs", exist_ok=True)
-    
+
+    host = os.environ.get("QR_HOST", "0.0.0.0")
+    port = int(os.environ.get("QR_PORT", "8000"))
+    debug = env_flag("QR_DEBUG", True)
+    workers = int(os.environ.get("QR_WORKERS", "1" if debug else str(default_workers())))
+
     print("🚀 Starting QR Code Generator API...")
-    print("📱 API will be available at: http://localhost:8000")
-    print("📚 API Documentation: http://localhost:8000/docs")
+    print(f"📱 API will be available at: http://localhost:{port}")
+    print(f"📚 API Documentation: http://localhost:{port}/docs")
+    print(f"⚙️  Mode: {'development (auto-reload)' if debug else f'production ({workers} workers)'}")
     print("🛑 Press Ctrl+C to stop the server")
     print("-" * 50)
-    
+
     try:
-        uvicorn.run(
-            "app.main:app",
-            host="0.0.0.0",
-            port=8000,
-            reload=True,
-            log_level="info"
-        )
+        if debug:
+            uvicorn.run(
+                "app.main:app",
+                host=host,
+                port=port,
+                reload=True,
+                log_level="info"
+            )
+        else:
+            run_production(host, port, workers)
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
     except Exception as e:
@@ -28,4 +84,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
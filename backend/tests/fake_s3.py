@@ -0,0 +1,84 @@
+import datetime
+import hashlib
+import io
+import threading
+
+
+class ClientError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+class _Exceptions:
+    ClientError = ClientError
+
+class _Body:
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+        self.closed = False
+
+    def iter_chunks(self, chunk_size):
+        while True:
+            chunk = self._stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+class _Paginator:
+    def __init__(self, client, page_size):
+        self.client = client
+        self.page_size = page_size
+
+    def paginate(self, Bucket, Prefix=""):
+        keys = sorted(key for key in self.client.buckets.setdefault(Bucket, {}) if key.startswith(Prefix))
+        for start in range(0, max(len(keys), 1), self.page_size):
+            yield {"Contents": [{"Key": key} for key in keys[start:start + self.page_size]]}
+
+class FakeS3Client:
+    """In-process stand-in for the parts of a boto3 S3 client S3Storage uses"""
+    exceptions = _Exceptions
+
+    def __init__(self, page_size=1000):
+        self.buckets = {}
+        self.page_size = page_size
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _object(self, bucket, key):
+        entry = self.buckets.setdefault(bucket, {}).get(key)
+        if entry is None:
+            raise ClientError("404")
+        return entry
+
+    def head_object(self, Bucket, Key):
+        self.calls.append("head_object")
+        data, modified = self._object(Bucket, Key)
+        return {"ContentLength": len(data), "LastModified": modified, "ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def upload_fileobj(self, fileobj, bucket, key):
+        self.calls.append("upload_fileobj")
+        with self._lock:
+            self.buckets.setdefault(bucket, {})[key] = (fileobj.read(), datetime.datetime.now(datetime.timezone.utc))
+
+    def upload_file(self, path, bucket, key):
+        with open(path, "rb") as f:
+            self.upload_fileobj(f, bucket, key)
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.calls.append("get_object")
+        data, _ = self._object(Bucket, Key)
+        if Range:
+            start, end = Range[len("bytes="):].split("-")
+            data = data[int(start):int(end) + 1]
+        return {"Body": _Body(data)}
+
+    def delete_object(self, Bucket, Key):
+        self.calls.append("delete_object")
+        self.buckets.setdefault(Bucket, {}).pop(Key, None)
+
+    def get_paginator(self, operation):
+        assert operation == "list_objects_v2"
+        return _Paginator(self, self.page_size)
@@ -0,0 +1,28 @@
+import pytest
+
+from app.core.admission import DEFAULT_MAX_REQUEST_SECONDS, admission_from_env
+from app.storage import gc_interval_seconds, storage_from_env
+
+def test_admission_settings_from_env(monkeypatch):
+    monkeypatch.setenv("QR_MAX_REQUEST_MEMORY_MB", "256")
+    monkeypatch.setenv("QR_ADMISSION_QUEUE_SECONDS", "0")
+    controller = admission_from_env()
+    assert controller.max_request_bytes == 256 * 2**20
+    assert controller.queue_timeout_seconds == 0
+
+def test_invalid_admission_settings_fall_back_with_warning(monkeypatch, capsys):
+    monkeypatch.setenv("QR_MAX_REQUEST_SECONDS", "60s")
+    assert admission_from_env().max_request_seconds == DEFAULT_MAX_REQUEST_SECONDS
+    assert "QR_MAX_REQUEST_SECONDS" in capsys.readouterr().out
+
+@pytest.mark.parametrize("value, expected", [("", 300), ("30", 30), ("five", 300)])
+def test_gc_interval(monkeypatch, value, expected):
+    monkeypatch.setenv("QR_STORAGE_GC_INTERVAL_SECONDS", value)
+    assert gc_interval_seconds() == expected
+
+def test_invalid_storage_quota_falls_back(monkeypatch, tmp_path):
+    monkeypatch.setenv("QR_UPLOAD_QUOTA_MB", "2GB")
+    monkeypatch.setenv("QR_UPLOAD_TTL_HOURS", "1")
+    manager = storage_from_env(str(tmp_path), "UPLOAD", default_ttl_hours=24, default_quota_mb=2)
+    assert manager.quota_bytes == 2 * 1024 * 1024
+    assert manager.ttl_seconds == 3600
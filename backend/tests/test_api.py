@@ -0,0 +1,118 @@
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from app.api import endpoints
+from app.storage import LocalStorage, StorageManager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv("QR_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(endpoints, "upload_storage", LocalStorage(StorageManager(str(tmp_path / "uploads"))))
+    monkeypatch.setattr(endpoints, "output_storage", LocalStorage(StorageManager(str(tmp_path / "outputs"))))
+    buffer = io.BytesIO()
+    Image.new("RGB", (80, 60), (200, 120, 40)).save(buffer, "PNG")
+    buffer.seek(0)
+    endpoints.upload_storage.put_stream("bg.png", buffer)
+    app = FastAPI()
+    app.include_router(endpoints.router, prefix="/api")
+    return TestClient(app)
+
+def test_oversized_data_is_a_client_error(client):
+    response = client.post("/api/generate", json={"filename": "bg.png", "data": "x" * 3000, "error_correction": "H"})
+    assert response.status_code == 422
+    assert "Data too long" in response.json()["detail"]
+
+def test_importing_the_app_does_not_load_pillow():
+    code = "import sys, app.main; sys.exit('PIL' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR).returncode == 0
+
+STYLE = {"box_size": 8, "padding": 1, "border": 2, "background_padding": 4}
+
+def _generate(client, data="https://example.com/export"):
+    response = client.post("/api/generate", json={"filename": "bg.png", "data": data, **STYLE})
+    assert response.status_code == 200, response.text
+    return response.json()["filename"]
+
+def test_generate_saves_render_sidecar(client):
+    from app.core.exports import load_sidecar, sidecar_name
+    from app.core.payloads import plan_encoding
+    from app.core.qr_generator import ERROR_CORRECTION_MAP
+
+    filename = _generate(client)
+    with endpoints.output_storage.materialize(sidecar_name(filename)) as path, open(path, "rb") as f:
+        sidecar = load_sidecar(f.read())
+    assert sidecar.background == "bg.png" and sidecar.logo is None
+    assert sidecar.style.box_size == 8 and sidecar.style.padding == 1
+    assert sidecar.record.version == plan_encoding("https://example.com/export", ERROR_CORRECTION_MAP["H"]).version
+    assert sidecar.record.module_rgb is not None
+    assert client.get(f"/api/download/{sidecar_name(filename)}").status_code == 404
+
+def test_png_export_at_original_size_matches_output(client):
+    filename = _generate(client)
+    exported = client.get(f"/api/export/{filename}", params={"format": "png"})
+    assert exported.status_code == 200
+    assert exported.headers["content-type"] == "image/png"
+    with Image.open(io.BytesIO(exported.content)) as image, Image.open(io.BytesIO(client.get(f"/api/download/{filename}").content)) as original:
+        assert image.size == original.size
+        assert image.tobytes() == original.convert(image.mode).tobytes()
+
+@pytest.mark.parametrize("output_format, media_type", [("svg", "image/svg+xml"), ("webp", "image/webp"), ("png", "image/png")])
+def test_export_formats_at_another_box_size(client, output_format, media_type):
+    filename = _generate(client)
+    response = client.get(f"/api/export/{filename}", params={"format": output_format, "box_size": 4})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(media_type)
+    assert "immutable" in response.headers["cache-control"]
+    if output_format == "svg":
+        assert b"<svg" in response.content[:200]
+    else:
+        with Image.open(io.BytesIO(response.content)) as image:
+            assert image.format == output_format.upper()
+            assert image.width == image.height and image.width % 4 == 0
+
+def test_concurrent_export_never_serves_a_partial_file(client, monkeypatch):
+    import threading
+
+    from app.core import exports
+
+    filename = _generate(client)
+    export_filename = f"{os.path.splitext(filename)[0]}_8px.png"
+    save_export = exports.save_export
+    half_written, release = threading.Event(), threading.Event()
+
+    def slow_save_export(sidecar, output_format, fp, *args, **kwargs):
+        buffer = io.BytesIO()
+        save_export(sidecar, output_format, buffer, *args, **kwargs)
+        data = buffer.getvalue()
+        if not half_written.is_set():
+            fp.write(data[:len(data) // 2])
+            fp.flush()
+            half_written.set()
+            assert release.wait(10)
+            fp.write(data[len(data) // 2:])
+        else:
+            fp.write(data)
+
+    monkeypatch.setattr(exports, "save_export", slow_save_export)
+    first = {}
+    worker = threading.Thread(target=lambda: first.update(response=client.get(f"/api/export/{filename}", params={"format": "png"})))
+    worker.start()
+    try:
+        assert half_written.wait(10)
+        assert endpoints.output_storage.stat(export_filename) is None
+        second = client.get(f"/api/export/{filename}", params={"format": "png"})
+    finally:
+        release.set()
+        worker.join(10)
+    assert second.status_code == first["response"].status_code == 200
+    assert first["response"].content == second.content
+    Image.open(io.BytesIO(second.content)).verify()
@@ -0,0 +1,22 @@
+import os
+
+from app.core.cache import DiskCache
+
+def test_hit_refreshes_atime_and_keeps_mtime(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    key = DiskCache.make_key("entry")
+    assert cache.set(key, b"payload")
+    path = cache._path(key)
+    os.utime(path, ns=(1_000_000_000, 2_000_000_000))
+
+    assert cache.get(key) == b"payload"
+    stat = os.stat(path)
+    assert stat.st_atime_ns > 2_000_000_000
+    assert stat.st_mtime_ns == 2_000_000_000
+
+def test_miss_and_oversized_entries(tmp_path):
+    cache = DiskCache(str(tmp_path), max_entry_bytes=4)
+    key = DiskCache.make_key("big")
+    assert cache.get(key) is None
+    assert not cache.set(key, b"too large")
+    assert cache.get(key) is None
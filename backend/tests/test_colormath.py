@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from app.core.colormath import contrasting_color_pair, hsl_from_rgb_array, increase_brightness_array, reduce_brightness_array
+from app.core.qr_generator import (
+    ADAPTIVE_DARKEN_FACTOR, ADAPTIVE_LIGHTEN_FACTOR, ADAPTIVE_LUMINANCE_THRESHOLD, ADAPTIVE_NEAR_BLACK_THRESHOLD,
+    ADAPTIVE_NEAR_WHITE_THRESHOLD, calculate_hsl_from_rgb, compute_adaptive_module_colors, increase_rgb_brightness,
+    reduce_rgb_brightness,
+)
+
+EDGE_COLORS = [(0, 0, 0), (255, 255, 255), (255, 0, 0), (0, 255, 0), (0, 0, 255), (128, 128, 128),
+               (1, 0, 0), (255, 254, 255), (240, 240, 240), (15, 15, 15), (127, 64, 191)]
+
+def _sample_colors(n=5000):
+    rng = np.random.default_rng(28)
+    return np.vstack([np.array(EDGE_COLORS), rng.integers(0, 256, size=(n, 3))]).astype(np.int64)
+
+def test_hsl_array_matches_scalar():
+    colors = _sample_colors()
+    h, s, l = hsl_from_rgb_array(colors)
+    expected = np.array([calculate_hsl_from_rgb(*map(int, c)) for c in colors])
+    np.testing.assert_array_equal(np.stack([h, s, l], axis=1), expected)
+
+@pytest.mark.parametrize("factor", [0.0, 0.3, 0.5, 1.0, 1.7, -0.2])
+def test_brightness_arrays_match_scalar(factor):
+    colors = _sample_colors(500)
+    reduced = reduce_brightness_array(colors, factor)
+    increased = increase_brightness_array(colors, factor)
+    assert [tuple(c) for c in reduced.tolist()] == [reduce_rgb_brightness(tuple(map(int, c)), factor) for c in colors]
+    assert [tuple(c) for c in increased.tolist()] == [increase_rgb_brightness(tuple(map(int, c)), factor) for c in colors]
+
+def test_brightness_arrays_pass_alpha_through():
+    rgba = np.array([[200, 100, 50, 77]])
+    assert reduce_brightness_array(rgba, 0.5).tolist() == [[100, 50, 25, 77]]
+    assert increase_brightness_array(rgba, 0.5).tolist() == [[227, 177, 152, 77]]
+
+def test_contrasting_pair_skips_pure_black_and_white():
+    colors = ((0, 0, 0), (255, 255, 255), (30, 40, 50), (220, 210, 200))
+    assert contrasting_color_pair(colors, 130, (1, 1, 1), (254, 254, 254)) == ((30, 40, 50), (220, 210, 200))
+    assert contrasting_color_pair(((0, 0, 0),), 130, (1, 1, 1), (254, 254, 254)) == ((1, 1, 1), (254, 254, 254))
+
+def _scalar_module_color(local, is_dark, dark_choice, light_choice):
+    _, _, l = calculate_hsl_from_rgb(*local)
+    if is_dark:
+        if all(c >= ADAPTIVE_NEAR_WHITE_THRESHOLD for c in local):
+            return dark_choice
+        return reduce_rgb_brightness(local, ADAPTIVE_DARKEN_FACTOR) if l >= ADAPTIVE_LUMINANCE_THRESHOLD else local
+    if all(c <= ADAPTIVE_NEAR_BLACK_THRESHOLD for c in local):
+        return light_choice
+    return increase_rgb_brightness(local, ADAPTIVE_LIGHTEN_FACTOR) if l < ADAPTIVE_LUMINANCE_THRESHOLD else local
+
+def test_adaptive_module_colors_match_per_module_rules():
+    colors = _sample_colors(2000)
+    is_dark = np.arange(len(colors)) % 2 == 0
+    dominant = [(250, 250, 250), (40, 60, 90), (200, 180, 120)]
+    dark_module, light_module = (0, 0, 0, 255), (255, 255, 255, 255)
+    result = compute_adaptive_module_colors(colors, is_dark, dominant, dark_module, light_module)
+    expected = [
+        _scalar_module_color(tuple(map(int, c)), bool(d), (40, 60, 90), (250, 250, 250))
+        for c, d in zip(colors, is_dark)
+    ]
+    assert [tuple(c) for c in result.tolist()] == expected
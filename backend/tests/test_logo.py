@@ -0,0 +1,27 @@
+import pytest
+import qrcode
+
+from app.core.logo import LogoTooLarge, check_logo_fits, data_bit_positions, fit_logo_version, function_module_mask
+
+def test_placement_tables_are_cached_and_read_only():
+    assert data_bit_positions(7) is data_bit_positions(7)
+    assert function_module_mask(7) is function_module_mask(7)
+    rows, cols = data_bit_positions(7)
+    with pytest.raises(ValueError):
+        rows[0] = 0
+    with pytest.raises(ValueError):
+        function_module_mask(7)[0, 0] = False
+
+@pytest.mark.parametrize("version", [1, 2, 7, 21, 40])
+def test_data_bits_fill_every_non_function_module(version):
+    rows, cols = data_bit_positions(version)
+    mask = function_module_mask(version)
+    assert len(rows) == mask.size - mask.sum()
+    assert not mask[rows, cols].any()
+    assert len(set(zip(rows.tolist(), cols.tolist()))) == len(rows)
+
+def test_logo_moves_up_a_version_or_is_refused():
+    high = qrcode.constants.ERROR_CORRECT_H
+    assert fit_logo_version(1, high, 0.2, 1) >= 1
+    with pytest.raises(LogoTooLarge):
+        check_logo_fits(1, qrcode.constants.ERROR_CORRECT_L, 0.4, 4)
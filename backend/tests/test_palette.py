@@ -0,0 +1,43 @@
+import numpy as np
+from PIL import Image
+
+from app.core.qr_generator import DominantPalette, analyze_dominant_colors, calculate_hsl_from_rgb, get_dominant_colors
+
+def _baseline_palette(img, size=(150, 150), num_colors=16):
+    thumb = img.convert("RGB")
+    thumb.thumbnail(size, Image.Resampling.LANCZOS)
+    quantized = thumb.quantize(colors=num_colors, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+    palette = quantized.getpalette()
+    counts = sorted(quantized.getcolors(maxcolors=thumb.size[0] * thumb.size[1]), key=lambda c: c[0], reverse=True)
+    return [tuple(palette[i * 3:i * 3 + 3]) for _, i in counts][:num_colors]
+
+def _semi_transparent_background():
+    rng = np.random.default_rng(7)
+    pixels = rng.integers(0, 256, size=(240, 320, 4), dtype=np.uint8)
+    pixels[..., 3] = np.linspace(0, 255, 320, dtype=np.uint8)
+    pixels[:80, :, :3] = (200, 30, 60)
+    return Image.fromarray(pixels, "RGBA")
+
+def test_rgba_palette_matches_rgb_first_reduction():
+    img = _semi_transparent_background()
+    assert get_dominant_colors(img) == _baseline_palette(img)
+    assert img.mode == "RGBA"
+
+def test_rgb_source_is_not_converted_or_closed():
+    img = Image.new("RGB", (64, 48), (10, 120, 240))
+    palette = analyze_dominant_colors(img)
+    assert list(palette) == [(10, 120, 240)] * 3
+    assert img.getpixel((0, 0)) == (10, 120, 240)
+
+def test_palette_precomputes_hsl_per_color():
+    colors = [(255, 0, 0), (12, 34, 56), (250, 250, 250)]
+    palette = DominantPalette(colors)
+    assert palette[1] == (12, 34, 56) and len(palette) == 3
+    for color, s, l in zip(colors, palette.saturation, palette.luminance):
+        assert (s, l) == calculate_hsl_from_rgb(*color)[1:]
+
+def test_palette_from_invalid_colors_falls_back_to_black():
+    assert list(DominantPalette.from_colors(None)) == [(0, 0, 0)] * 3
+    assert list(DominantPalette.from_colors([(1, 2), "x"])) == [(0, 0, 0)]
+    palette = DominantPalette([(1, 2, 3)])
+    assert DominantPalette.from_colors(palette) is palette
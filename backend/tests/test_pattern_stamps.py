@@ -0,0 +1,33 @@
+from PIL import Image
+
+from app.core.qr_generator import StampCache, get_pattern_stamp
+
+def _entry(side):
+    return Image.new("RGBA", (side, side)), 0, 0
+
+def test_stamp_cache_is_bounded_by_bytes():
+    cache = StampCache(max_bytes=3 * 10 * 10 * 4)
+    for index in range(10):
+        cache.put(index, _entry(10))
+        assert cache.size_bytes <= cache.max_bytes
+    assert [key for key in range(10) if cache.get(key) is not None] == [7, 8, 9]
+
+def test_stamp_cache_evicts_least_recently_used():
+    cache = StampCache(max_bytes=2 * 10 * 10 * 4)
+    cache.put("a", _entry(10))
+    cache.put("b", _entry(10))
+    cache.get("a")
+    cache.put("c", _entry(10))
+    assert cache.get("a") is not None and cache.get("b") is None and cache.get("c") is not None
+
+def test_stamp_cache_skips_oversized_stamps():
+    cache = StampCache(max_bytes=100)
+    cache.put("big", _entry(10))
+    assert cache.get("big") is None and cache.size_bytes == 0
+
+def test_pattern_stamp_is_reused():
+    args = ("rounded_square", (70.0, 50.0, 30.0), 12.0, ((0, 0, 0, 255), (255, 255, 255, 255), (0, 0, 0, 255)), 0.5, 0.5)
+    first = get_pattern_stamp(*args)
+    assert get_pattern_stamp(*args) is first
+    stamp, offset_x, offset_y = first
+    assert stamp.mode == "RGBA" and offset_x < 0 and offset_y < 0
@@ -0,0 +1,69 @@
+import pytest
+import qrcode
+import qrcode.util
+from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M
+
+from app.core.payloads import build_wifi, plan_encoding
+
+SAMPLES = [
+    "0123456789" * 12,
+    "HELLO WORLD 123",
+    "https://example.com/some/path?q=1",
+    "WIFI:T:WPA;S:home;P:secret;;",
+    "ORDER 12345678901234567890 SHIPPED",
+    "héllo wörld",
+    "x" * 300,
+]
+
+def _qrcode_choice(data, error_correction):
+    qr = qrcode.QRCode(error_correction=error_correction)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.version, qr.data_list
+
+def _buffer_bits(segments, version):
+    buffer = qrcode.util.BitBuffer()
+    for segment in segments:
+        buffer.put(segment.mode, 4)
+        buffer.put(len(segment), qrcode.util.length_in_bits(segment.mode, version))
+        segment.write(buffer)
+    return len(buffer)
+
+@pytest.mark.parametrize("data", SAMPLES)
+@pytest.mark.parametrize("error_correction", [ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_H])
+def test_plan_never_needs_a_larger_version_than_qrcode(data, error_correction):
+    plan = plan_encoding(data, error_correction)
+    qr_version, qr_segments = _qrcode_choice(data, error_correction)
+    assert plan.version <= qr_version
+    assert plan.bit_length == _buffer_bits(plan.segments, plan.version)
+    assert plan.bit_length <= _buffer_bits(qr_segments, plan.version)
+    assert b"".join(s.data for s in plan.segments) == data.encode("utf-8")
+
+@pytest.mark.parametrize("data, mode", [
+    ("0123456789" * 5, "numeric"),
+    ("HELLO WORLD", "alphanumeric"),
+    ("hello world", "byte"),
+])
+def test_single_mode_payloads_match_qrcode(data, mode):
+    plan = plan_encoding(data, ERROR_CORRECT_M)
+    qr_version, qr_segments = _qrcode_choice(data, ERROR_CORRECT_M)
+    assert plan.describe() == [{"mode": mode, "length": len(data)}]
+    assert [s.mode for s in plan.segments] == [s.mode for s in qr_segments]
+    assert plan.version == qr_version
+
+def test_mixed_payload_uses_numeric_run():
+    plan = plan_encoding("order 12345678901234567890 shipped", ERROR_CORRECT_M)
+    assert {"mode": "numeric", "length": 20} in plan.describe()
+
+def test_plan_segments_render_at_planned_version():
+    data = build_wifi("home", "secret")
+    plan = plan_encoding(data, ERROR_CORRECT_M)
+    qr = qrcode.QRCode(version=plan.version, error_correction=ERROR_CORRECT_M)
+    qr.data_list = list(plan.segments)
+    qr.make(fit=False)
+    assert qr.modules_count == plan.modules_count
+
+def test_min_version_and_oversized_data():
+    assert plan_encoding("hi", ERROR_CORRECT_M, min_version=12).version == 12
+    with pytest.raises(ValueError, match="Data too long"):
+        plan_encoding("x" * 3000, ERROR_CORRECT_H)
@@ -0,0 +1,19 @@
+import pytest
+
+from app.core import qr_generator
+
+@pytest.fixture(autouse=True)
+def fresh_setting():
+    qr_generator.render_threads.cache_clear()
+    yield
+    qr_generator.render_threads.cache_clear()
+
+@pytest.mark.parametrize("value, expected", [("", 1), ("4", 4), ("0", 1), ("-2", 1)])
+def test_render_threads(monkeypatch, value, expected):
+    monkeypatch.setenv("QR_RENDER_THREADS", value)
+    assert qr_generator.render_threads() == expected
+
+def test_invalid_render_threads_fall_back_with_warning(monkeypatch, capsys):
+    monkeypatch.setenv("QR_RENDER_THREADS", "four")
+    assert qr_generator.render_threads() == 1
+    assert "QR_RENDER_THREADS" in capsys.readouterr().out
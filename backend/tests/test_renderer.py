@@ -0,0 +1,70 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.core.qr_generator import create_qr_code
+from app.core.renderer import QRRenderer, RenderStyle
+
+STYLE = {"box_size": 8, "border": 2, "padding": 1, "background_padding": 4}
+
+@pytest.fixture
+def background(tmp_path):
+    path = tmp_path / "bg.png"
+    Image.radial_gradient("L").convert("RGB").resize((120, 90)).save(path)
+    return str(path)
+
+@pytest.fixture
+def logo(tmp_path):
+    path = tmp_path / "logo.png"
+    Image.new("RGBA", (40, 40), (255, 0, 0, 180)).save(path)
+    return str(path)
+
+def _png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+def _create(tmp_path, data, background, **options):
+    output = tmp_path / "wrapper.png"
+    create_qr_code(data, background, str(output), **options)
+    return output.read_bytes()
+
+@pytest.mark.parametrize("options", [
+    {"data_module_shape": "diamond", "data_module_color_mode": "adaptive"},
+    {"data_module_shape": "circle", "data_module_color_mode": "static", "finder_color_mode": "static"},
+    {"data_module_shape": "square", "data_module_color_mode": "adaptive", "finder_shape": "circle"},
+])
+def test_stages_match_create_qr_code(tmp_path, background, options):
+    options = {**STYLE, **options}
+    renderer = QRRenderer(RenderStyle(**options), threads=1)
+    matrix = renderer.encode("https://example.com/stages")
+    prepared = renderer.prepare_background(background, matrix)
+    record = renderer.resolve(matrix, prepared, renderer.prepare_style(prepared))
+    staged = _png(renderer.draw(record, prepared))
+    renderer.close()
+    assert staged == _create(tmp_path, "https://example.com/stages", background, **options)
+
+def test_render_data_with_logo_matches_create_qr_code(tmp_path, background, logo):
+    renderer = QRRenderer(RenderStyle(**STYLE), threads=1)
+    staged = _png(renderer.render_data("logo payload", background, logo_path=logo))
+    renderer.close()
+    assert staged == _create(tmp_path, "logo payload", background, logo_path=logo, **STYLE)
+
+def test_reused_renderer_and_threads_do_not_change_output(tmp_path, background):
+    serial = QRRenderer(RenderStyle(**STYLE), threads=1)
+    threaded = QRRenderer(RenderStyle(**STYLE), threads=4)
+    serial.render_data("first", background)
+    assert _png(serial.render_data("second", background)) == _png(threaded.render_data("second", background))
+    assert _png(threaded.render_data("second", background)) == _create(tmp_path, "second", background, **STYLE)
+    serial.close()
+    threaded.close()
+
+def test_draw_rejects_background_of_another_size(background):
+    renderer = QRRenderer(RenderStyle(**STYLE), threads=1)
+    small = renderer.encode("a")
+    large = renderer.encode("a", min_version=small.version + 1)
+    record = renderer.resolve(small, renderer.prepare_background(background, small))
+    with pytest.raises(ValueError):
+        renderer.draw(record, renderer.prepare_background(background, large))
+    renderer.close()
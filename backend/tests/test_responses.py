@@ -0,0 +1,121 @@
+import email.utils
+import io
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from app.storage import LocalStorage, MemoryStorage, S3Storage, StorageManager, storage_response
+from app.storage.responses import parse_range
+
+from .fake_s3 import FakeS3Client
+
+BODY = bytes(range(256)) * 4
+
+def test_parse_range_without_header():
+    assert parse_range(None, 100) is None
+    assert parse_range("", 100) is None
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),
+    ("bytes=90-500", (90, 99)),
+    (" bytes=5-5 ", (5, 5)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+@pytest.mark.parametrize("header", ["bytes=0-9,20-29", "items=0-9", "bytes=-", "bytes=a-b"])
+def test_parse_range_ignores_unsupported(header):
+    assert parse_range(header, 100) is None
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=100-200", "bytes=9-5", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(HTTPException) as raised:
+        parse_range(header, 100)
+    assert raised.value.status_code == 416
+    assert raised.value.headers["Content-Range"] == "bytes */100"
+
+@pytest.fixture(params=["local", "memory", "s3"])
+def client(request, tmp_path):
+    if request.param == "local":
+        backend = LocalStorage(StorageManager(str(tmp_path / "store")))
+    elif request.param == "memory":
+        backend = MemoryStorage()
+    else:
+        backend = S3Storage("bucket", client=FakeS3Client())
+    backend.put_stream("code.png", io.BytesIO(BODY))
+    app = FastAPI()
+
+    @app.api_route("/files/{name}", methods=["GET", "HEAD"])
+    async def serve(name: str, request: Request):
+        return await storage_response(request, backend, name, "image/png", "public, max-age=60", download_filename=name)
+
+    return TestClient(app)
+
+def test_full_body(client):
+    response = client.get("/files/code.png")
+    assert response.status_code == 200
+    assert response.content == BODY
+    assert response.headers["content-length"] == str(len(BODY))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["cache-control"] == "public, max-age=60"
+    assert response.headers["content-disposition"] == 'attachment; filename="code.png"'
+    assert response.headers["etag"].startswith('"')
+
+def test_missing_object(client):
+    assert client.get("/files/missing.png").status_code == 404
+
+def test_head_has_headers_only(client):
+    response = client.head("/files/code.png")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(BODY))
+
+def test_range(client):
+    response = client.get("/files/code.png", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.content == BODY[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(BODY)}"
+    assert response.headers["content-length"] == "100"
+
+def test_suffix_range(client):
+    response = client.get("/files/code.png", headers={"Range": "bytes=-24"})
+    assert response.status_code == 206
+    assert response.content == BODY[-24:]
+
+def test_unsatisfiable_range(client):
+    response = client.get("/files/code.png", headers={"Range": f"bytes={len(BODY)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(BODY)}"
+
+def test_if_none_match(client):
+    etag = client.get("/files/code.png").headers["etag"]
+    response = client.get("/files/code.png", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert client.get("/files/code.png", headers={"If-None-Match": '"other", ' + etag}).status_code == 304
+    assert client.get("/files/code.png", headers={"If-None-Match": "*"}).status_code == 304
+    assert client.get("/files/code.png", headers={"If-None-Match": '"other"'}).status_code == 200
+
+def test_if_modified_since(client):
+    last_modified = client.get("/files/code.png").headers["last-modified"]
+    assert client.get("/files/code.png", headers={"If-Modified-Since": last_modified}).status_code == 304
+    earlier = email.utils.formatdate(email.utils.parsedate_to_datetime(last_modified).timestamp() - 3600, usegmt=True)
+    assert client.get("/files/code.png", headers={"If-Modified-Since": earlier}).status_code == 200
+    assert client.get("/files/code.png", headers={"If-Modified-Since": "not a date"}).status_code == 200
+
+def test_if_none_match_wins_over_if_modified_since(client):
+    last_modified = client.get("/files/code.png").headers["last-modified"]
+    response = client.get("/files/code.png", headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified})
+    assert response.status_code == 200
+
+def test_if_range(client):
+    etag = client.get("/files/code.png").headers["etag"]
+    matching = client.get("/files/code.png", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert matching.status_code == 206 and matching.content == BODY[:10]
+    stale = client.get("/files/code.png", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200 and stale.content == BODY
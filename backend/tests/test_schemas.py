@@ -0,0 +1,33 @@
+import pytest
+from pydantic import ValidationError
+
+from app.models.schemas import EncodingPlanRequest, QRBatchRequest, QRGenerationRequest
+
+def test_generation_request_defaults():
+    params = QRGenerationRequest.model_validate({"filename": "bg.png", "data": "hello"})
+    assert params.render_params()["box_size"] == 25
+    assert "logo_scale" not in params.render_params()
+
+@pytest.mark.parametrize("model, payload", [
+    (QRGenerationRequest, {"filename": "bg.png", "data": "hello", "box_sise": 10}),
+    (QRGenerationRequest, {"filename": "bg.png", "data": "hello", "innermost_brightness_reduction": 0.5}),
+    (QRGenerationRequest, {"filename": "bg.png", "payload": {"type": "wifi", "ssid": "home", "pasword": "x"}}),
+    (QRBatchRequest, {"filename": "bg.png", "items": ["a"], "output_fromat": "gif"}),
+    (EncodingPlanRequest, {"data": "hello", "error_corection": "L"}),
+])
+def test_unknown_fields_are_rejected(model, payload):
+    with pytest.raises(ValidationError) as raised:
+        model.model_validate(payload)
+    assert any(error["type"] == "extra_forbidden" for error in raised.value.errors())
+
+def test_invalid_style_is_rejected_before_rendering():
+    with pytest.raises(ValidationError):
+        QRGenerationRequest.model_validate({"filename": "bg.png", "box_size": 4, "padding": 2, "diamond_border_width": 1})
+    with pytest.raises(ValidationError):
+        QRGenerationRequest.model_validate({"filename": "../etc/passwd"})
+
+def test_structured_payload_is_encoded_into_data():
+    params = QRGenerationRequest.model_validate(
+        {"filename": "bg.png", "payload": {"type": "geo", "latitude": 1.5, "longitude": -2}}
+    )
+    assert params.data.startswith("geo:")
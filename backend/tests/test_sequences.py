@@ -0,0 +1,62 @@
+import contextlib
+import re
+
+import pytest
+from PIL import Image
+from qrcode.constants import ERROR_CORRECT_M
+
+from app.core.sequences import FORMAT_EXTENSIONS, SheetLayout, render_sequence, shared_version
+
+ITEMS = ["one", "two", "three", "a longer payload for four", "five"]
+
+@pytest.fixture
+def background(tmp_path):
+    path = tmp_path / "bg.png"
+    Image.new("RGBA", (90, 60), (40, 120, 200, 200)).save(path)
+    return str(path)
+
+def _render(tmp_path, background, output_format, items=ITEMS, **kwargs):
+    paths = []
+
+    @contextlib.contextmanager
+    def open_output(index):
+        path = tmp_path / f"out-{index}{FORMAT_EXTENSIONS[output_format]}"
+        paths.append(path)
+        yield str(path)
+
+    version, written = render_sequence(
+        items, background, output_format, open_output, box_size=6, border=2, error_correction=ERROR_CORRECT_M,
+        background_image_mode="Stretched", background_padding=0, background_alpha=255, padding=1, **kwargs,
+    )
+    assert written == len(paths)
+    return version, paths
+
+@pytest.mark.parametrize("output_format", ["gif", "apng"])
+def test_animations_have_one_frame_per_item(tmp_path, background, output_format):
+    version, (path,) = _render(tmp_path, background, output_format)
+    assert version == shared_version(ITEMS, ERROR_CORRECT_M)
+    with Image.open(path) as animation:
+        assert animation.n_frames == len(ITEMS)
+        assert animation.size == ((version * 4 + 17 + 4) * 6,) * 2
+        animation.seek(len(ITEMS) - 1)
+        animation.load()
+
+def test_pdf_has_one_page_per_sheet(tmp_path, background):
+    _, (path,) = _render(tmp_path, background, "pdf", columns=2, rows=1)
+    data = path.read_bytes()
+    assert data.startswith(b"%PDF-1.4") and data.rstrip().endswith(b"%%EOF")
+    assert int(re.search(rb"/Type /Pages /Kids \[[^\]]*\] /Count (\d+)", data).group(1)) == 3
+    assert len(re.findall(rb"/Type /Page ", data)) == 3
+
+def test_png_sheets_are_written_page_by_page(tmp_path, background):
+    _, paths = _render(tmp_path, background, "png", columns=2, rows=2, cell_gap=4, page_margin=8)
+    assert len(paths) == SheetLayout(2, 2, 1, 0, 0).page_count(len(ITEMS)) == 2
+    with Image.open(paths[0]) as page:
+        assert page.size[0] == page.size[1]
+
+def test_unknown_format_and_empty_batch_are_rejected(tmp_path, background):
+    with pytest.raises(ValueError):
+        _render(tmp_path, background, "png", items=[])
+    with pytest.raises(ValueError):
+        render_sequence(ITEMS, background, "tiff", None, box_size=6, border=2, error_correction=ERROR_CORRECT_M,
+                        background_image_mode="Stretched", background_padding=0, background_alpha=255)
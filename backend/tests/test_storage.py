@@ -0,0 +1,175 @@
+import asyncio
+import io
+import os
+import threading
+
+import pytest
+
+from app.storage import LocalStorage, MemoryStorage, S3Storage, StorageManager, in_threadpool
+
+from .fake_s3 import FakeS3Client
+
+BACKENDS = ["local", "memory", "s3"]
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path):
+    if request.param == "local":
+        return LocalStorage(StorageManager(str(tmp_path / "store")))
+    if request.param == "memory":
+        return MemoryStorage()
+    return S3Storage("bucket", prefix="uploads/", client=FakeS3Client(page_size=2))
+
+def read_all(backend, name):
+    info = backend.stat(name)
+    return b"".join(backend.iter_range(name, 0, info.size - 1))
+
+def test_put_stat_and_read(backend):
+    backend.put_stream("a.png", io.BytesIO(b"0123456789"))
+    info = backend.stat("a.png")
+    assert (info.name, info.size) == ("a.png", 10)
+    assert read_all(backend, "a.png") == b"0123456789"
+    assert b"".join(backend.iter_range("a.png", 2, 5)) == b"2345"
+    assert backend.stat("missing.png") is None
+
+def test_iter_range_chunks(backend):
+    backend.put_stream("big.bin", io.BytesIO(bytes(range(256)) * 10))
+    chunks = list(backend.iter_range("big.bin", 0, 2559, chunk_size=1000))
+    assert b"".join(chunks) == bytes(range(256)) * 10
+    assert max(len(chunk) for chunk in chunks) <= 1000
+
+def test_list_and_delete(backend):
+    for name in ("a.png", "b.png", "c.png"):
+        backend.put_stream(name, io.BytesIO(name.encode()))
+    assert sorted(backend.list_names()) == ["a.png", "b.png", "c.png"]
+    backend.delete("b.png")
+    backend.delete("b.png")
+    assert sorted(backend.list_names()) == ["a.png", "c.png"]
+    assert backend.stat("b.png") is None
+
+def test_materialize_yields_readable_copy(backend):
+    backend.put_stream("bg.jpg", io.BytesIO(b"image bytes"))
+    with backend.materialize("bg.jpg") as path:
+        assert path.endswith(".jpg")
+        with open(path, "rb") as f:
+            assert f.read() == b"image bytes"
+    if not isinstance(backend, LocalStorage):
+        assert not os.path.exists(path)
+    with pytest.raises(FileNotFoundError):
+        with backend.materialize("missing.jpg"):
+            pass
+
+def test_writable_path_stores_on_exit(backend):
+    with backend.writable_path("out.png") as path:
+        with open(path, "wb") as f:
+            f.write(b"rendered")
+    assert read_all(backend, "out.png") == b"rendered"
+
+def test_writable_path_discards_on_error(backend):
+    with pytest.raises(RuntimeError):
+        with backend.writable_path("failed.png") as path:
+            with open(path, "wb") as f:
+                f.write(b"partial")
+            raise RuntimeError("render failed")
+    assert backend.stat("failed.png") is None
+
+def test_writable_path_is_invisible_until_exit(backend):
+    backend.put_stream("out.png", io.BytesIO(b"previous"))
+    with backend.writable_path("out.png") as path:
+        with open(path, "wb") as f:
+            f.write(b"rendered")
+        assert read_all(backend, "out.png") == b"previous"
+        assert backend.list_names() == ["out.png"]
+    assert read_all(backend, "out.png") == b"rendered"
+
+def test_fingerprint_is_stable_across_materialize(backend):
+    backend.put_stream("bg.jpg", io.BytesIO(b"first"))
+    with backend.materialize("bg.jpg") as first_path:
+        first = backend.fingerprint(backend.stat("bg.jpg"))
+    with backend.materialize("bg.jpg") as second_path:
+        second = backend.fingerprint(backend.stat("bg.jpg"))
+    assert first == second
+    if not isinstance(backend, LocalStorage):
+        # Each materialize is a new temporary copy, so path-based keys would never repeat
+        assert first_path != second_path
+
+def test_fingerprint_changes_with_contents(backend):
+    backend.put_stream("bg.jpg", io.BytesIO(b"first"))
+    before = backend.fingerprint(backend.stat("bg.jpg"))
+    backend.put_stream("bg.jpg", io.BytesIO(b"second version"))
+    assert backend.fingerprint(backend.stat("bg.jpg")) != before
+
+def test_fingerprint_distinguishes_backends(tmp_path):
+    one, two = MemoryStorage(), MemoryStorage()
+    for backend in (one, two):
+        backend.put_stream("bg.jpg", io.BytesIO(b"same"))
+    assert one.fingerprint(one.stat("bg.jpg"))[0] != two.fingerprint(two.stat("bg.jpg"))[0]
+
+def test_s3_uses_prefix_and_etag():
+    client = FakeS3Client()
+    backend = S3Storage("bucket", prefix="outputs/", client=client)
+    backend.put_stream("a.png", io.BytesIO(b"data"))
+    assert list(client.buckets["bucket"]) == ["outputs/a.png"]
+    info = backend.stat("a.png")
+    assert info.etag and info.path is None
+
+def test_in_threadpool_runs_enter_and_exit_off_the_loop(backend):
+    backend.put_stream("bg.jpg", io.BytesIO(b"image bytes"))
+    threads = []
+
+    class Recording:
+        def __init__(self, inner):
+            self.inner = inner
+
+        def __enter__(self):
+            threads.append(threading.get_ident())
+            return self.inner.__enter__()
+
+        def __exit__(self, *exc_info):
+            threads.append(threading.get_ident())
+            return self.inner.__exit__(*exc_info)
+
+    async def run():
+        async with in_threadpool(Recording(backend.materialize("bg.jpg"))) as path:
+            with open(path, "rb") as f:
+                return f.read(), threading.get_ident()
+
+    data, loop_thread = asyncio.run(run())
+    assert data == b"image bytes"
+    assert len(threads) == 2 and loop_thread not in threads
+
+def test_in_threadpool_passes_errors_to_exit(backend):
+    async def run():
+        async with in_threadpool(backend.writable_path("out.png")) as path:
+            with open(path, "wb") as f:
+                f.write(b"partial")
+            raise ValueError("render failed")
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
+    assert backend.stat("out.png") is None
+
+def test_s3_against_local_server(tmp_path):
+    """S3Storage against a real S3-compatible server (moto), when it is installed"""
+    boto3 = pytest.importorskip("boto3")
+    moto_server = pytest.importorskip("moto.server")
+    server = moto_server.ThreadedMotoServer(port=0)
+    server.start()
+    try:
+        host, port = server.get_host_and_port()
+        endpoint_url = f"http://{host}:{port}"
+        client = boto3.client(
+            "s3", endpoint_url=endpoint_url, region_name="us-east-1",
+            aws_access_key_id="test", aws_secret_access_key="test",
+        )
+        client.create_bucket(Bucket="bucket")
+        backend = S3Storage("bucket", prefix="uploads/", endpoint_url=endpoint_url, client=client)
+        backend.put_stream("a.png", io.BytesIO(b"0123456789"))
+        assert backend.stat("a.png").size == 10
+        assert b"".join(backend.iter_range("a.png", 3, 6)) == b"3456"
+        with backend.writable_path("b.png") as path:
+            with open(path, "wb") as f:
+                f.write(b"out")
+        assert sorted(backend.list_names()) == ["a.png", "b.png"]
+        assert backend.stat("missing.png") is None
+    finally:
+        server.stop()
@@ -0,0 +1,35 @@
+import io
+import os
+import subprocess
+import sys
+
+from PIL import Image
+
+from app.core.thumbnails import render_thumbnail
+
+EXIF_ORIENTATION = 0x0112
+
+def _save_jpeg(path, size, orientation=None):
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[EXIF_ORIENTATION] = orientation
+    Image.new("RGB", size, "red").save(path, "JPEG", exif=exif)
+
+def test_thumbnail_fits_size(tmp_path):
+    path = str(tmp_path / "wide.jpg")
+    _save_jpeg(path, (400, 200))
+    with Image.open(io.BytesIO(render_thumbnail(path, 128))) as thumbnail:
+        assert thumbnail.format == "WEBP"
+        assert thumbnail.size == (128, 64)
+
+def test_thumbnail_applies_exif_orientation(tmp_path):
+    # Orientation 6: stored landscape, displayed rotated 90 degrees clockwise
+    path = str(tmp_path / "phone.jpg")
+    _save_jpeg(path, (400, 200), orientation=6)
+    with Image.open(io.BytesIO(render_thumbnail(path, 128))) as thumbnail:
+        assert thumbnail.size == (64, 128)
+
+def test_importing_thumbnails_does_not_load_pillow():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, app.core.thumbnails; sys.exit('PIL' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], cwd=backend_dir).returncode == 0
@@ -125,7 +125,7 @@ function displayUploadedImages() {
         <div class="uploaded-image ${filename === currentFilename ? 'selected' : ''}" 
              onclick="selectImage('${filename}')" 
              title="${filename}">
-            <img src="/api/preview/${filename}" alt="${filename}" onerror="this.style.display='none'">
+            <img src="/api/thumbnail/${filename}?size=small" alt="${filename}" loading="lazy" onerror="this.style.display='none'">
             <p>${filename.length > 15 ? filename.substring(0, 15) + '...' : filename}</p>
         </div>
     `).join('');